@@ -11,7 +11,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.database import Base
-from app.models import user, homework, exercise, study_plan, parent_child  # 导入所有模型
+from app.models import user, homework, exercise, study_plan, parent_child, worksheet_template, grading_job, answer_key  # 导入所有模型
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
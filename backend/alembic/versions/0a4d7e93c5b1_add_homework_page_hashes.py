@@ -0,0 +1,27 @@
+"""add_homework_page_hashes
+
+Revision ID: 0a4d7e93c5b1
+Revises: f3a8c1d75e26
+Create Date: 2026-10-16 20:41:07.185326
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a4d7e93c5b1'
+down_revision = 'f3a8c1d75e26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 重复提交检测逐页比较，早期记录只有第一页的哈希（perceptual_hash）
+    with op.batch_alter_table('homework') as batch_op:
+        batch_op.add_column(sa.Column('page_hashes', sa.JSON(), nullable=True, comment='每页的页面感知哈希（按页序）'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('homework') as batch_op:
+        batch_op.drop_column('page_hashes')
@@ -0,0 +1,50 @@
+"""add_worksheet_templates
+
+Revision ID: 5c81b7e2d4a9
+Revises: 96df6ab1f710
+Create Date: 2026-10-16 14:05:12.604418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c81b7e2d4a9'
+down_revision = '96df6ab1f710'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 创建 worksheet_templates 表
+    op.create_table(
+        'worksheet_templates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False, comment='登记模板的教师ID'),
+        sa.Column('name', sa.String(200), nullable=False, comment='模板名称'),
+        sa.Column('description', sa.Text(), nullable=True, comment='模板描述'),
+        sa.Column('subject', sa.String(50), nullable=False, comment='学科'),
+        sa.Column('grade_level', sa.String(20), nullable=True, comment='年级水平'),
+        sa.Column('reference_image_url', sa.String(500), nullable=False, comment='参考图片URL'),
+        sa.Column('width', sa.Integer(), nullable=False, comment='参考图片宽度（模板坐标系）'),
+        sa.Column('height', sa.Integer(), nullable=False, comment='参考图片高度（模板坐标系）'),
+        sa.Column('fingerprint', sa.LargeBinary(), nullable=False, comment='版面特征: ORB关键点、描述子和投影签名(npz)'),
+        sa.Column('keypoint_count', sa.Integer(), server_default='0', comment='关键点数量'),
+        sa.Column('questions', sa.JSON(), nullable=False, comment='题目列表: 题号、题目文字、作答单元格（相对坐标）、标准答案'),
+        sa.Column('verify_regions', sa.JSON(), nullable=True, comment='匹配后抽查的印刷文字: 相对坐标和去掉作答内容的文字'),
+        sa.Column('is_active', sa.Boolean(), server_default='true', comment='是否启用'),
+        sa.Column('match_count', sa.Integer(), server_default='0', comment='匹配次数'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), comment='更新时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_worksheet_templates_id', 'worksheet_templates', ['id'])
+    op.create_index('ix_worksheet_templates_user_id', 'worksheet_templates', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_worksheet_templates_user_id', table_name='worksheet_templates')
+    op.drop_index('ix_worksheet_templates_id', table_name='worksheet_templates')
+    op.drop_table('worksheet_templates')
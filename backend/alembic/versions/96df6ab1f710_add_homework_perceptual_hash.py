@@ -0,0 +1,33 @@
+"""add_homework_perceptual_hash
+
+Revision ID: 96df6ab1f710
+Revises: 29d3f2e1aec4
+Create Date: 2026-10-16 10:12:45.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '96df6ab1f710'
+down_revision = '29d3f2e1aec4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # SQLite不支持直接添加外键，使用批量模式重建表
+    with op.batch_alter_table('homework') as batch_op:
+        batch_op.add_column(sa.Column('perceptual_hash', sa.String(32), nullable=True, comment='页面感知哈希: pHash+dHash（各16位十六进制）'))
+        batch_op.add_column(sa.Column('duplicate_of_id', sa.Integer(), nullable=True, comment='复用批改结果的原作业ID'))
+        batch_op.create_foreign_key('fk_homework_duplicate_of_id', 'homework', ['duplicate_of_id'], ['id'])
+        batch_op.create_index('ix_homework_user_perceptual_hash', ['user_id', 'perceptual_hash'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('homework') as batch_op:
+        batch_op.drop_index('ix_homework_user_perceptual_hash')
+        batch_op.drop_constraint('fk_homework_duplicate_of_id', type_='foreignkey')
+        batch_op.drop_column('duplicate_of_id')
+        batch_op.drop_column('perceptual_hash')
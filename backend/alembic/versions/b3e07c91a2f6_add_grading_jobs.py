@@ -0,0 +1,50 @@
+"""add_grading_jobs
+
+Revision ID: b3e07c91a2f6
+Revises: 5c81b7e2d4a9
+Create Date: 2026-10-16 16:40:27.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e07c91a2f6'
+down_revision = '5c81b7e2d4a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 创建 grading_jobs 表
+    op.create_table(
+        'grading_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('homework_id', sa.Integer(), nullable=False, comment='作业ID'),
+        sa.Column('user_id', sa.Integer(), nullable=False, comment='提交作业的用户ID'),
+        sa.Column('image_paths', sa.JSON(), nullable=False, comment='作业图片路径列表（按页顺序）'),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued', comment='任务状态: queued/running/completed/failed'),
+        sa.Column('attempts', sa.Integer(), server_default='0', comment='已执行次数'),
+        sa.Column('max_attempts', sa.Integer(), server_default='3', comment='最多执行次数'),
+        sa.Column('worker_id', sa.String(100), nullable=True, comment='领取任务的工作进程'),
+        sa.Column('available_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), comment='可被领取的时间（失败重试时延后）'),
+        sa.Column('locked_until', sa.DateTime(), nullable=True, comment='租约到期时间，工作进程异常退出后任务在此之后重新排队'),
+        sa.Column('error_message', sa.Text(), nullable=True, comment='最近一次失败的错误信息'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), comment='创建时间'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='最近一次开始执行时间'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='完成时间'),
+        sa.ForeignKeyConstraint(['homework_id'], ['homework.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_grading_jobs_id', 'grading_jobs', ['id'])
+    op.create_index('ix_grading_jobs_homework_id', 'grading_jobs', ['homework_id'])
+    op.create_index('ix_grading_jobs_status_available_at', 'grading_jobs', ['status', 'available_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_grading_jobs_status_available_at', table_name='grading_jobs')
+    op.drop_index('ix_grading_jobs_homework_id', table_name='grading_jobs')
+    op.drop_index('ix_grading_jobs_id', table_name='grading_jobs')
+    op.drop_table('grading_jobs')
@@ -0,0 +1,59 @@
+"""add_answer_keys
+
+Revision ID: e6c2d94f0b18
+Revises: b3e07c91a2f6
+Create Date: 2026-10-16 19:12:45.301827
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6c2d94f0b18'
+down_revision = 'b3e07c91a2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 创建 answer_keys 表
+    op.create_table(
+        'answer_keys',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False, comment='登记答案的教师ID'),
+        sa.Column('worksheet_template_id', sa.Integer(), nullable=True, comment='对应的练习纸模板ID，匹配到该模板的照片自动使用此答案'),
+        sa.Column('name', sa.String(200), nullable=False, comment='答案名称（通常为作业标题）'),
+        sa.Column('description', sa.Text(), nullable=True, comment='描述'),
+        sa.Column('subject', sa.String(50), nullable=False, comment='学科'),
+        sa.Column('grade_level', sa.String(20), nullable=True, comment='年级水平'),
+        sa.Column('questions', sa.JSON(), nullable=False, comment='题目列表: 题号、题目文字、标准答案、题型、知识点、难度、解题步骤'),
+        sa.Column('status', sa.String(20), nullable=False, server_default='draft', comment='状态: draft(待确认)/confirmed(已确认，批改时使用)'),
+        sa.Column('is_active', sa.Boolean(), server_default='true', comment='是否启用'),
+        sa.Column('use_count', sa.Integer(), server_default='0', comment='批改时使用次数'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), comment='更新时间'),
+        sa.Column('confirmed_at', sa.DateTime(), nullable=True, comment='确认时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['worksheet_template_id'], ['worksheet_templates.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_answer_keys_id', 'answer_keys', ['id'])
+    op.create_index('ix_answer_keys_user_id', 'answer_keys', ['user_id'])
+    op.create_index('ix_answer_keys_worksheet_template_id', 'answer_keys', ['worksheet_template_id'])
+
+    # 批改任务记录使用的标准答案（SQLite不支持直接添加外键，使用批量模式重建表）
+    with op.batch_alter_table('grading_jobs') as batch_op:
+        batch_op.add_column(sa.Column('answer_key_id', sa.Integer(), nullable=True, comment='批改使用的标准答案ID'))
+        batch_op.create_foreign_key('fk_grading_jobs_answer_key_id', 'answer_keys', ['answer_key_id'], ['id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('grading_jobs') as batch_op:
+        batch_op.drop_constraint('fk_grading_jobs_answer_key_id', type_='foreignkey')
+        batch_op.drop_column('answer_key_id')
+
+    op.drop_index('ix_answer_keys_worksheet_template_id', table_name='answer_keys')
+    op.drop_index('ix_answer_keys_user_id', table_name='answer_keys')
+    op.drop_index('ix_answer_keys_id', table_name='answer_keys')
+    op.drop_table('answer_keys')
@@ -0,0 +1,27 @@
+"""add_worksheet_template_answer_layout
+
+Revision ID: f3a8c1d75e26
+Revises: e6c2d94f0b18
+Create Date: 2026-10-16 20:05:31.472913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c1d75e26'
+down_revision = 'e6c2d94f0b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 作答区域OCR的布局改为随教师登记的模板保存，不再从学生照片学习
+    with op.batch_alter_table('worksheet_templates') as batch_op:
+        batch_op.add_column(sa.Column('answer_layout', sa.JSON(), nullable=True, comment='只识别作答区域时复用的布局: 页面哈希、印刷文字和作答区域'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('worksheet_templates') as batch_op:
+        batch_op.drop_column('answer_layout')
@@ -6,6 +6,12 @@ from app.core.database import get_db
 from app.core.deps import get_current_user
 from app.models.user import User
 from app.models.homework import Homework
+from app.models.grading_job import GradingJob
+from app.core.config import settings
+from app.services.perceptual_hash import PageHash, compute_page_hash, homework_duplicate_finder
+from app.services.grading_queue import grading_job_queue
+from app.services.answer_key import answer_key_index
+import asyncio
 import json
 import time
 import os
@@ -51,6 +57,8 @@ class HomeworkSubmitResponse(BaseModel):
     status: str
     message: str
     processing_time: Optional[float] = None
+    duplicate: Optional[Dict[str, Any]] = None  # 近似重复的历史作业
+    job_id: Optional[int] = None  # 批改任务ID
 
 @router.post("/submit", response_model=HomeworkSubmitResponse, summary="提交作业")
 async def submit_homework(
@@ -58,6 +66,7 @@ async def submit_homework(
     subject: str = Form("math", description="学科"),
     subject_type: str = Form("arithmetic", description="具体类型"),
     grade_level: str = Form("elementary", description="年级水平"),
+    answer_key_id: Optional[int] = Form(None, description="教师登记的标准答案ID（布置的作业）"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -68,8 +77,10 @@ async def submit_homework(
     - **subject**: 学科类型（目前支持math）
     - **subject_type**: 具体类型（arithmetic-口算，algebra-代数等）
     - **grade_level**: 年级水平（elementary-小学，middle-中学）
+    - **answer_key_id**: 教师为布置的作业登记的标准答案，批改时按题号直接取标准答案
     
-    返回作业ID，用于查询处理结果
+    返回作业ID，用于查询处理结果；与近期已批改的作业是同一份（每页都是换角度重拍、标准答案相同）时，
+    在duplicate中返回原作业信息，用户确认后调用 /{homework_id}/reuse-duplicate 复用其批改结果
     """
     if not images or len(images) == 0:
         raise HTTPException(
@@ -83,6 +94,14 @@ async def submit_homework(
             detail="最多只能上传5张图片"
         )
     
+    if answer_key_id is not None:
+        answer_key = answer_key_index.get(answer_key_id)
+        if answer_key is None or answer_key.subject != subject:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="标准答案不存在、尚未确认或与作业学科不一致"
+            )
+    
     # 验证所有文件
     max_size = 10 * 1024 * 1024  # 10MB
     saved_files = []
@@ -110,6 +129,7 @@ async def submit_homework(
     os.makedirs(upload_dir, exist_ok=True)
     
     # 保存所有文件
+    page_hashes = [] if settings.HOMEWORK_DUPLICATE_DETECTION else None
     try:
         for i, image in enumerate(images):
             file_extension = os.path.splitext(image.filename or f"image_{i}.jpg")[1]
@@ -120,6 +140,16 @@ async def submit_homework(
                 content = await image.read()
                 await f.write(content)
             
+            # 每页计算页面感知哈希，用于识别重复提交；任何一页失败时不做检测
+            if page_hashes is not None:
+                try:
+                    page_hashes.append(await asyncio.get_running_loop().run_in_executor(
+                        None, compute_page_hash, content
+                    ))
+                except Exception as e:
+                    print(f"计算第{i+1}页页面哈希失败: {e}")
+                    page_hashes = None
+            
             saved_files.append({
                 "index": i + 1,
                 "filename": filename,
@@ -141,6 +171,16 @@ async def submit_homework(
             detail=f"文件保存失败: {str(e)}"
         )
     
+    # 查找近似重复的历史作业
+    duplicate = None
+    if page_hashes:
+        try:
+            duplicate = homework_duplicate_finder.find(
+                db, current_user.id, page_hashes, subject=subject, answer_key_id=answer_key_id
+            )
+        except Exception as e:
+            print(f"查找重复作业失败: {e}")
+    
     # 保存作业记录到数据库
     try:
         
@@ -156,14 +196,25 @@ async def submit_homework(
             wrong_count=0,
             accuracy_rate=0.0,
             status="processing",
-            correction_result=[]
+            correction_result=[],
+            perceptual_hash=page_hashes[0].to_string() if page_hashes else None,
+            page_hashes=[page_hash.to_string() for page_hash in page_hashes] if page_hashes else None
         )
-        
         db.add(homework)
+        
+        # 批改任务与作业记录在同一事务中提交，由批改工作进程异步执行
+        db.flush()
+        job = grading_job_queue.enqueue(
+            db, homework, [file_info["path"] for file_info in saved_files], answer_key_id
+        )
+        
         db.commit()
         db.refresh(homework)
         
-        print(f"作业记录已保存，ID: {homework_id}, 学科: {subject}")
+        print(f"作业记录已保存，ID: {homework_id}, 学科: {subject}，批改任务: {job.id}")
+        if duplicate is not None:
+            print(f"作业 {homework_id} 与历史作业 {duplicate.homework.id} 的{duplicate.pages}页近似重复"
+                  f"（最大pHash距离{duplicate.phash_distance}, dHash距离{duplicate.dhash_distance}）")
         
     except Exception as e:
         print(f"保存作业记录失败: {e}")
@@ -179,14 +230,96 @@ async def submit_homework(
             detail=f"保存作业记录失败: {str(e)}"
         )
     
-    # 模拟处理时间（基于图片数量）
-    processing_time = 2.0 + len(images) * 0.5
+    message = f"作业已成功提交（{len(images)}张图片），已加入批改队列"
+    if duplicate is not None:
+        message += f"；与之前提交的作业（ID: {duplicate.homework.id}）是同一份，确认后可复用其批改结果"
     
     return HomeworkSubmitResponse(
         id=homework_id,
         status="processing",
-        message=f"作业已成功提交（{len(images)}张图片），正在处理中...",
-        processing_time=processing_time
+        message=message,
+        duplicate=duplicate.to_dict() if duplicate is not None else None,
+        job_id=job.id
+    )
+
+@router.post("/{homework_id}/reuse-duplicate", response_model=HomeworkSubmitResponse, summary="复用重复作业的批改结果")
+def reuse_duplicate_homework(
+    homework_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    用户确认提交的作业与之前的作业是同一份后，复用之前的批改结果并取消本次批改
+    
+    重新核对页数、每页的页面哈希和标准答案，任何一项不一致时不复用；作业已批改完成时无需复用
+    """
+    homework = db.query(Homework).filter(
+        Homework.id == homework_id,
+        Homework.user_id == current_user.id
+    ).first()
+    if not homework:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="作业不存在"
+        )
+    
+    job = db.query(GradingJob).filter(GradingJob.homework_id == homework.id).first()
+    if homework.status != "processing" or job is None or job.status not in ("queued", "running"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="作业已批改完成或批改失败，无需复用"
+        )
+    
+    duplicate = None
+    if homework.page_hashes:
+        duplicate = homework_duplicate_finder.find(
+            db, current_user.id, [PageHash.from_string(value) for value in homework.page_hashes],
+            subject=homework.subject, exclude_id=homework.id, answer_key_id=job.answer_key_id
+        )
+    if duplicate is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="没有页数、页面和标准答案都一致的已批改作业，无法复用"
+        )
+    
+    # 结束批改任务：进行中的工作进程完成时按状态条件更新，结果会被丢弃
+    finished = db.query(GradingJob).filter(
+        GradingJob.id == job.id,
+        GradingJob.status.in_(("queued", "running"))
+    ).update({
+        GradingJob.status: "completed",
+        GradingJob.locked_until: None,
+        GradingJob.error_message: f"复用作业{duplicate.homework.id}的批改结果",
+        GradingJob.finished_at: datetime.now()
+    }, synchronize_session=False)
+    if not finished:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="作业已批改完成或批改失败，无需复用"
+        )
+    
+    previous = duplicate.homework
+    homework.ocr_result = previous.ocr_result
+    homework.ocr_text = previous.ocr_text
+    homework.correction_result = previous.correction_result
+    homework.total_questions = previous.total_questions
+    homework.correct_count = previous.correct_count
+    homework.wrong_count = previous.wrong_count
+    homework.accuracy_rate = previous.accuracy_rate
+    homework.status = "completed"
+    homework.completed_at = datetime.now()
+    homework.duplicate_of_id = previous.id
+    db.commit()
+    
+    print(f"作业 {homework.id} 复用历史作业 {previous.id} 的批改结果")
+    return HomeworkSubmitResponse(
+        id=homework.id,
+        status="completed",
+        message=f"已复用之前提交的作业（ID: {previous.id}）的批改结果",
+        processing_time=0.0,
+        duplicate=duplicate.to_dict(),
+        job_id=job.id
     )
 
 @router.post("/correct", response_model=HomeworkCorrectionResponse, summary="批改数学作业")
@@ -5,6 +5,9 @@ from pydantic import BaseModel, Field
 from app.core.database import get_db
 from app.core.deps import get_current_user
 from app.models.user import User
+from app.core.streaming import check_stream_format, iter_as_completed, stream_records
+from app.services.vision_ocr_service import VisionOCRService
+from app.services.grading_executor import grading_executor, GradingQueueFullError
 import json
 import time
 import random
@@ -250,6 +253,7 @@ def delete_image(
 async def batch_ocr(
     files: List[UploadFile] = File(..., description="多个图片文件"),
     language: str = Form(default="zh", description="识别语言"),
+    stream: Optional[str] = Form(default=None, description="流式输出格式: ndjson/sse，不传时全部完成后一次返回"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -258,44 +262,88 @@ async def batch_ocr(
     
     - **files**: 多个图片文件
     - **language**: 识别语言
+    - **stream**: 流式输出时每张图片识别完成后立即输出一条page记录（按完成顺序，带输入序号index），
+      最后输出summary记录；客户端断开时取消尚未开始识别的图片
     
     适用于多页作业的批量处理
     """
+    stream = check_stream_format(stream)
     if len(files) > 10:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="单次最多支持10张图片"
         )
     
-    results = []
+    # 先读取全部上传内容，流式响应开始后不再访问上传文件
+    uploads = []
     for i, file in enumerate(files):
-        # 验证文件
-        if not file.content_type or not file.content_type.startswith('image/'):
-            results.append({
-                "file_name": file.filename,
-                "status": "error",
-                "message": "不支持的文件格式"
-            })
-            continue
-        
-        # 模拟OCR处理
-        image_id = f"batch_{int(time.time())}_{i}_{current_user.id}"
-        mock_text = f"第{i+1}页识别内容：\n1. 题目内容...\n2. 答案内容..."
+        is_image = bool(file.content_type and file.content_type.startswith('image/'))
+        uploads.append((i, file.filename, await file.read() if is_image else None))
+    
+    batch_id = f"batch_{int(time.time())}_{current_user.id}"
+    ocr_service = VisionOCRService()
+    # 英文按英文路由选择引擎和语言，其他按中文
+    subject = 'english' if language == 'en' else None
+    
+    # 所有图片并行识别，按完成顺序收集
+    pages = iter_as_completed(
+        _ocr_batch_page(ocr_service, batch_id, *upload, subject)
+        for upload in uploads
+    )
+    
+    if stream:
+        async def records():
+            results = []
+            async for result in pages:
+                results.append(result)
+                yield {'type': 'page', **result}
+            yield {'type': 'summary', **_batch_ocr_summary(results, batch_id)}
         
-        results.append({
-            "file_name": file.filename,
-            "image_id": image_id,
-            "status": "success",
-            "recognized_text": mock_text,
-            "confidence": round(random.uniform(0.85, 0.98), 2),
-            "processing_time": round(random.uniform(1.0, 3.0), 2)
-        })
+        return stream_records(records(), stream)
+    
+    return _batch_ocr_summary([result async for result in pages], batch_id)
+
+
+async def _ocr_batch_page(ocr_service: VisionOCRService, batch_id: str, index: int, file_name: str,
+                          content: Optional[bytes], subject: Optional[str]) -> Dict[str, Any]:
+    """识别一张图片，失败时返回错误记录"""
+    result = {"index": index, "file_name": file_name}
+    if content is None:
+        return {**result, "status": "error", "message": "不支持的文件格式"}
     
+    start_time = time.perf_counter()
+    try:
+        ocr_result = await grading_executor.run(
+            ocr_service.extract_text_from_image, content, subject=subject
+        )
+    except GradingQueueFullError as e:
+        return {**result, "status": "error", "message": str(e), "retry_after": e.retry_after}
+    except Exception as e:
+        print(f"批量OCR第{index+1}张图片失败: {e}")
+        return {**result, "status": "error", "message": f"OCR识别失败: {str(e)}"}
+    
+    if not ocr_result['success']:
+        return {**result, "status": "error", "message": ocr_result['message'],
+                "rejection": ocr_result.get('rejection')}
+    
+    return {
+        **result,
+        "image_id": f"{batch_id}_{index}",
+        "status": "success",
+        "recognized_text": ocr_result['raw_text'],
+        "confidence": round(ocr_result['confidence_score'], 2),
+        "processing_time": round(time.perf_counter() - start_time, 2)
+    }
+
+
+def _batch_ocr_summary(results: List[Dict[str, Any]], batch_id: str) -> Dict[str, Any]:
+    """批量OCR汇总，结果按输入顺序排列"""
+    results = sorted(results, key=lambda result: result["index"])
     return {
-        "total_files": len(files),
+        "total_files": len(results),
         "successful": len([r for r in results if r["status"] == "success"]),
         "failed": len([r for r in results if r["status"] == "error"]),
         "results": results,
-        "batch_id": f"batch_{int(time.time())}_{current_user.id}",
+        "batch_id": batch_id,
         "created_at": datetime.now().isoformat()
     }
\ No newline at end of file
@@ -3,23 +3,41 @@
 集成OCR文字识别和AI题目分析功能
 """
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
+import asyncio
 import os
 import json
+import time
 import uuid
 from datetime import datetime
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.deps import get_current_user
+from app.core.streaming import check_stream_format, iter_as_completed, stream_records
 from app.models.user import User
-from app.models.homework import Homework
+from app.models.homework import Homework, ErrorQuestion
 from app.services.vision_ocr_service import VisionOCRService
-from app.services.homework_analysis_ai import HomeworkAnalysisAI
+from app.services.homework_analysis_ai import HomeworkAnalysisAI, HomeworkCorrectionResult
+from app.services.grading_executor import grading_executor, GradingQueueFullError
+from app.services.answer_key import answer_key_index
+from app.services.ocr_engine_registry import ocr_engine_registry
+from app.services.ocr_result_cache import ocr_result_cache
+from app.services.question_analysis_cache import question_analysis_cache
+from app.services.ocr_routing import ocr_routing_policy
+from app.services.ocr_batcher import ocr_batchers
+from app.services.answer_region_ocr import worksheet_layout_cache
+from app.services.worksheet_template import worksheet_template_index
+from app.services.ocr_worker_client import ocr_worker_client, OCRWorkerError
 
 router = APIRouter()
 
+# 题目难度对应错题本的难度等级（1-10）
+DIFFICULTY_LEVELS = {'easy': 2, 'medium': 5, 'hard': 8}
+
 
 class IntelligentCorrectionRequest(BaseModel):
     """智能批改请求"""
@@ -27,6 +45,7 @@ class IntelligentCorrectionRequest(BaseModel):
     subject: str = Field(..., description="学科")
     grade: str = Field(..., description="年级")
     homework_title: str = Field(default="作业批改", description="作业标题")
+    answer_key_id: Optional[int] = Field(default=None, description="教师登记的标准答案ID，布置的作业按题号直接取标准答案")
 
 
 class QuestionDetail(BaseModel):
@@ -77,12 +96,15 @@ class IntelligentCorrectionResult(BaseModel):
     # 元数据
     analysis_time: str
     ai_version: str
+    analysis_cache: Optional[Dict[str, Any]] = None  # 题目分析缓存命中情况
+    answer_key: Optional[Dict[str, Any]] = None  # 使用的标准答案
 
 
 class OCRAnalysisRequest(BaseModel):
     """OCR分析请求"""
     image_url: str = Field(..., description="图片URL")
     preprocessing: bool = Field(default=True, description="是否进行预处理")
+    subject: Optional[str] = Field(default=None, description="学科，用于选择OCR引擎和识别语言")
 
 
 @router.post("/ocr-extract", summary="OCR文字提取")
@@ -105,13 +127,21 @@ async def extract_text_from_image(
         # 初始化OCR服务
         ocr_service = VisionOCRService()
         
-        # 执行OCR提取
-        ocr_result = ocr_service.extract_text_from_image(
+        # 执行OCR提取（在批改线程池中执行，不阻塞事件循环）
+        ocr_result = await grading_executor.run(
+            ocr_service.extract_text_from_image,
             request.image_url, 
-            preprocessing=request.preprocessing
+            preprocessing=request.preprocessing,
+            subject=request.subject
         )
         
         if not ocr_result['success']:
+            # 图片质量不合格时返回结构化原因，前端据此提示重拍
+            if ocr_result.get('rejection'):
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=ocr_result['rejection']
+                )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"OCR提取失败: {ocr_result['message']}"
@@ -131,11 +161,14 @@ async def extract_text_from_image(
                 'text_regions': ocr_result['regions'][:10]  # 限制返回前10个区域
             },
             'statistics': statistics,
+            'routing': ocr_result.get('routing'),
             'extraction_time': ocr_result['extraction_time']
         }
         
     except HTTPException:
         raise
+    except GradingQueueFullError as e:
+        raise _grading_busy(e)
     except Exception as e:
         print(f"OCR提取异常: {e}")
         raise HTTPException(
@@ -144,6 +177,37 @@ async def extract_text_from_image(
         )
 
 
+@router.get("/ocr-engines", summary="OCR引擎状态")
+async def get_ocr_engine_status(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查看进程内共享OCR模型的加载状态、加载耗时和内存占用，OCR结果缓存和题目分析缓存命中情况，
+    按学科路由的引擎选择统计，微批处理的批大小、等待时间和队列深度，
+    以及OCR工作进程池状态（进程池模式）
+    """
+    worker_pool = None
+    if settings.OCR_WORKER_MODE == 'pooled':
+        try:
+            worker_pool = ocr_worker_client.status()
+        except OCRWorkerError as e:
+            worker_pool = {'error': str(e)}
+    
+    return {
+        'success': True,
+        'registry': ocr_engine_registry.status(),
+        'result_cache': ocr_result_cache.stats(),
+        'question_analysis_cache': question_analysis_cache.stats(),
+        'routing': ocr_routing_policy.stats(),
+        'batching': ocr_batchers.stats(),
+        'answer_only': worksheet_layout_cache.stats(),
+        'worksheet_templates': worksheet_template_index.stats(),
+        'answer_keys': answer_key_index.stats(),
+        'grading': grading_executor.stats(),
+        'worker_pool': worker_pool
+    }
+
+
 @router.post("/intelligent-correct", response_model=IntelligentCorrectionResult)
 async def intelligent_homework_correction(
     request: IntelligentCorrectionRequest,
@@ -164,57 +228,43 @@ async def intelligent_homework_correction(
             )
         
         print(f"开始智能批改，用户: {current_user.username}, 学科: {request.subject}")
+        _check_answer_key(request.answer_key_id, request.subject)
         
         # 初始化AI分析服务
         analysis_ai = HomeworkAnalysisAI()
         
-        # 执行智能分析
-        correction_result = analysis_ai.analyze_homework_image(
+        # 执行智能分析（在批改线程池中执行，不阻塞事件循环）
+        start_time = time.perf_counter()
+        correction_result = await grading_executor.run(
+            analysis_ai.analyze_homework_image,
             image_path=request.image_url,
             subject=request.subject,
             grade=request.grade,
-            student_id=str(current_user.id)
+            student_id=str(current_user.id),
+            answer_key_id=request.answer_key_id
         )
+        processing_time = time.perf_counter() - start_time
         
         # 检查分析是否成功
         if correction_result.homework_id == "error":
+            rejection = correction_result.performance_analysis.get('rejection')
+            if rejection:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=rejection
+                )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=correction_result.learning_suggestions[0] if correction_result.learning_suggestions else "分析失败"
             )
         
         # 保存作业记录到数据库
-        homework = Homework(
-            user_id=current_user.id,
-            image_url=request.image_url,
-            subject=request.subject,
-            title=request.homework_title,
-            total_questions=correction_result.total_questions,
-            correct_count=correction_result.correct_count,
-            wrong_count=correction_result.wrong_count,
-            accuracy_rate=correction_result.accuracy_rate / 100,  # 转换为小数
-            overall_score=correction_result.overall_score,
-            status='completed',
-            correction_results=json.dumps([
-                {
-                    'question_number': q['question_number'],
-                    'question_text': q['question_text'],
-                    'user_answer': q['user_answer'],
-                    'correct_answer': q['correct_answer'],
-                    'is_correct': q['is_correct'],
-                    'explanation': q['explanation'],
-                    'error_type': q['error_type'],
-                    'knowledge_points': q['knowledge_points']
-                }
-                for q in correction_result.question_details
-            ], ensure_ascii=False)
+        homework_id, = await run_in_threadpool(
+            _save_corrections, db, current_user.id, request.subject, request.grade,
+            [(request.image_url, correction_result, processing_time)]
         )
         
-        db.add(homework)
-        db.commit()
-        db.refresh(homework)
-        
-        print(f"作业记录已保存，ID: {homework.id}")
+        print(f"作业记录已保存，ID: {homework_id}")
         
         # 转换为响应格式
         question_details = [
@@ -237,7 +287,7 @@ async def intelligent_homework_correction(
         ]
         
         return IntelligentCorrectionResult(
-            homework_id=str(homework.id),
+            homework_id=str(homework_id),
             success=True,
             message=f"智能批改完成，识别到{correction_result.total_questions}道题目",
             
@@ -265,11 +315,15 @@ async def intelligent_homework_correction(
             
             # 元数据
             analysis_time=datetime.now().isoformat(),
-            ai_version="v1.0-advanced"
+            ai_version="v1.0-advanced",
+            analysis_cache=correction_result.analysis_cache,
+            answer_key=correction_result.answer_key
         )
         
     except HTTPException:
         raise
+    except GradingQueueFullError as e:
+        raise _grading_busy(e)
     except Exception as e:
         print(f"智能批改异常: {e}")
         raise HTTPException(
@@ -289,10 +343,12 @@ async def get_homework_analysis_detail(
     """
     try:
         # 查询作业记录
-        homework = db.query(Homework).filter(
-            Homework.id == homework_id,
-            Homework.user_id == current_user.id
-        ).first()
+        homework = await run_in_threadpool(
+            lambda: db.query(Homework).filter(
+                Homework.id == homework_id,
+                Homework.user_id == current_user.id
+            ).first()
+        )
         
         if not homework:
             raise HTTPException(
@@ -301,31 +357,35 @@ async def get_homework_analysis_detail(
             )
         
         # 解析批改结果
-        correction_results = []
-        if homework.correction_results:
+        correction_results = homework.correction_result or []
+        if isinstance(correction_results, str):
             try:
-                correction_results = json.loads(homework.correction_results)
+                correction_results = json.loads(correction_results)
             except json.JSONDecodeError:
                 print("批改结果JSON解析失败")
+                correction_results = []
         
         # 重新生成AI分析（如果需要）
         enhanced_analysis = None
-        if homework.image_url:
+        if homework.original_image_url:
             try:
                 analysis_ai = HomeworkAnalysisAI()
-                enhanced_analysis = analysis_ai.analyze_homework_image(
-                    image_path=homework.image_url,
+                enhanced_analysis = await grading_executor.run(
+                    analysis_ai.analyze_homework_image,
+                    image_path=homework.original_image_url,
                     subject=homework.subject,
-                    grade="小学四年级",  # 默认年级，实际应从用户信息获取
+                    grade=homework.grade_level or "小学四年级",  # 未记录年级时使用默认年级
                     student_id=str(current_user.id)
                 )
+            except GradingQueueFullError:
+                raise
             except Exception as e:
                 print(f"重新分析失败: {e}")
         
         return {
             'homework_id': homework.id,
             'basic_info': {
-                'title': homework.title,
+                'grade_level': homework.grade_level,
                 'subject': homework.subject,
                 'created_at': homework.created_at.isoformat() if homework.created_at else None,
                 'total_questions': homework.total_questions,
@@ -342,6 +402,8 @@ async def get_homework_analysis_detail(
         
     except HTTPException:
         raise
+    except GradingQueueFullError as e:
+        raise _grading_busy(e)
     except Exception as e:
         print(f"获取分析详情异常: {e}")
         raise HTTPException(
@@ -355,13 +417,22 @@ async def batch_intelligent_correction(
     image_files: List[UploadFile] = File(...),
     subject: str = "math",
     grade: str = "小学四年级",
+    stream: Optional[str] = None,
+    answer_key_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     批量处理多张作业图片进行智能批改
+    
+    各图片同时提交到批改线程池，按完成顺序收集结果，全部完成后在一个事务中保存作业和错题记录。
+    stream=ndjson/sse时每张图片批改完成后立即输出一条page记录（带输入序号index），
+    保存后输出summary记录；客户端断开时取消尚未开始批改的图片，已批改的结果不保存。
+    answer_key_id为教师登记的标准答案，各图片按题号直接取标准答案
     """
     try:
+        stream = check_stream_format(stream)
+        _check_answer_key(answer_key_id, subject)
         if len(image_files) > 10:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -372,74 +443,31 @@ async def batch_intelligent_correction(
         upload_dir = "uploads/batch_homework"
         os.makedirs(upload_dir, exist_ok=True)
         
-        batch_results = []
+        start_time = time.perf_counter()
         analysis_ai = HomeworkAnalysisAI()
         
+        # 先读取全部上传内容，流式响应开始后不再访问上传文件
+        uploads = []
         for i, image_file in enumerate(image_files):
-            try:
-                # 保存上传的图片
-                file_extension = os.path.splitext(image_file.filename)[1]
-                unique_filename = f"batch_{uuid.uuid4()}{file_extension}"
-                file_path = os.path.join(upload_dir, unique_filename)
-                
-                content = await image_file.read()
-                with open(file_path, "wb") as f:
-                    f.write(content)
-                
-                # 执行智能分析
-                correction_result = analysis_ai.analyze_homework_image(
-                    image_path=file_path,
-                    subject=subject,
-                    grade=grade,
-                    student_id=str(current_user.id)
-                )
-                
-                # 保存到数据库
-                homework = Homework(
-                    user_id=current_user.id,
-                    image_url=file_path,
-                    subject=subject,
-                    title=f"批量批改 {i+1}",
-                    total_questions=correction_result.total_questions,
-                    correct_count=correction_result.correct_count,
-                    wrong_count=correction_result.wrong_count,
-                    accuracy_rate=correction_result.accuracy_rate / 100,
-                    overall_score=correction_result.overall_score,
-                    status='completed'
-                )
-                
-                db.add(homework)
-                db.commit()
-                db.refresh(homework)
-                
-                batch_results.append({
-                    'homework_id': homework.id,
-                    'filename': image_file.filename,
-                    'status': 'success',
-                    'total_questions': correction_result.total_questions,
-                    'accuracy_rate': correction_result.accuracy_rate,
-                    'correct_count': correction_result.correct_count
-                })
-                
-            except Exception as e:
-                print(f"批量处理第{i+1}张图片失败: {e}")
-                batch_results.append({
-                    'homework_id': None,
-                    'filename': image_file.filename,
-                    'status': 'failed',
-                    'error': str(e)
-                })
+            file_extension = os.path.splitext(image_file.filename)[1]
+            file_path = os.path.join(upload_dir, f"batch_{uuid.uuid4()}{file_extension}")
+            uploads.append((i, image_file.filename, file_path, await image_file.read()))
         
-        success_count = sum(1 for r in batch_results if r['status'] == 'success')
+        # 所有图片并行批改，按完成顺序收集
+        pages = iter_as_completed(
+            _grade_batch_page(analysis_ai, *upload, subject, grade, str(current_user.id), answer_key_id)
+            for upload in uploads
+        )
         
-        return {
-            'success': True,
-            'message': f"批量批改完成，成功处理{success_count}张图片",
-            'total_processed': len(image_files),
-            'success_count': success_count,
-            'failed_count': len(image_files) - success_count,
-            'results': batch_results
-        }
+        if stream:
+            return stream_records(
+                _stream_batch_correction(pages, db, current_user.id, subject, grade, len(uploads), start_time),
+                stream
+            )
+        
+        graded = [page async for page in pages]
+        await _persist_batch(db, current_user.id, subject, grade, graded)
+        return _batch_summary(graded, len(uploads), start_time)
         
     except HTTPException:
         raise
@@ -451,6 +479,215 @@ async def batch_intelligent_correction(
         )
 
 
+async def _grade_batch_page(analysis_ai: HomeworkAnalysisAI, index: int, filename: str, file_path: str,
+                            content: bytes, subject: str, grade: str, student_id: str,
+                            answer_key_id: Optional[int] = None) -> Dict[str, Any]:
+    """保存并批改一张图片，异常记录在返回结果中"""
+    page = {'index': index, 'filename': filename, 'file_path': file_path,
+            'result': None, 'processing_time': 0.0, 'error': None}
+    
+    # 原图在后台线程写盘，与OCR并行；OCR直接从上传缓冲区解码
+    persist_task = asyncio.get_running_loop().run_in_executor(None, _save_upload, file_path, content)
+    page_start = time.perf_counter()
+    try:
+        page['result'] = await grading_executor.run(
+            analysis_ai.analyze_homework_image,
+            image_path=content,
+            subject=subject,
+            grade=grade,
+            student_id=student_id,
+            answer_key_id=answer_key_id
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        page['error'] = e
+    finally:
+        await asyncio.shield(persist_task)
+    page['processing_time'] = time.perf_counter() - page_start
+    
+    if page['error'] is not None:
+        print(f"批量处理第{index+1}张图片失败: {page['error']}")
+    elif page['result'].homework_id == "error":
+        print(f"批量处理第{index+1}张图片分析失败")
+    return page
+
+
+def _page_graded(page: Dict[str, Any]) -> bool:
+    return page['error'] is None and page['result'].homework_id != "error"
+
+
+async def _persist_batch(db: Session, user_id: int, subject: str, grade: str, pages: List[Dict[str, Any]]):
+    """成功的页面在一个事务中保存，作业ID写回page"""
+    graded = [page for page in pages if _page_graded(page)]
+    if not graded:
+        return
+    homework_ids = await run_in_threadpool(
+        _save_corrections, db, user_id, subject, grade,
+        [(page['file_path'], page['result'], page['processing_time']) for page in graded]
+    )
+    for page, homework_id in zip(graded, homework_ids):
+        page['homework_id'] = homework_id
+
+
+def _batch_page_record(page: Dict[str, Any]) -> Dict[str, Any]:
+    """一张图片的批改结果（保存前homework_id为None）"""
+    result, error = page['result'], page['error']
+    record = {'index': page['index'], 'filename': page['filename'], 'homework_id': page.get('homework_id')}
+    if _page_graded(page):
+        record.update({
+            'status': 'success',
+            'total_questions': result.total_questions,
+            'accuracy_rate': result.accuracy_rate,
+            'correct_count': result.correct_count,
+            'processing_time': round(page['processing_time'], 3),
+            'analysis_cache': result.analysis_cache,
+            'answer_key': result.answer_key
+        })
+    elif isinstance(error, GradingQueueFullError):
+        record.update({'status': 'rejected', 'error': str(error), 'retry_after': error.retry_after})
+    else:
+        record.update({
+            'status': 'failed',
+            'error': str(error) if error is not None else (
+                result.learning_suggestions[0] if result.learning_suggestions else "分析失败"
+            )
+        })
+    return record
+
+
+def _batch_summary(pages: List[Dict[str, Any]], total: int, start_time: float) -> Dict[str, Any]:
+    """批量批改汇总，结果按输入顺序排列"""
+    batch_results = [_batch_page_record(page) for page in sorted(pages, key=lambda page: page['index'])]
+    success_count = sum(1 for r in batch_results if r['status'] == 'success')
+    return {
+        'success': True,
+        'message': f"批量批改完成，成功处理{success_count}张图片",
+        'total_processed': total,
+        'success_count': success_count,
+        'failed_count': total - success_count,
+        'processing_time': round(time.perf_counter() - start_time, 3),
+        'results': batch_results
+    }
+
+
+async def _stream_batch_correction(pages: AsyncIterator[Dict[str, Any]], db: Session, user_id: int,
+                                   subject: str, grade: str, total: int, start_time: float):
+    """流式批量批改：逐张输出page记录，全部完成并保存后输出summary记录"""
+    graded = []
+    async for page in pages:
+        graded.append(page)
+        yield {'type': 'page', **_batch_page_record(page)}
+    
+    try:
+        await _persist_batch(db, user_id, subject, grade, graded)
+    except Exception as e:
+        print(f"批量批改保存失败: {e}")
+        yield {'type': 'error', 'message': f"批量批改保存失败: {str(e)}"}
+        return
+    yield {'type': 'summary', **_batch_summary(graded, total, start_time)}
+
+
+def _check_answer_key(answer_key_id: Optional[int], subject: str):
+    """指定的标准答案需已确认且学科一致"""
+    if answer_key_id is None:
+        return
+    answer_key = answer_key_index.get(answer_key_id)
+    if answer_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="标准答案不存在或尚未确认"
+        )
+    if answer_key.subject != subject:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"标准答案的学科（{answer_key.subject}）与作业学科不一致"
+        )
+
+
+def _grading_busy(error: GradingQueueFullError) -> HTTPException:
+    """批改任务排队已满时的503响应"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(error),
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+def _save_corrections(db: Session, user_id: int, subject: str, grade: str,
+                      pages: List[Tuple[str, HomeworkCorrectionResult, float]]) -> List[int]:
+    """
+    在一个事务中保存批改结果：每页一条作业记录，错题写入错题本（同步数据库操作，在线程池中调用）
+    
+    Args:
+        pages: (图片地址, 批改结果, 处理耗时)列表
+    
+    Returns:
+        与pages对应的作业ID
+    """
+    homeworks = [
+        Homework(
+            user_id=user_id,
+            original_image_url=image_url,
+            subject=subject,
+            grade_level=grade,
+            total_questions=correction_result.total_questions,
+            correct_count=correction_result.correct_count,
+            wrong_count=correction_result.wrong_count,
+            accuracy_rate=correction_result.accuracy_rate / 100,  # 转换为小数
+            status='completed',
+            processing_time=processing_time,
+            ocr_time=correction_result.timings['ocr'] if correction_result.timings else None,
+            correction_time=correction_result.timings['correction'] if correction_result.timings else None,
+            completed_at=datetime.now(),
+            correction_result=[
+                {
+                    'question_number': q['question_number'],
+                    'question_text': q['question_text'],
+                    'user_answer': q['user_answer'],
+                    'correct_answer': q['correct_answer'],
+                    'is_correct': q['is_correct'],
+                    'explanation': q['explanation'],
+                    'error_type': q['error_type'],
+                    'knowledge_points': q['knowledge_points']
+                }
+                for q in correction_result.question_details
+            ]
+        )
+        for image_url, correction_result, processing_time in pages
+    ]
+    db.add_all(homeworks)
+    db.flush()  # 获取作业ID
+    
+    db.add_all([
+        ErrorQuestion(
+            homework_id=homework.id,
+            user_id=user_id,
+            question_text=q['question_text'],
+            user_answer=q['user_answer'],
+            correct_answer=q['correct_answer'] or '',
+            error_type=q['error_type'],
+            error_reason=q['error_description'],
+            explanation=q['explanation'],
+            knowledge_points=q['knowledge_points'],
+            difficulty_level=DIFFICULTY_LEVELS.get(q['difficulty_level'], 5)
+        )
+        for homework, (_, correction_result, _) in zip(homeworks, pages)
+        for q in correction_result.question_details
+        if not q['is_correct']
+    ])
+    
+    homework_ids = [homework.id for homework in homeworks]
+    db.commit()
+    return homework_ids
+
+
+def _save_upload(file_path: str, content: bytes):
+    """保存上传的原图"""
+    with open(file_path, "wb") as f:
+        f.write(content)
+
+
 def _generate_ai_insights(homework, correction_results: List[Dict[str, Any]]) -> Dict[str, Any]:
     """生成AI洞察分析"""
     
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, homework, student, image, parent, teacher, payment, user, bind, support, exercise
+from app.api.v1 import auth, homework, student, image, parent, teacher, payment, user, bind, support, exercise, intelligent_correction
 
 api_router = APIRouter()
 
@@ -80,4 +80,9 @@ api_router.include_router(
     tags=["智能出题"]
 )
 
-# 临时移除问题模块
\ No newline at end of file
+# 智能批改相关路由（OCR提取、智能批改、批量批改、OCR引擎状态）
+api_router.include_router(
+    intelligent_correction.router,
+    prefix="/intelligent",
+    tags=["智能批改"]
+)
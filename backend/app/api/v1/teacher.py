@@ -1,13 +1,31 @@
 from typing import Any, Dict, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.deps import get_current_user
 from app.models.user import User
+from app.models.worksheet_template import WorksheetTemplate
+from app.models.answer_key import AnswerKey
+from app.services.answer_key import answer_key_index
+from app.services.answer_region_ocr import build_worksheet_layout, worksheet_layout_cache
+from app.services.homework_analysis_ai import HomeworkAnalysisAI
+from app.services.ocr_regions import TextRegionBatch
+from app.services.perceptual_hash import compute_page_hash
+from app.services.vision_ocr_service import VisionOCRService
+from app.services.worksheet_template import (
+    compute_fingerprint, detect_questions, normalize_questions, select_verify_regions,
+    worksheet_template_index
+)
+import asyncio
 import json
+import os
 import time
 import random
+import uuid
+import aiofiles
+import numpy as np
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -29,6 +47,27 @@ class TeacherDashboardResponse(BaseModel):
     recent_activities: List[Dict[str, Any]]
     pending_tasks: List[Dict[str, Any]]
 
+class WorksheetTemplateInfo(BaseModel):
+    """练习纸模板信息"""
+    id: int
+    name: str
+    description: Optional[str]
+    subject: str
+    grade_level: Optional[str]
+    reference_image_url: str
+    width: int
+    height: int
+    keypoint_count: int
+    question_count: int
+    is_active: bool
+    match_count: int
+    created_at: Optional[str]
+
+class WorksheetTemplateDetail(WorksheetTemplateInfo):
+    """练习纸模板详情"""
+    questions: List[Dict[str, Any]]
+    verify_regions: List[Dict[str, Any]]
+
 class ClassReportResponse(BaseModel):
     """班级报告响应"""
     class_info: ClassInfo
@@ -397,4 +436,484 @@ def get_teaching_analytics(
             "关注学习困难的学生群体"
         ],
         "generated_at": datetime.now().isoformat()
-    }
\ No newline at end of file
+    }
+
+
+# ==================== 练习纸模板 ====================
+
+# 参考图片的最少关键点数，过少时无法可靠对齐
+MIN_TEMPLATE_KEYPOINTS = 100
+
+def _require_teacher(current_user: User):
+    if current_user.role not in ['teacher', 'admin']:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="只有教师可以管理练习纸模板和标准答案"
+        )
+
+def _template_info(template: WorksheetTemplate) -> Dict[str, Any]:
+    return {
+        "id": template.id,
+        "name": template.name,
+        "description": template.description,
+        "subject": template.subject,
+        "grade_level": template.grade_level,
+        "reference_image_url": template.reference_image_url,
+        "width": template.width,
+        "height": template.height,
+        "keypoint_count": template.keypoint_count or 0,
+        "question_count": template.question_count,
+        "is_active": bool(template.is_active),
+        "match_count": template.match_count or 0,
+        "created_at": template.created_at.isoformat() if template.created_at else None
+    }
+
+def _get_owned_template(template_id: int, current_user: User, db: Session) -> WorksheetTemplate:
+    template = db.query(WorksheetTemplate).filter(WorksheetTemplate.id == template_id).first()
+    if not template or (template.user_id != current_user.id and current_user.role != 'admin'):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="练习纸模板不存在"
+        )
+    return template
+
+def _prepare_worksheet_template(content: bytes, questions: Optional[List[Dict[str, Any]]],
+                                answers: Optional[List[Any]]) -> Dict[str, Any]:
+    """
+    按批改时相同的流程预处理参考图片，提取版面特征，确定作答单元格和校验文字
+
+    模板坐标系为预处理后的参考图片；教师提交的单元格坐标基于原图，换算为相对坐标。
+    未提交题目时从整页识别结果中自动查找作答单元格（CPU密集，在线程池中执行）。
+    同时记录作答区域OCR复用的印刷文字和作答区域布局
+    """
+    ocr_service = VisionOCRService()
+    image, preprocessing_report = ocr_service.load_image(content)
+    height, width = image.shape[:2]
+
+    fingerprint = compute_fingerprint(image)
+    if len(fingerprint.keypoints) < MIN_TEMPLATE_KEYPOINTS:
+        raise ValueError(f"参考图片特征点过少（{len(fingerprint.keypoints)}个），请上传清晰完整的练习纸")
+
+    ocr_result = ocr_service.extract_text_from_image(
+        content, use_cache=False, quality_check=False, answer_only=False
+    )
+    ocr_regions = ocr_result.get('regions') or []
+    regions = TextRegionBatch(
+        [region['text'] for region in ocr_regions],
+        np.array([region['bbox'] for region in ocr_regions], dtype=np.int32).reshape(-1, 4),
+        np.array([region['confidence'] for region in ocr_regions], dtype=np.float32)
+    )
+
+    if questions:
+        source = preprocessing_report['source_size']
+        questions = normalize_questions(questions, source['width'], source['height'])
+    else:
+        questions = detect_questions(regions, image, answers)
+        if not questions:
+            raise ValueError("未能在参考图片中找到作答位置，请手动提交题目和作答单元格坐标")
+
+    answer_layout = build_worksheet_layout(
+        regions, width, height, compute_page_hash(image),
+        verify_count=settings.OCR_ANSWER_ONLY_VERIFY_REGIONS
+    )
+
+    return {
+        "width": width,
+        "height": height,
+        "fingerprint": fingerprint,
+        "questions": questions,
+        "verify_regions": select_verify_regions(
+            regions, width, height, settings.WORKSHEET_TEMPLATE_VERIFY_REGIONS
+        ),
+        "answer_layout": answer_layout.to_dict() if answer_layout is not None else None
+    }
+
+def _parse_json_form(value: Optional[str], field: str) -> Optional[List[Any]]:
+    if not value:
+        return None
+    try:
+        parsed = json.loads(value)
+    except json.JSONDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{field}不是有效的JSON"
+        )
+    if not isinstance(parsed, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{field}应为JSON数组"
+        )
+    return parsed
+
+@router.post("/worksheet-templates", response_model=WorksheetTemplateDetail, summary="登记练习纸模板")
+async def create_worksheet_template(
+    image: UploadFile = File(..., description="空白或已作答的练习纸参考图片"),
+    name: str = Form(..., description="模板名称"),
+    subject: str = Form("math", description="学科"),
+    grade_level: Optional[str] = Form(None, description="年级水平"),
+    description: Optional[str] = Form(None, description="模板描述"),
+    questions: Optional[str] = Form(None, description="题目列表JSON: [{number, question_text, bbox, answer}]"),
+    answers: Optional[str] = Form(None, description="自动查找作答单元格时按阅读顺序排列的标准答案JSON数组"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    登记固定版式的练习纸模板
+
+    - **image**: 参考图片
+    - **questions**: 题目列表，bbox为作答单元格在参考图片中的像素坐标 [x1, y1, x2, y2]，
+      answer为标准答案（缺省时按题目文字自动计算）
+    - **answers**: 不提交questions时，自动查找等号后空位、选择题括号和填空横线作为作答单元格，
+      answers按阅读顺序一一对应
+
+    之后批改的照片与模板匹配时，对齐后只识别作答单元格并与标准答案比较
+    """
+    _require_teacher(current_user)
+
+    if not image.content_type or not image.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="参考图片不是图片文件"
+        )
+
+    question_list = _parse_json_form(questions, "questions")
+    answer_list = _parse_json_form(answers, "answers")
+    content = await image.read()
+    if len(content) > settings.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="参考图片大小超过10MB限制"
+        )
+
+    try:
+        prepared = await asyncio.get_running_loop().run_in_executor(
+            None, _prepare_worksheet_template, content, question_list, answer_list
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    upload_dir = os.path.join(settings.UPLOAD_PATH, "worksheet_templates")
+    os.makedirs(upload_dir, exist_ok=True)
+    file_extension = os.path.splitext(image.filename or "template.jpg")[1] or ".jpg"
+    file_path = os.path.join(upload_dir, f"template_{uuid.uuid4().hex}{file_extension}")
+    async with aiofiles.open(file_path, 'wb') as f:
+        await f.write(content)
+
+    fingerprint = prepared["fingerprint"]
+    template = WorksheetTemplate(
+        user_id=current_user.id,
+        name=name,
+        description=description,
+        subject=subject,
+        grade_level=grade_level,
+        reference_image_url=f"/{file_path.replace(chr(92), '/')}",
+        width=prepared["width"],
+        height=prepared["height"],
+        fingerprint=fingerprint.to_bytes(),
+        keypoint_count=len(fingerprint.keypoints),
+        questions=prepared["questions"],
+        verify_regions=prepared["verify_regions"],
+        answer_layout=prepared["answer_layout"]
+    )
+    db.add(template)
+    db.commit()
+    db.refresh(template)
+
+    # 新模板立即参与匹配
+    worksheet_template_index.invalidate()
+    worksheet_layout_cache.invalidate()
+
+    return {
+        **_template_info(template),
+        "questions": template.questions,
+        "verify_regions": template.verify_regions or []
+    }
+
+@router.get("/worksheet-templates", response_model=List[WorksheetTemplateInfo], summary="获取练习纸模板列表")
+def list_worksheet_templates(
+    subject: Optional[str] = Query(None, description="学科"),
+    include_inactive: bool = Query(False, description="是否包含已停用的模板"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取当前教师登记的练习纸模板（管理员可查看全部）"""
+    _require_teacher(current_user)
+
+    query = db.query(WorksheetTemplate)
+    if current_user.role != 'admin':
+        query = query.filter(WorksheetTemplate.user_id == current_user.id)
+    if subject:
+        query = query.filter(WorksheetTemplate.subject == subject)
+    if not include_inactive:
+        query = query.filter(WorksheetTemplate.is_active == True)
+
+    templates = query.order_by(WorksheetTemplate.created_at.desc()).all()
+    return [_template_info(template) for template in templates]
+
+@router.get("/worksheet-templates/{template_id}", response_model=WorksheetTemplateDetail, summary="获取练习纸模板详情")
+def get_worksheet_template(
+    template_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取练习纸模板详情，包括题目、作答单元格（相对坐标）和标准答案"""
+    _require_teacher(current_user)
+    template = _get_owned_template(template_id, current_user, db)
+    return {
+        **_template_info(template),
+        "questions": template.questions or [],
+        "verify_regions": template.verify_regions or []
+    }
+
+@router.delete("/worksheet-templates/{template_id}", summary="停用练习纸模板")
+def delete_worksheet_template(
+    template_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """停用练习纸模板，之后批改的照片不再与其匹配"""
+    _require_teacher(current_user)
+    template = _get_owned_template(template_id, current_user, db)
+    template.is_active = False
+    db.commit()
+
+    worksheet_template_index.invalidate()
+    worksheet_layout_cache.invalidate()
+
+    return {"success": True, "message": "练习纸模板已停用", "template_id": template_id}
+
+class AnswerKeyCreate(BaseModel):
+    """登记标准答案请求"""
+    name: str = Field(..., description="答案名称（通常为作业标题）")
+    subject: str = Field(default="math", description="学科")
+    grade_level: Optional[str] = Field(default=None, description="年级水平")
+    description: Optional[str] = Field(default=None, description="描述")
+    worksheet_template_id: Optional[int] = Field(default=None, description="对应的练习纸模板ID")
+    questions: Optional[List[Dict[str, Any]]] = Field(
+        default=None,
+        description="题目列表: [{number, question_text, answer, question_type, knowledge_points, solution}]，"
+                    "指定练习纸模板时可省略，取模板中的题目"
+    )
+    confirm: bool = Field(default=False, description="直接确认（否则为待确认草稿）")
+
+class AnswerKeyConfirm(BaseModel):
+    """确认标准答案请求"""
+    answers: Dict[int, str] = Field(default_factory=dict, description="确认前修改的答案: {题号: 答案}")
+
+class AnswerKeyInfo(BaseModel):
+    """标准答案信息"""
+    id: int
+    name: str
+    description: Optional[str]
+    subject: str
+    grade_level: Optional[str]
+    worksheet_template_id: Optional[int]
+    question_count: int
+    status: str
+    is_active: bool
+    use_count: int
+    created_at: Optional[str]
+    confirmed_at: Optional[str]
+
+class AnswerKeyDetail(AnswerKeyInfo):
+    """标准答案详情"""
+    questions: List[Dict[str, Any]]
+
+def _answer_key_info(answer_key: AnswerKey) -> Dict[str, Any]:
+    return {
+        "id": answer_key.id,
+        "name": answer_key.name,
+        "description": answer_key.description,
+        "subject": answer_key.subject,
+        "grade_level": answer_key.grade_level,
+        "worksheet_template_id": answer_key.worksheet_template_id,
+        "question_count": answer_key.question_count,
+        "status": answer_key.status,
+        "is_active": bool(answer_key.is_active),
+        "use_count": answer_key.use_count or 0,
+        "created_at": answer_key.created_at.isoformat() if answer_key.created_at else None,
+        "confirmed_at": answer_key.confirmed_at.isoformat() if answer_key.confirmed_at else None
+    }
+
+def _answer_key_detail(answer_key: AnswerKey) -> Dict[str, Any]:
+    return {**_answer_key_info(answer_key), "questions": answer_key.questions or []}
+
+def _get_owned_answer_key(key_id: int, current_user: User, db: Session) -> AnswerKey:
+    answer_key = db.query(AnswerKey).filter(AnswerKey.id == key_id).first()
+    if not answer_key or (answer_key.user_id != current_user.id and current_user.role != 'admin'):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="标准答案不存在"
+        )
+    return answer_key
+
+@router.post("/answer-keys", response_model=AnswerKeyDetail, summary="登记标准答案")
+async def create_answer_key(
+    request: AnswerKeyCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    为布置的练习纸登记标准答案
+
+    - **questions**: 题目列表，answer缺省时按题目文字自动计算，需教师确认后才用于批改
+    - **worksheet_template_id**: 关联练习纸模板，匹配到该模板的照片自动使用此答案；
+      不提交questions时取模板中登记的题目和答案
+    - **confirm**: 直接确认；否则保存为草稿，核对自动计算的答案后调用确认接口
+
+    登记时每道题的题型、知识点、难度和解题步骤一次算好，批改时按题号直接取用
+    """
+    _require_teacher(current_user)
+
+    subject, questions = request.subject, request.questions
+    if request.worksheet_template_id is not None:
+        template = _get_owned_template(request.worksheet_template_id, current_user, db)
+        if template.subject != subject:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"学科与练习纸模板（{template.subject}）不一致"
+            )
+        if not questions:
+            questions = [
+                {
+                    "number": question["number"],
+                    "question_text": question.get("question_text"),
+                    "answer": question.get("answer"),
+                    "question_type": question.get("question_type"),
+                    "knowledge_points": question.get("knowledge_points")
+                }
+                for question in template.questions or []
+            ]
+    if not questions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="请提交题目和答案，或指定练习纸模板"
+        )
+
+    analysis_ai = HomeworkAnalysisAI()
+    try:
+        key_questions = await asyncio.get_running_loop().run_in_executor(
+            None, analysis_ai.build_answer_key, questions, subject, request.grade_level or ''
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    answer_key = AnswerKey(
+        user_id=current_user.id,
+        worksheet_template_id=request.worksheet_template_id,
+        name=request.name,
+        description=request.description,
+        subject=subject,
+        grade_level=request.grade_level,
+        questions=key_questions,
+        status="confirmed" if request.confirm else "draft",
+        confirmed_at=datetime.now() if request.confirm else None
+    )
+    db.add(answer_key)
+    db.commit()
+    db.refresh(answer_key)
+
+    if request.confirm:
+        answer_key_index.invalidate()
+
+    return _answer_key_detail(answer_key)
+
+@router.get("/answer-keys", response_model=List[AnswerKeyInfo], summary="获取标准答案列表")
+def list_answer_keys(
+    subject: Optional[str] = Query(None, description="学科"),
+    worksheet_template_id: Optional[int] = Query(None, description="练习纸模板ID"),
+    include_inactive: bool = Query(False, description="是否包含已停用的答案"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取当前教师登记的标准答案（管理员可查看全部）"""
+    _require_teacher(current_user)
+
+    query = db.query(AnswerKey)
+    if current_user.role != 'admin':
+        query = query.filter(AnswerKey.user_id == current_user.id)
+    if subject:
+        query = query.filter(AnswerKey.subject == subject)
+    if worksheet_template_id is not None:
+        query = query.filter(AnswerKey.worksheet_template_id == worksheet_template_id)
+    if not include_inactive:
+        query = query.filter(AnswerKey.is_active == True)
+
+    answer_keys = query.order_by(AnswerKey.created_at.desc()).all()
+    return [_answer_key_info(answer_key) for answer_key in answer_keys]
+
+@router.get("/answer-keys/{key_id}", response_model=AnswerKeyDetail, summary="获取标准答案详情")
+def get_answer_key(
+    key_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取标准答案详情，包括每道题的答案、自动计算的答案和答案来源"""
+    _require_teacher(current_user)
+    return _answer_key_detail(_get_owned_answer_key(key_id, current_user, db))
+
+@router.post("/answer-keys/{key_id}/confirm", response_model=AnswerKeyDetail, summary="确认标准答案")
+def confirm_answer_key(
+    key_id: int,
+    request: AnswerKeyConfirm,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    确认标准答案，之后批改时使用
+
+    - **answers**: 需要修改的答案 {题号: 答案}；修改后该题不再使用自动生成的解题步骤
+    """
+    _require_teacher(current_user)
+    answer_key = _get_owned_answer_key(key_id, current_user, db)
+
+    questions = [dict(question) for question in answer_key.questions or []]
+    numbers = {question["question_number"] for question in questions}
+    unknown = sorted(set(request.answers) - numbers)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"标准答案中没有题号: {', '.join(str(number) for number in unknown)}"
+        )
+    for question in questions:
+        answer = request.answers.get(question["question_number"])
+        if answer is None:
+            continue
+        answer = answer.strip()
+        if answer != question["expected_answer"]:
+            question["expected_answer"] = answer
+            question["answer_source"] = "teacher"
+            if answer != question.get("auto_answer"):
+                question["step_by_step_solution"] = []
+
+    answer_key.questions = questions
+    answer_key.status = "confirmed"
+    answer_key.confirmed_at = datetime.now()
+    db.commit()
+    db.refresh(answer_key)
+
+    answer_key_index.invalidate()
+
+    return _answer_key_detail(answer_key)
+
+@router.delete("/answer-keys/{key_id}", summary="停用标准答案")
+def delete_answer_key(
+    key_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """停用标准答案，之后批改时不再使用"""
+    _require_teacher(current_user)
+    answer_key = _get_owned_answer_key(key_id, current_user, db)
+    answer_key.is_active = False
+    db.commit()
+
+    answer_key_index.invalidate()
+
+    return {"success": True, "message": "标准答案已停用", "key_id": key_id}
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -57,6 +57,96 @@ class Settings(BaseSettings):
     # OCR服务配置
     BAIDU_OCR_API_KEY: str = ""
     BAIDU_OCR_SECRET_KEY: str = ""
+
+    # 本地OCR引擎配置
+    OCR_EASYOCR_LANGS: List[str] = ["ch_sim", "en"]
+    OCR_PADDLE_LANG: str = "ch"
+    OCR_USE_GPU: bool = False
+    OCR_PRELOAD_ENGINES: bool = False  # 启动时预加载OCR模型
+    OCR_WORKER_MODE: str = "inprocess"  # OCR模型位置: inprocess(API进程内)/pooled(共享OCR工作进程池)
+    OCR_WORKER_SOCKET: str = "/tmp/zyjc_ocr_worker.sock"  # OCR工作进程池UNIX socket
+    OCR_WORKER_PROCESSES: int = 2  # OCR工作进程数（即模型份数）
+    OCR_WORKER_TIMEOUT: float = 30.0  # 等待OCR工作进程池响应的超时（秒）
+    OCR_EXECUTION_MODE: str = "sequential"  # 多引擎执行方式: sequential/concurrent/cascade
+    OCR_CASCADE_PRIMARY: str = "paddleocr"  # 级联模式的主引擎，不可用时取第一个可用引擎
+    OCR_CASCADE_CONFIDENCE_THRESHOLD: float = 0.8  # 低于该置信度的区域交给次引擎重识别
+    OCR_CASCADE_PADDING: int = 8  # 重识别裁剪时的外扩像素
+    OCR_ROUTING_ENABLED: bool = False  # 按学科选择OCR引擎和识别语言（会改变识别结果，对比后再开启）
+    OCR_ROUTING_RULES: Dict[str, Dict[str, List[str]]] = {
+        "english": {"easyocr": ["en"]},
+        "chinese": {"paddleocr": ["ch"]},
+        "math": {"paddleocr": ["ch"]}
+    }  # {学科: {引擎: [语言]}}，未配置的学科使用全部可用引擎
+    OCR_MICRO_BATCH_ENABLED: bool = False  # 合并并发请求的图片为批量识别（按批大小分布确认有收益后再开启）
+    OCR_MICRO_BATCH_SIZE: int = 8  # 单批最多图片数
+    OCR_MICRO_BATCH_WAIT_MS: float = 10.0  # 凑批最长等待时间（毫秒）
+    OCR_MICRO_BATCH_BUCKET: int = 64  # EasyOCR批量识别前把图片补白到该像素粒度的相同尺寸
+    OCR_ENGINE_MAX_WORKERS: int = 4  # 并发模式下引擎线程池大小
+    OCR_PAGE_DEADLINE_SECONDS: float = 20.0  # 并发模式下单页OCR截止时间
+    OCR_RESULT_CACHE_ENABLED: bool = True  # 按图片内容缓存OCR结果
+    OCR_RESULT_CACHE_SIZE: int = 256  # 进程内缓存条数
+    OCR_RESULT_CACHE_REDIS: bool = True  # 同时写入Redis缓存
+    OCR_TARGET_LONG_SIDE: int = 2048  # 预处理目标长边，大图按此降采样解码
+    OCR_MIN_WIDTH: int = 800  # 小于最小尺寸的图片放大
+    OCR_MIN_HEIGHT: int = 600
+    OCR_PREPROCESS_GRAYSCALE: bool = True  # 在灰度图上预处理并送入OCR
+    OCR_LAYOUT_ANALYSIS: bool = False  # OCR前按投影切分题目区块，逐块并行识别（会改变识别结果，先对比整页识别再开启）
+    OCR_ANSWER_ONLY_ENABLED: bool = False  # 教师登记过的练习纸只OCR作答区域，印刷题目文字复用模板保存的布局
+    OCR_ANSWER_ONLY_MAX_LAYOUTS: int = 256  # 加载的练习纸布局数（最近登记的模板）
+    OCR_ANSWER_ONLY_HASH_DISTANCE: int = 10  # 匹配练习纸布局的pHash/dHash汉明距离上限
+    OCR_ANSWER_ONLY_MARGIN: float = 0.01  # 作答区域四周额外留出的边距（占页面尺寸），容忍拍摄偏移
+    OCR_ANSWER_ONLY_VERIFY_REGIONS: int = 3  # 复用前抽查的印刷文字行数
+    OCR_ANSWER_ONLY_MIN_SIMILARITY: float = 0.8  # 抽查文字与缓存的最低相似度，低于时回退整页识别
+    OMR_ENABLED: bool = False  # 按选项周围的墨迹识别选择题的勾选、圈选和涂黑（对比后再开启）
+    OMR_MIN_MARK_DENSITY: float = 0.06  # 选中选项的墨迹密度需高出同题其他选项中位数的幅度
+    OMR_MIN_CONFIDENCE: float = 0.5  # 低于此置信度的标记不作为学生的选择
+    OCR_QUALITY_GATE_ENABLED: bool = False  # OCR前检查图片质量，不合格直接拒绝（阈值确认后再开启）
+    OCR_QUALITY_MIN_SHORT_SIDE: int = 480  # 原图短边下限（像素）
+    OCR_QUALITY_MIN_SHARPNESS: float = 50.0  # 拉普拉斯方差下限（512长边灰度图上计算）
+    OCR_QUALITY_MIN_PAPER_LEVEL: float = 80.0  # 纸面亮度（灰度95分位）下限
+    OCR_QUALITY_MAX_INK_LEVEL: float = 170.0  # 字迹亮度（灰度1分位）上限
+    OCR_QUALITY_MIN_CONTRAST: float = 50.0  # 纸面与字迹亮度差下限
+    OCR_QUALITY_MIN_TEXT_AREA: float = 0.01  # 文字区域面积占比下限
+
+    # 练习纸模板（固定版式练习纸只识别已知的作答单元格）
+    WORKSHEET_TEMPLATE_MATCHING: bool = True  # 批改前与已登记的练习纸模板匹配，匹配成功后只识别作答单元格
+    WORKSHEET_TEMPLATE_FEATURES: int = 2000  # 每张图片提取的ORB关键点数量上限
+    WORKSHEET_TEMPLATE_LONG_SIDE: int = 1280  # 提取特征时图片缩小到的长边
+    WORKSHEET_TEMPLATE_MAX_CANDIDATES: int = 5  # 按投影签名预筛后参与特征匹配的模板数
+    WORKSHEET_TEMPLATE_MIN_INLIERS: int = 30  # 单应性矩阵RANSAC内点数下限
+    WORKSHEET_TEMPLATE_MIN_INLIER_RATIO: float = 0.25  # 内点占通过比值检验的匹配数的比例下限
+    WORKSHEET_TEMPLATE_VERIFY_REGIONS: int = 3  # 登记时抽取的校验文字行数
+    WORKSHEET_TEMPLATE_MIN_SIMILARITY: float = 0.8  # 对齐后抽查文字与模板的最低相似度，低于时回退通用批改
+    WORKSHEET_TEMPLATE_REFRESH_SECONDS: int = 60  # 模板索引从数据库重新加载的间隔（秒）
+
+    # 题目分析缓存（同一份练习纸的题型、知识点、难度、标准答案和解题步骤只分析一次）
+    QUESTION_ANALYSIS_CACHE_ENABLED: bool = True  # 按学科、年级和规范化题目文字缓存题目分析结果
+    QUESTION_ANALYSIS_CACHE_SIZE: int = 4096  # 进程内缓存条数
+    QUESTION_ANALYSIS_CACHE_REDIS: bool = True  # 同时写入Redis缓存，多个进程共享
+    QUESTION_ANALYSIS_CACHE_TTL: int = 7 * 24 * 3600  # Redis缓存过期时间（秒）
+
+    # 标准答案（教师为布置的练习纸登记答案，批改时按题号查找）
+    ANSWER_KEY_REFRESH_SECONDS: int = 60  # 已确认答案索引从数据库重新加载的间隔（秒）
+
+    # 重复提交检测（页面感知哈希）
+    HOMEWORK_DUPLICATE_DETECTION: bool = True  # 上传时计算页面哈希并查找近似重复的历史作业
+    HOMEWORK_DUPLICATE_PHASH_DISTANCE: int = 8  # pHash汉明距离上限（64位）
+    HOMEWORK_DUPLICATE_DHASH_DISTANCE: int = 10  # dHash汉明距离上限（64位）
+    HOMEWORK_DUPLICATE_LOOKBACK_DAYS: int = 30  # 只与最近N天的作业比较
+    HOMEWORK_DUPLICATE_MAX_CANDIDATES: int = 500  # 每次最多比较的历史作业数
+
+    # 批改任务执行（同步的OCR和批改流程在有界线程池中执行，不阻塞事件循环）
+    GRADING_MAX_WORKERS: int = 4  # 同时执行的批改任务数
+    GRADING_MAX_QUEUE: int = 16  # 等待执行的批改任务上限，超出时返回503
+    GRADING_RETRY_AFTER_SECONDS: int = 5  # 503响应的Retry-After
+    GRADING_WORKER_PROCESSES: int = 2  # 批改工作进程数（python -m app.workers.grading_worker）
+    GRADING_WORKER_POLL_INTERVAL: float = 1.0  # 队列为空时工作进程的轮询间隔（秒）
+    GRADING_JOB_MAX_ATTEMPTS: int = 3  # 批改任务最多执行次数
+    GRADING_JOB_RETRY_DELAY_SECONDS: float = 30.0  # 失败后重新排队的延迟（秒），按执行次数递增
+    GRADING_JOB_LEASE_SECONDS: float = 300.0  # 批改任务的租约，每批改完一页续租，超时未续租视为工作进程异常
+    EVENT_LOOP_LAG_MONITOR: bool = True  # 定时测量事件循环延迟
+    EVENT_LOOP_LAG_INTERVAL: float = 0.5  # 测量间隔（秒）
+    EVENT_LOOP_LAG_WARN_MS: float = 200.0  # 延迟超过该值时打印警告（毫秒）
     
     # 文件存储配置
     UPLOAD_PATH: str = "uploads"
@@ -0,0 +1,75 @@
+"""
+事件循环延迟监控
+后台任务按固定间隔sleep，实际唤醒时间比预期晚多少就是事件循环被阻塞的时长。
+延迟持续偏高说明有同步计算或阻塞IO跑在了事件循环上
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class EventLoopLagMonitor:
+    """事件循环延迟监控器"""
+
+    def __init__(self, interval: float = 0.5, warn_ms: float = 200.0, window: int = 240):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self._samples: deque = deque(maxlen=window)  # 最近的延迟（毫秒）
+        self._task: Optional[asyncio.Task] = None
+        self.sample_count = 0
+        self.max_lag_ms = 0.0
+        self.warn_count = 0
+
+    @classmethod
+    def from_settings(cls) -> 'EventLoopLagMonitor':
+        return cls(interval=settings.EVENT_LOOP_LAG_INTERVAL, warn_ms=settings.EVENT_LOOP_LAG_WARN_MS)
+
+    def start(self):
+        """在当前事件循环中启动监控任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(time.perf_counter() - expected, 0.0) * 1000)
+
+    def record(self, lag_ms: float):
+        self._samples.append(lag_ms)
+        self.sample_count += 1
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        if lag_ms >= self.warn_ms:
+            self.warn_count += 1
+            print(f"事件循环阻塞 {lag_ms:.0f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        samples = np.array(self._samples) if self._samples else np.zeros(1)
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'interval_ms': self.interval * 1000,
+            'samples': self.sample_count,
+            'last_lag_ms': round(float(samples[-1]), 2),
+            'p50_lag_ms': round(float(np.percentile(samples, 50)), 2),
+            'p99_lag_ms': round(float(np.percentile(samples, 99)), 2),
+            'max_lag_ms': round(self.max_lag_ms, 2),
+            'warn_count': self.warn_count
+        }
+
+
+# 全局事件循环延迟监控器
+event_loop_monitor = EventLoopLagMonitor.from_settings()
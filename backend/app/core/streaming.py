@@ -0,0 +1,69 @@
+"""
+批量接口的流式响应
+多张图片并行处理，每张完成后立即输出一条记录（NDJSON每行一个JSON，或Server-Sent Events），
+最后输出汇总记录；客户端断开连接时取消尚未开始的处理
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterable, Optional, TypeVar
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+
+T = TypeVar('T')
+
+# 流式格式及其Content-Type
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+
+def check_stream_format(stream: Optional[str]) -> Optional[str]:
+    """校验流式格式参数，不流式输出时返回None"""
+    if not stream:
+        return None
+    if stream not in STREAM_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支持的流式格式: {stream}，可选: {', '.join(STREAM_FORMATS)}"
+        )
+    return stream
+
+
+async def iter_as_completed(awaitables: Iterable[Awaitable[T]]) -> AsyncIterator[T]:
+    """
+    同时执行所有任务，按完成顺序逐个产出结果
+
+    迭代提前结束（客户端断开、异常）时取消其余任务：尚在批改线程池中排队的任务不再执行，
+    已开始的任务执行完后结果被丢弃
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def encode_record(record: Dict[str, Any], stream: str) -> str:
+    """编码一条记录，SSE的事件名取记录的type字段"""
+    data = json.dumps(record, ensure_ascii=False, default=str)
+    if stream == 'sse':
+        return f"event: {record.get('type', 'message')}\ndata: {data}\n\n"
+    return data + '\n'
+
+
+def stream_records(records: AsyncIterator[Dict[str, Any]], stream: str) -> StreamingResponse:
+    """把记录流包装为流式响应"""
+    async def body():
+        async for record in records:
+            yield encode_record(record, stream)
+
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_FORMATS[stream],
+        # 关闭代理缓冲，每条记录到达后立即转发给客户端
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -12,6 +12,9 @@ from app.middleware.cors import setup_cors
 from app.middleware.logging import logging_middleware
 from app.middleware.rate_limit import rate_limit_middleware
 from app.api.v1.router import api_router
+from app.core.event_loop_monitor import event_loop_monitor
+from app.services.ocr_engine_registry import ocr_engine_registry
+from app.services.grading_executor import grading_executor
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -21,10 +24,22 @@ async def lifespan(app: FastAPI):
     init_db()
     logger.info("数据库初始化完成")
     
+    # 预加载OCR模型（进程内共享，避免首个请求承担加载耗时）
+    # 进程池模式下模型由OCR工作进程持有，API进程不加载
+    if settings.OCR_PRELOAD_ENGINES and settings.OCR_WORKER_MODE != 'pooled':
+        logger.info("正在预加载OCR模型...")
+        ocr_engine_registry.warmup()
+        logger.info(f"OCR模型预加载完成: {ocr_engine_registry.status()}")
+    
+    # 监控事件循环延迟，确认OCR批改负载下其他请求仍能及时响应
+    if settings.EVENT_LOOP_LAG_MONITOR:
+        event_loop_monitor.start()
+    
     yield
     
     # 关闭时清理资源
     logger.info("正在关闭应用...")
+    await event_loop_monitor.stop()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -71,7 +86,9 @@ async def health_check():
         "status": "healthy",
         "timestamp": time.time(),
         "version": "1.0.0",
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        "event_loop": event_loop_monitor.stats(),
+        "grading": grading_executor.stats()
     }
 
 # 根路径重定向
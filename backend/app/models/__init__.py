@@ -11,6 +11,9 @@ from .exercise import (
     ExerciseDownload,
     ExerciseUsageStats
 )
+from .worksheet_template import WorksheetTemplate
+from .grading_job import GradingJob
+from .answer_key import AnswerKey
 
 __all__ = [
     "User",
@@ -24,5 +27,8 @@ __all__ = [
     "GeneratedExercise", 
     "ExerciseTemplate",
     "ExerciseDownload",
-    "ExerciseUsageStats"
+    "ExerciseUsageStats",
+    "WorksheetTemplate",
+    "GradingJob",
+    "AnswerKey"
 ]
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+标准答案数据模型
+教师为布置的练习纸登记或确认标准答案，批改时按题号直接取出每道题的题目分析和答案，不再逐题计算
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class AnswerKey(Base):
+    """标准答案表"""
+    __tablename__ = "answer_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True, comment="登记答案的教师ID")
+    worksheet_template_id = Column(Integer, ForeignKey("worksheet_templates.id"), nullable=True,
+                                   comment="对应的练习纸模板ID，匹配到该模板的照片自动使用此答案")
+
+    # 基本信息
+    name = Column(String(200), nullable=False, comment="答案名称（通常为作业标题）")
+    description = Column(Text, nullable=True, comment="描述")
+    subject = Column(String(50), nullable=False, comment="学科")
+    grade_level = Column(String(20), nullable=True, comment="年级水平")
+
+    # 按题号排列的题目分析和标准答案
+    questions = Column(JSON, nullable=False, comment="题目列表: 题号、题目文字、标准答案、题型、知识点、难度、解题步骤")
+
+    # 状态和统计
+    status = Column(String(20), nullable=False, default="draft", comment="状态: draft(待确认)/confirmed(已确认，批改时使用)")
+    is_active = Column(Boolean, default=True, comment="是否启用")
+    use_count = Column(Integer, default=0, comment="批改时使用次数")
+
+    # 时间戳
+    created_at = Column(DateTime, default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), comment="更新时间")
+    confirmed_at = Column(DateTime, nullable=True, comment="确认时间")
+
+    # 按练习纸模板查找已确认的答案
+    __table_args__ = (
+        Index("ix_answer_keys_worksheet_template_id", "worksheet_template_id"),
+    )
+
+    def __repr__(self):
+        return f"<AnswerKey(id={self.id}, name={self.name}, status={self.status})>"
+
+    @property
+    def question_count(self) -> int:
+        """题目数量"""
+        return len(self.questions or [])
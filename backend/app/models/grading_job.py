@@ -0,0 +1,42 @@
+"""
+批改任务数据模型
+提交的作业写入批改任务表，由批改工作进程领取执行，进程重启后未完成的任务不会丢失
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class GradingJob(Base):
+    """批改任务表"""
+    __tablename__ = "grading_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    homework_id = Column(Integer, ForeignKey("homework.id"), nullable=False, index=True, comment="作业ID")
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="提交作业的用户ID")
+
+    # 任务内容
+    image_paths = Column(JSON, nullable=False, comment="作业图片路径列表（按页顺序）")
+    answer_key_id = Column(Integer, ForeignKey("answer_keys.id"), nullable=True, comment="批改使用的标准答案ID")
+
+    # 执行状态
+    status = Column(String(20), nullable=False, default="queued", comment="任务状态: queued/running/completed/failed")
+    attempts = Column(Integer, default=0, comment="已执行次数")
+    max_attempts = Column(Integer, default=3, comment="最多执行次数")
+    worker_id = Column(String(100), nullable=True, comment="领取任务的工作进程")
+    available_at = Column(DateTime, default=func.now(), comment="可被领取的时间（失败重试时延后）")
+    locked_until = Column(DateTime, nullable=True, comment="租约到期时间，工作进程异常退出后任务在此之后重新排队")
+    error_message = Column(Text, nullable=True, comment="最近一次失败的错误信息")
+
+    # 时间戳
+    created_at = Column(DateTime, default=func.now(), comment="创建时间")
+    started_at = Column(DateTime, nullable=True, comment="最近一次开始执行时间")
+    finished_at = Column(DateTime, nullable=True, comment="完成时间")
+
+    # 工作进程按状态和可领取时间取任务
+    __table_args__ = (
+        Index("ix_grading_jobs_status_available_at", "status", "available_at"),
+    )
+
+    def __repr__(self):
+        return f"<GradingJob(id={self.id}, homework_id={self.homework_id}, status={self.status})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, JSON, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, JSON, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -40,11 +40,21 @@ class Homework(Base):
     ocr_time = Column(Float, nullable=True, comment="OCR识别耗时")
     correction_time = Column(Float, nullable=True, comment="批改耗时")
     
+    # 重复提交检测
+    perceptual_hash = Column(String(32), nullable=True, comment="第一页的页面感知哈希: pHash+dHash（各16位十六进制）")
+    page_hashes = Column(JSON, nullable=True, comment="每页的页面感知哈希（按页序）")
+    duplicate_of_id = Column(Integer, ForeignKey("homework.id"), nullable=True, comment="复用批改结果的原作业ID")
+    
     # 时间戳
     created_at = Column(DateTime, default=func.now(), comment="创建时间")
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), comment="更新时间")
     completed_at = Column(DateTime, nullable=True, comment="完成时间")
     
+    # 按用户查找近似重复页面
+    __table_args__ = (
+        Index("ix_homework_user_perceptual_hash", "user_id", "perceptual_hash"),
+    )
+    
     def __repr__(self):
         return f"<Homework(id={self.id}, subject={self.subject}, accuracy={self.accuracy_rate})>"
     
@@ -0,0 +1,49 @@
+"""
+练习纸模板数据模型
+教师登记的固定版式练习纸（如口算练习），保存版面特征、题目位置和标准答案
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, LargeBinary
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class WorksheetTemplate(Base):
+    """练习纸模板表"""
+    __tablename__ = "worksheet_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True, comment="登记模板的教师ID")
+
+    # 基本信息
+    name = Column(String(200), nullable=False, comment="模板名称")
+    description = Column(Text, nullable=True, comment="模板描述")
+    subject = Column(String(50), nullable=False, comment="学科")
+    grade_level = Column(String(20), nullable=True, comment="年级水平")
+
+    # 参考图片
+    reference_image_url = Column(String(500), nullable=False, comment="参考图片URL")
+    width = Column(Integer, nullable=False, comment="参考图片宽度（模板坐标系）")
+    height = Column(Integer, nullable=False, comment="参考图片高度（模板坐标系）")
+
+    # 版面特征和题目
+    fingerprint = Column(LargeBinary, nullable=False, comment="版面特征: ORB关键点、描述子和投影签名(npz)")
+    keypoint_count = Column(Integer, default=0, comment="关键点数量")
+    questions = Column(JSON, nullable=False, comment="题目列表: 题号、题目文字、作答单元格（相对坐标）、标准答案")
+    verify_regions = Column(JSON, nullable=True, comment="匹配后抽查的印刷文字: 相对坐标和去掉作答内容的文字")
+    answer_layout = Column(JSON, nullable=True, comment="只识别作答区域时复用的布局: 页面哈希、印刷文字和作答区域")
+
+    # 状态和统计
+    is_active = Column(Boolean, default=True, comment="是否启用")
+    match_count = Column(Integer, default=0, comment="匹配次数")
+
+    # 时间戳
+    created_at = Column(DateTime, default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    def __repr__(self):
+        return f"<WorksheetTemplate(id={self.id}, name={self.name}, questions={len(self.questions or [])})>"
+
+    @property
+    def question_count(self) -> int:
+        """题目数量"""
+        return len(self.questions or [])
@@ -0,0 +1,191 @@
+"""
+标准答案索引
+教师为布置的练习纸登记标准答案时，每道题的题目分析（题型、知识点、难度、解题步骤）一次算好保存；
+批改时按答案ID或练习纸模板ID找到已确认的答案，再按题号直接取出题目分析和标准答案，
+每道题只评估学生作答，不再计算预期答案
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+
+@dataclass
+class AnswerKeyEntry:
+    """内存中的已确认答案"""
+    id: int
+    name: str
+    subject: str
+    grade_level: Optional[str]
+    worksheet_template_id: Optional[int]
+    questions: Dict[int, Dict[str, Any]]  # 题号 -> 题目分析字段（含标准答案）
+
+    @classmethod
+    def from_model(cls, answer_key: Any) -> 'AnswerKeyEntry':
+        return cls(
+            id=answer_key.id,
+            name=answer_key.name,
+            subject=answer_key.subject,
+            grade_level=answer_key.grade_level,
+            worksheet_template_id=answer_key.worksheet_template_id,
+            questions={int(question['question_number']): question for question in answer_key.questions or []}
+        )
+
+    def lookup(self, question_number: int) -> Optional[Dict[str, Any]]:
+        """按题号取题目分析，答案中没有该题时返回None"""
+        return self.questions.get(question_number)
+
+
+def normalize_answer_key_questions(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    校验教师提交的题目
+
+    每道题可包含number（缺省按顺序编号）、question_text、answer（缺省时按题目文字自动计算，待教师确认）、
+    question_type、knowledge_points和solution（解题步骤）；题号不能重复
+    """
+    normalized, numbers = [], set()
+    for index, question in enumerate(questions):
+        if not isinstance(question, dict):
+            raise ValueError(f"第{index + 1}题格式错误，应为JSON对象")
+        try:
+            number = int(question.get('number') or index + 1)
+        except (TypeError, ValueError):
+            raise ValueError(f"第{index + 1}题的题号不是整数")
+        if number in numbers:
+            raise ValueError(f"题号{number}重复")
+        numbers.add(number)
+
+        question_text = str(question.get('question_text') or '').strip()
+        answer = question.get('answer')
+        if not question_text and answer is None:
+            raise ValueError(f"第{number}题缺少题目文字和标准答案")
+
+        normalized.append({
+            'number': number,
+            'question_text': question_text,
+            'answer': None if answer is None else str(answer).strip(),
+            'question_type': question.get('question_type'),
+            'knowledge_points': question.get('knowledge_points') or [],
+            'solution': [str(step) for step in question.get('solution') or []]
+        })
+    return sorted(normalized, key=lambda question: question['number'])
+
+
+class AnswerKeyIndex:
+    """
+    已确认答案的内存索引（线程安全）
+
+    按答案ID和练习纸模板ID查找，首次查找时从数据库加载，之后每隔refresh_seconds重新加载，
+    答案确认或停用后调用invalidate立即生效；各答案的使用次数在重新加载时批量写回数据库
+    """
+
+    def __init__(self, refresh_seconds: int = 60):
+        self.refresh_seconds = refresh_seconds
+        self._by_id: Dict[int, AnswerKeyEntry] = {}
+        self._by_template: Dict[int, AnswerKeyEntry] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+        self.gradings = 0
+        self.matched_questions = 0
+        self.missing_questions = 0
+        self._pending_uses: Dict[int, int] = {}
+
+    @classmethod
+    def from_settings(cls) -> 'AnswerKeyIndex':
+        return cls(refresh_seconds=settings.ANSWER_KEY_REFRESH_SECONDS)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def load(self, db) -> int:
+        """写回使用次数并从数据库加载已确认的答案，返回答案数量"""
+        from app.models.answer_key import AnswerKey
+
+        with self._lock:
+            pending, self._pending_uses = self._pending_uses, {}
+        for key_id, count in pending.items():
+            db.query(AnswerKey).filter(AnswerKey.id == key_id).update(
+                {AnswerKey.use_count: AnswerKey.use_count + count},
+                synchronize_session=False
+            )
+        if pending:
+            db.commit()
+
+        answer_keys = db.query(AnswerKey).filter(
+            AnswerKey.is_active == True,
+            AnswerKey.status == 'confirmed'
+        ).order_by(AnswerKey.confirmed_at, AnswerKey.id).all()
+        by_id, by_template = {}, {}
+        for answer_key in answer_keys:
+            try:
+                entry = AnswerKeyEntry.from_model(answer_key)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"标准答案{answer_key.id}格式错误，已跳过: {e}")
+                continue
+            by_id[entry.id] = entry
+            if entry.worksheet_template_id is not None:
+                # 同一模板有多份答案时使用最后确认的
+                by_template[entry.worksheet_template_id] = entry
+        with self._lock:
+            self._by_id, self._by_template = by_id, by_template
+            self._loaded_at = time.monotonic()
+        return len(by_id)
+
+    def _ensure_loaded(self):
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+        if not stale:
+            return
+
+        from app.core.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            self.load(db)
+        except Exception as e:
+            print(f"加载标准答案失败: {e}")
+            with self._lock:
+                # 数据库不可用时沿用已加载的答案，等下个周期再试
+                self._loaded_at = time.monotonic()
+        finally:
+            db.close()
+
+    def get(self, key_id: int) -> Optional[AnswerKeyEntry]:
+        """按ID查找已确认的答案"""
+        self._ensure_loaded()
+        with self._lock:
+            return self._by_id.get(key_id)
+
+    def for_template(self, template_id: int) -> Optional[AnswerKeyEntry]:
+        """查找练习纸模板对应的已确认答案"""
+        self._ensure_loaded()
+        with self._lock:
+            return self._by_template.get(template_id)
+
+    def record(self, key_id: int, matched: int, missing: int):
+        """记录一次批改中按答案取到和未取到的题目数"""
+        with self._lock:
+            self.gradings += 1
+            self.matched_questions += matched
+            self.missing_questions += missing
+            self._pending_uses[key_id] = self._pending_uses.get(key_id, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.matched_questions + self.missing_questions
+            return {
+                'answer_keys': len(self._by_id),
+                'worksheet_templates': len(self._by_template),
+                'gradings': self.gradings,
+                'matched_questions': self.matched_questions,
+                'missing_questions': self.missing_questions,
+                'match_rate': round(self.matched_questions / total, 3) if total else 0.0
+            }
+
+
+# 全局标准答案索引
+answer_key_index = AnswerKeyIndex.from_settings()
@@ -0,0 +1,402 @@
+"""
+作答区域OCR
+同一份练习纸的印刷题目只需要识别一次：教师登记练习纸模板时，从参考图片的整页识别结果中记录题目文字和作答区域
+（等号后的空位、选择题括号、填空横线）在页面上的相对位置，随模板保存。
+之后提交的同一份练习纸按页面感知哈希找到布局，只裁剪作答区域送入OCR，再与保存的题目文字拼回整页识别结果
+
+布局不从学生提交的照片学习：作答区域以外的手写内容（如"答：一共花了45元。"）与印刷文字无法区分，
+会被带入之后每个学生的识别结果。
+页面哈希无法区分同一模板上题目不同的练习纸，因此每次复用前会抽查几行印刷文字，
+与布局不一致时回退到整页识别
+"""
+import difflib
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.layout_analysis import LayoutBlock
+from app.services.ocr_regions import TextRegionBatch
+from app.services.perceptual_hash import PageHash, hamming_distances
+
+# 作答位置：等号之后的空位（或参考图片上已写的答案）、选择题括号内、填空横线
+SLOT_PATTERN = re.compile(
+    r'(?P<equation>(?<=[=＝])[ \t]*(?:_{2,}|[^\s_（(=＝]*))'
+    r'|(?P<bracket>(?<=[（(])[\sA-Ha-h]*(?=[）)]))'
+    r'|(?P<blank>_{2,})'
+)
+
+# 区块识别结果中可能带入的等号、括号和横线
+_ANSWER_STRIP = ' =＝()（）_'
+
+
+def clean_answer(text: str) -> str:
+    """去掉作答区域识别结果中带入的等号左侧文字、括号和横线"""
+    return re.split(r'[=＝]', text)[-1].strip(_ANSWER_STRIP)
+
+
+def char_offset(text: str, index: int) -> float:
+    """第index个字符在文字区域中的水平位置（占区域宽度的比例，中文按两个字符宽计算）"""
+    if not text:
+        return 0.0
+    weights = [2 if ord(char) > 0x2e80 else 1 for char in text]
+    return sum(weights[:index]) / sum(weights)
+
+
+@dataclass
+class AnswerArea:
+    """
+    作答区域（页面相对坐标）
+
+    一行印刷文字可以有多个作答位置（如一行四道口算题），按从左到右的顺序各自记录
+    与上一个作答位置之间的印刷文字，行内最后一个作答位置另记行尾文字
+    """
+    region_index: int  # 所在印刷文字区域
+    kind: str  # equation/bracket/blank
+    bbox: Tuple[float, float, float, float]
+    prefix: str  # 与上一个作答位置之间的印刷文字
+    suffix: str = ''  # 行内最后一个作答位置之后的印刷文字
+    placeholder: str = ''  # 未作答时保留的原文（填空横线）
+
+    def compose(self, answer: str) -> str:
+        """把识别出的作答内容填回印刷文字"""
+        if self.kind == 'equation':
+            # 裁剪区域左侧可能带入等号前的印刷文字
+            answer = clean_answer(answer) or self.placeholder
+            return f"{self.prefix.rstrip()} {answer}".rstrip() + self.suffix
+        return f"{self.prefix}{answer.strip(_ANSWER_STRIP) or self.placeholder}{self.suffix}"
+
+
+@dataclass
+class WorksheetLayout:
+    """一份练习纸的印刷文字和作答区域"""
+    layout_id: int  # 所属练习纸模板ID
+    page_hash: PageHash
+    texts: List[str]  # 印刷文字（已去掉作答内容）
+    bboxes: np.ndarray  # 印刷文字区域，页面相对坐标 (N, 4)
+    confidences: np.ndarray
+    answer_areas: List[AnswerArea]  # 按区域、行内从左到右排列
+    verify_indices: List[int]  # 复用前抽查的印刷文字区域
+    verify_texts: List[str]  # 抽查区域去掉作答内容后的印刷文字
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+    def compose_texts(self, answers: List[str]) -> List[str]:
+        """按作答区域的识别结果重建每个区域的文字"""
+        texts = list(self.texts)
+        filled: Dict[int, List[str]] = {}
+        for area, answer in zip(self.answer_areas, answers):
+            filled.setdefault(area.region_index, []).append(area.compose(answer))
+        for index, parts in filled.items():
+            texts[index] = ''.join(parts)
+        return texts
+
+    def to_dict(self) -> Dict[str, Any]:
+        """随练习纸模板保存的JSON格式"""
+        return {
+            'page_hash': self.page_hash.to_string(),
+            'texts': self.texts,
+            'bboxes': self.bboxes.round(4).tolist(),
+            'confidences': [round(float(value), 4) for value in self.confidences],
+            'answer_areas': [asdict(area) for area in self.answer_areas],
+            'verify_indices': self.verify_indices,
+            'verify_texts': self.verify_texts
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], layout_id: int) -> 'WorksheetLayout':
+        return cls(
+            layout_id=layout_id,
+            page_hash=PageHash.from_string(data['page_hash']),
+            texts=list(data['texts']),
+            bboxes=np.array(data['bboxes'], dtype=np.float64).reshape(-1, 4),
+            confidences=np.array(data['confidences'], dtype=np.float32),
+            answer_areas=[AnswerArea(**{**area, 'bbox': tuple(area['bbox'])}) for area in data['answer_areas']],
+            verify_indices=[int(index) for index in data['verify_indices']],
+            verify_texts=list(data['verify_texts'])
+        )
+
+    def scaled_bboxes(self, width: int, height: int) -> np.ndarray:
+        return np.rint(self.bboxes * [width, height, width, height]).astype(np.int32)
+
+    def area_blocks(self, width: int, height: int, margin: float) -> List[LayoutBlock]:
+        """作答区域换算为当前页面的裁剪区块，四周留出margin（占页面尺寸）容忍拍摄偏移"""
+        blocks = []
+        for area in self.answer_areas:
+            x1, y1, x2, y2 = area.bbox
+            blocks.append(LayoutBlock(
+                max(int((x1 - margin) * width), 0),
+                max(int((y1 - margin) * height), 0),
+                min(int((x2 + margin) * width), width),
+                min(int((y2 + margin) * height), height),
+                ink_ratio=0.0
+            ))
+        return blocks
+
+    def verify_blocks(self, width: int, height: int, margin: float) -> List[LayoutBlock]:
+        bboxes = self.scaled_bboxes(width, height)
+        pad_x, pad_y = int(margin * width), int(margin * height)
+        return [
+            LayoutBlock(
+                max(int(bboxes[i, 0]) - pad_x, 0), max(int(bboxes[i, 1]) - pad_y, 0),
+                min(int(bboxes[i, 2]) + pad_x, width), min(int(bboxes[i, 3]) + pad_y, height),
+                ink_ratio=0.0
+            )
+            for i in self.verify_indices
+        ]
+
+    def ocr_area_ratio(self, width: int, height: int, margin: float) -> float:
+        blocks = self.area_blocks(width, height, margin) + self.verify_blocks(width, height, margin)
+        return round(sum(block.area for block in blocks) / float(width * height), 3)
+
+
+def _find_answer_areas(text: str, bbox: List[int], index: int,
+                       page_width: int) -> List[Tuple[AnswerArea, Tuple[int, int, int, int]]]:
+    """
+    查找一个文字区域中的所有作答位置
+
+    Returns:
+        [(作答区域, 整页像素坐标), ...]
+    """
+    x1, y1, x2, y2 = bbox
+    width, height = x2 - x1, y2 - y1
+    pad = height // 2
+
+    found = []
+    previous_end = 0
+    for match in SLOT_PATTERN.finditer(text):
+        kind = match.lastgroup
+        slot = match.group()
+        if kind == 'blank' and not slot:
+            continue
+
+        start = x1 + int(width * char_offset(text, match.start()))
+        end = x1 + int(width * char_offset(text, match.end()))
+        if kind == 'equation':
+            # 行尾的等号后面留出手写答案的位置（答案可能被识别为右侧单独的区域）
+            at_line_end = not text[match.end():].strip()
+            end = max(end, start + height * (4 if at_line_end else 2))
+            if at_line_end:
+                end = max(end, x2)
+        pixels = (start - pad, y1 - pad, min(end + pad, page_width), y2 + pad)
+
+        placeholder = slot.strip() if set(slot.strip()) == {'_'} else ''
+        area = AnswerArea(index, kind, (0.0, 0.0, 0.0, 0.0), text[previous_end:match.start()],
+                          placeholder=placeholder)
+        found.append((area, pixels))
+        previous_end = match.end()
+
+    if found:
+        found[-1][0].suffix = text[previous_end:]
+    return found
+
+
+def center_inside(bboxes: np.ndarray, box: Tuple[int, int, int, int]) -> np.ndarray:
+    """中心落在box内的区域"""
+    centers_x = (bboxes[:, 0] + bboxes[:, 2]) / 2
+    centers_y = (bboxes[:, 1] + bboxes[:, 3]) / 2
+    return (centers_x >= box[0]) & (centers_x <= box[2]) & (centers_y >= box[1]) & (centers_y <= box[3])
+
+
+def printed_text(text: str) -> str:
+    """去掉作答位置内容和空白后的印刷文字（作答位置按原始识别结果查找）"""
+    return ''.join(SLOT_PATTERN.sub('', text).split())
+
+
+def choose_verify_indices(texts: List[str], keep: np.ndarray, bboxes: np.ndarray, count: int) -> List[int]:
+    """
+    从上到下均匀抽取几行足够长的印刷文字用于复用前校验
+
+    口算练习等页面几乎每行都有作答位置，只抽没有作答位置的行会只剩标题，
+    而同类练习纸的标题相同，因此带作答位置的行也参与抽查（比较时去掉作答内容）
+    """
+    candidates = [
+        i for i in np.argsort(bboxes[:, 1], kind='stable').tolist()
+        if len(printed_text(texts[keep[i]])) >= 4
+    ]
+    if len(candidates) <= count:
+        return candidates
+    positions = np.linspace(0, len(candidates) - 1, count).round().astype(int)
+    return [candidates[p] for p in positions]
+
+
+def build_worksheet_layout(regions: TextRegionBatch, width: int, height: int, page_hash: PageHash,
+                           verify_count: int = 2) -> Optional[WorksheetLayout]:
+    """
+    从参考图片的整页识别结果中提取印刷文字和作答区域
+
+    落在作答区域内的其他区域（参考图片上已写的答案）不计入印刷文字；
+    页面上没有可识别的作答区域时返回None
+    """
+    if not len(regions):
+        return None
+
+    bboxes = regions.bboxes
+    areas: List[AnswerArea] = []
+    area_pixels: List[Tuple[int, int, int, int]] = []
+    for index, (text, bbox) in enumerate(zip(regions.texts, bboxes.tolist())):
+        for area, pixels in _find_answer_areas(text, bbox, index, width):
+            areas.append(area)
+            area_pixels.append(pixels)
+    if not areas:
+        return None
+
+    # 作答区域内的独立区域是已写的答案
+    owners = {area.region_index for area in areas}
+    answer_mask = np.zeros(len(regions), dtype=bool)
+    for pixels in area_pixels:
+        answer_mask |= center_inside(bboxes, pixels)
+    answer_mask[list(owners)] = False
+    keep = np.flatnonzero(~answer_mask)
+    remap = {int(old): new for new, old in enumerate(keep)}
+
+    scale = np.array([width, height, width, height], dtype=np.float64)
+    for area, pixels in zip(areas, area_pixels):
+        area.region_index = remap[area.region_index]
+        area.bbox = tuple(np.clip(np.array(pixels) / scale, 0.0, 1.0).round(4).tolist())
+
+    kept_bboxes = bboxes[keep] / scale
+    layout = WorksheetLayout(
+        layout_id=0,
+        page_hash=page_hash,
+        texts=[regions.texts[i] for i in keep],
+        bboxes=kept_bboxes,
+        confidences=regions.confidences[keep].copy(),
+        answer_areas=areas,
+        verify_indices=choose_verify_indices(regions.texts, keep, kept_bboxes, verify_count),
+        verify_texts=[]
+    )
+    layout.verify_texts = [printed_text(layout.texts[i]) for i in layout.verify_indices]
+    # 印刷文字中去掉已写的作答内容
+    layout.texts = layout.compose_texts([''] * len(areas))
+    return layout
+
+
+def text_similarity(a: str, b: str) -> float:
+    """去掉空白后的文字相似度"""
+    a, b = ''.join(a.split()), ''.join(b.split())
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+class WorksheetLayoutCache:
+    """
+    教师登记的练习纸布局索引（线程安全），按页面感知哈希查找
+
+    布局随练习纸模板保存，首次查找时从数据库加载启用模板的布局，之后每隔refresh_seconds重新加载，
+    模板登记或停用后调用invalidate立即生效；批改队列的工作进程各自加载，看到的布局一致
+    """
+
+    def __init__(self, max_size: int = 256, max_distance: int = 10, refresh_seconds: int = 60):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.refresh_seconds = refresh_seconds
+        self._layouts: List[WorksheetLayout] = []
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.verify_failures = 0
+
+    @classmethod
+    def from_settings(cls) -> 'WorksheetLayoutCache':
+        return cls(
+            max_size=settings.OCR_ANSWER_ONLY_MAX_LAYOUTS,
+            max_distance=settings.OCR_ANSWER_ONLY_HASH_DISTANCE,
+            refresh_seconds=settings.WORKSHEET_TEMPLATE_REFRESH_SECONDS
+        )
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def load(self, db) -> int:
+        """从数据库加载最近登记的启用模板的布局，返回布局数量"""
+        from app.models.worksheet_template import WorksheetTemplate
+
+        templates = db.query(WorksheetTemplate).filter(
+            WorksheetTemplate.is_active == True,
+            WorksheetTemplate.answer_layout.isnot(None)
+        ).order_by(WorksheetTemplate.id.desc()).limit(self.max_size).all()
+        layouts = []
+        for template in reversed(templates):
+            try:
+                layouts.append(WorksheetLayout.from_dict(template.answer_layout, template.id))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"练习纸模板{template.id}的作答区域布局格式错误，已跳过: {e}")
+        with self._lock:
+            self._layouts = layouts
+            self._loaded_at = time.monotonic()
+        return len(layouts)
+
+    def _ensure_loaded(self):
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+        if not stale:
+            return
+
+        from app.core.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            self.load(db)
+        except Exception as e:
+            print(f"加载练习纸布局失败: {e}")
+            with self._lock:
+                # 数据库不可用时沿用已加载的布局，等下个周期再试
+                self._loaded_at = time.monotonic()
+        finally:
+            db.close()
+
+    def find(self, page_hash: PageHash) -> Optional[WorksheetLayout]:
+        """pHash和dHash距离都在阈值内的布局中距离最小的一个"""
+        self._ensure_loaded()
+        with self._lock:
+            layouts = list(self._layouts)
+        if not layouts:
+            self.record('miss')
+            return None
+
+        phash = hamming_distances(page_hash.phash, [layout.page_hash.phash for layout in layouts])
+        dhash = hamming_distances(page_hash.dhash, [layout.page_hash.dhash for layout in layouts])
+        within = (phash <= self.max_distance) & (dhash <= self.max_distance)
+        if not within.any():
+            self.record('miss')
+            return None
+
+        scores = np.where(within, phash + dhash, np.iinfo(np.int64).max)
+        # 距离相同时取最近登记的布局
+        best = layouts[len(layouts) - 1 - int(np.argmin(scores[::-1]))]
+        with self._lock:
+            best.hits += 1
+        return best
+
+    def record(self, outcome: str):
+        with self._lock:
+            if outcome == 'hit':
+                self.hits += 1
+            elif outcome == 'verify_failed':
+                self.verify_failures += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.verify_failures
+            return {
+                'enabled': settings.OCR_ANSWER_ONLY_ENABLED,
+                'layouts': len(self._layouts),
+                'hits': self.hits,
+                'misses': self.misses,
+                'verify_failures': self.verify_failures,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# 全局练习纸布局索引
+worksheet_layout_cache = WorksheetLayoutCache.from_settings()
@@ -0,0 +1,151 @@
+"""
+批改任务执行器
+OCR和批改流程是同步的CPU密集计算，直接在async接口中调用会阻塞事件循环，
+一张图片批改期间同一进程的其他请求全部停顿。
+批改任务统一提交到有界线程池执行（OCR和OpenCV在计算时释放GIL），
+排队任务数有上限，超出时立即拒绝，由接口返回503提示客户端稍后重试
+"""
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar('T')
+
+
+class GradingQueueFullError(Exception):
+    """批改任务排队数已达上限"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("批改任务繁忙，请稍后重试")
+        self.retry_after = retry_after
+
+
+class GradingExecutor:
+    """有界的批改线程池，带并发和排队上限"""
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, retry_after: int = 5):
+        self.max_workers = max(max_workers, 1)
+        self.max_queue = max(max_queue, 0)
+        self.retry_after = retry_after
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # 指标
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    @classmethod
+    def from_settings(cls) -> 'GradingExecutor':
+        return cls(
+            max_workers=settings.GRADING_MAX_WORKERS,
+            max_queue=settings.GRADING_MAX_QUEUE,
+            retry_after=settings.GRADING_RETRY_AFTER_SECONDS
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='grading'
+                    )
+        return self._executor
+
+    def _acquire(self):
+        """占用一个执行或排队名额，已满时抛出GradingQueueFullError"""
+        with self._lock:
+            if self.running + self.queued >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise GradingQueueFullError(self.retry_after)
+            self.queued += 1
+
+    def _call(self, func: Callable[..., T], submitted_at: float) -> T:
+        started_at = time.perf_counter()
+        wait = started_at - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        succeeded = False
+        try:
+            result = func()
+            succeeded = True
+            return result
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.total_run += time.perf_counter() - started_at
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def submit(self, func: Callable[..., T], *args, **kwargs):
+        """
+        提交任务，返回concurrent.futures.Future；名额已满时抛出GradingQueueFullError
+
+        排队中的任务可以取消（如客户端断开连接），取消后释放排队名额
+        """
+        self._acquire()
+        call = functools.partial(func, *args, **kwargs)
+        try:
+            future = self._get_executor().submit(self._call, call, time.perf_counter())
+        except Exception:
+            with self._lock:
+                self.queued -= 1
+            raise
+        future.add_done_callback(self._release_cancelled)
+        return future
+
+    def _release_cancelled(self, future):
+        """开始执行前被取消的任务不会进入_call，在此释放排队名额"""
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+                self.cancelled += 1
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在批改线程池中执行同步函数并等待结果，不阻塞事件循环
+
+        Raises:
+            GradingQueueFullError: 执行中和排队的任务已达上限
+        """
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.failed + self.running
+            finished = self.completed + self.failed
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'running': self.running,
+                'queued': self.queued,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'cancelled': self.cancelled,
+                'avg_wait_ms': round(self.total_wait / started * 1000, 2) if started else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'avg_run_ms': round(self.total_run / finished * 1000, 2) if finished else 0.0
+            }
+
+
+# 全局批改执行器
+grading_executor = GradingExecutor.from_settings()
@@ -0,0 +1,189 @@
+"""
+批改任务队列
+提交作业时在同一事务中写入批改任务，批改工作进程轮询领取执行。
+任务保存在数据库中：API或工作进程重启不会丢失任务，工作进程异常退出时租约到期后任务重新排队。
+工作进程每批改完一页续租；完成和失败都用带状态和工作进程条件的UPDATE写入，
+租约到期被重新排队（或已被其他进程领取）的任务，原工作进程的结果直接丢弃
+
+领取任务时先按可领取时间选出候选，再用带状态条件的UPDATE抢占，
+多个工作进程并发领取同一任务时只有一个能更新成功（PostgreSQL上候选查询同时使用SKIP LOCKED）
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.grading_job import GradingJob
+from app.models.homework import Homework
+
+
+class GradingJobQueue:
+    """基于数据库表的批改任务队列"""
+
+    def __init__(self, max_attempts: int = 3, retry_delay: float = 30.0,
+                 lease_seconds: float = 300.0, claim_candidates: int = 8):
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_delay = retry_delay  # 失败后重新排队的延迟（秒），按执行次数线性增加
+        self.lease_seconds = lease_seconds  # 租约时长，每批改完一页续租
+        self.claim_candidates = claim_candidates  # 每次领取时的候选任务数
+
+    @classmethod
+    def from_settings(cls) -> 'GradingJobQueue':
+        return cls(
+            max_attempts=settings.GRADING_JOB_MAX_ATTEMPTS,
+            retry_delay=settings.GRADING_JOB_RETRY_DELAY_SECONDS,
+            lease_seconds=settings.GRADING_JOB_LEASE_SECONDS
+        )
+
+    def enqueue(self, db: Session, homework: Homework, image_paths: List[str],
+                answer_key_id: Optional[int] = None) -> GradingJob:
+        """为作业创建批改任务（不提交事务，与作业记录一起提交）"""
+        now = datetime.now()
+        job = GradingJob(
+            homework_id=homework.id,
+            user_id=homework.user_id,
+            image_paths=image_paths,
+            answer_key_id=answer_key_id,
+            status='queued',
+            attempts=0,
+            max_attempts=self.max_attempts,
+            available_at=now,
+            created_at=now
+        )
+        db.add(job)
+        return job
+
+    def claim(self, db: Session, worker_id: str) -> Optional[GradingJob]:
+        """领取一个可执行的任务，没有时返回None"""
+        now = datetime.now()
+        candidates = db.query(GradingJob.id).filter(
+            GradingJob.status == 'queued',
+            GradingJob.available_at <= now
+        ).order_by(GradingJob.available_at, GradingJob.id).limit(
+            self.claim_candidates
+        ).with_for_update(skip_locked=True).all()
+
+        for (job_id,) in candidates:
+            claimed = db.query(GradingJob).filter(
+                GradingJob.id == job_id,
+                GradingJob.status == 'queued'
+            ).update({
+                GradingJob.status: 'running',
+                GradingJob.worker_id: worker_id,
+                GradingJob.attempts: GradingJob.attempts + 1,
+                GradingJob.started_at: now,
+                GradingJob.locked_until: now + timedelta(seconds=self.lease_seconds)
+            }, synchronize_session=False)
+            if claimed:
+                db.commit()
+                return db.get(GradingJob, job_id)
+
+        db.commit()
+        return None
+
+    def renew(self, db: Session, job: GradingJob, worker_id: str) -> bool:
+        """延长租约，任务已不属于该工作进程时返回False"""
+        renewed = self._update_running(db, job, {
+            GradingJob.locked_until: datetime.now() + timedelta(seconds=self.lease_seconds)
+        }, worker_id=worker_id)
+        db.commit()
+        return renewed
+
+    def complete(self, db: Session, job: GradingJob, worker_id: str) -> bool:
+        """
+        标记任务完成（与作业结果一起提交）
+
+        Returns:
+            任务是否仍属于该工作进程；不属于时回滚，作业结果不写入
+        """
+        completed = self._update_running(db, job, {
+            GradingJob.status: 'completed',
+            GradingJob.locked_until: None,
+            GradingJob.error_message: None,
+            GradingJob.finished_at: datetime.now()
+        }, worker_id=worker_id)
+        if not completed:
+            db.rollback()
+            print(f"批改任务{job.id}已不属于工作进程{worker_id}，丢弃批改结果")
+            return False
+        db.commit()
+        return True
+
+    def fail(self, db: Session, job: GradingJob, error: str, retry: bool = True,
+             worker_id: Optional[str] = None, expired_before: Optional[datetime] = None) -> bool:
+        """
+        记录任务失败，未超过执行次数时延后重新排队，否则作业标记为处理失败
+
+        Args:
+            worker_id: 执行任务的工作进程，任务已不属于它时不做修改
+            expired_before: 租约到期处理时的判定时间，任务已续租时不做修改
+
+        Returns:
+            是否重新排队
+        """
+        now = datetime.now()
+        attempts = job.attempts or 0
+        requeued = retry and attempts < (job.max_attempts or self.max_attempts)
+        values = {GradingJob.error_message: error, GradingJob.locked_until: None}
+        if requeued:
+            values.update({
+                GradingJob.status: 'queued',
+                GradingJob.worker_id: None,
+                GradingJob.available_at: now + timedelta(seconds=self.retry_delay * attempts)
+            })
+        else:
+            values.update({GradingJob.status: 'failed', GradingJob.finished_at: now})
+
+        if not self._update_running(db, job, values, worker_id=worker_id, expired_before=expired_before):
+            db.rollback()
+            print(f"批改任务{job.id}状态已变化（已结束、被重新领取或已续租），忽略失败记录: {error}")
+            return False
+        if not requeued:
+            homework = db.get(Homework, job.homework_id)
+            if homework is not None:
+                homework.status = 'failed'
+                homework.error_message = error
+        db.commit()
+        return requeued
+
+    def requeue_expired(self, db: Session) -> int:
+        """租约到期仍未完成的任务（工作进程异常退出或执行超时）按失败处理，返回处理的任务数"""
+        now = datetime.now()
+        expired = db.query(GradingJob).filter(
+            GradingJob.status == 'running',
+            GradingJob.locked_until < now
+        ).all()
+        for job in expired:
+            print(f"批改任务{job.id}租约到期（工作进程: {job.worker_id}）")
+            # 查询之后原工作进程可能已续租或完成，带条件更新时跳过
+            self.fail(db, job, '批改任务执行超时或工作进程异常退出', expired_before=now)
+        return len(expired)
+
+    @staticmethod
+    def _update_running(db: Session, job: GradingJob, values: Dict[Any, Any],
+                        worker_id: Optional[str] = None, expired_before: Optional[datetime] = None) -> bool:
+        """仅当任务仍在执行中（且属于worker_id、租约在expired_before前到期）时更新，返回是否更新成功"""
+        query = db.query(GradingJob).filter(GradingJob.id == job.id, GradingJob.status == 'running')
+        if worker_id is not None:
+            query = query.filter(GradingJob.worker_id == worker_id)
+        if expired_before is not None:
+            query = query.filter(GradingJob.locked_until < expired_before)
+        return bool(query.update(values, synchronize_session=False))
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        """各状态的任务数和最早排队任务的等待时间"""
+        counts = dict(db.query(GradingJob.status, func.count(GradingJob.id)).group_by(GradingJob.status).all())
+        oldest = db.query(func.min(GradingJob.created_at)).filter(GradingJob.status == 'queued').scalar()
+        return {
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'completed': counts.get('completed', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_queued_seconds': round((datetime.now() - oldest).total_seconds(), 1) if oldest else 0.0
+        }
+
+
+# 全局批改任务队列
+grading_job_queue = GradingJobQueue.from_settings()
@@ -5,12 +5,20 @@
 import re
 import json
 import math
+import time
 from typing import Dict, List, Tuple, Optional, Any
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, fields, replace
 from enum import Enum
 
-from app.services.vision_ocr_service import VisionOCRService
+import numpy as np
+
+from app.core.config import settings
+from app.services.vision_ocr_service import VisionOCRService, ImageSource, describe_image_source
+from app.services.answer_key import AnswerKeyEntry, answer_key_index, normalize_answer_key_questions
+from app.services.answer_region_ocr import clean_answer
+from app.services.question_analysis_cache import question_analysis_cache, question_stem
+from app.services.worksheet_template import verify_printed_text, worksheet_template_index
 
 
 class SubjectType(Enum):
@@ -76,6 +84,10 @@ class HomeworkCorrectionResult:
     performance_analysis: Dict[str, Any]
     learning_suggestions: List[str]
     time_spent_estimate: int  # 估计用时（分钟）
+    template: Optional[Dict[str, Any]] = None  # 按练习纸模板批改时的匹配信息
+    timings: Optional[Dict[str, float]] = None  # 耗时（秒）: ocr为模板匹配和文字识别，correction为解析和批改
+    analysis_cache: Optional[Dict[str, Any]] = None  # 本次批改的题目分析缓存命中情况
+    answer_key: Optional[Dict[str, Any]] = None  # 使用的标准答案及按题号取到的题目数
 
 
 class HomeworkAnalysisAI:
@@ -83,6 +95,8 @@ class HomeworkAnalysisAI:
     
     def __init__(self):
         self.ocr_service = VisionOCRService()
+        self.template_index = worksheet_template_index
+        self.answer_key_index = answer_key_index
         
         # 初始化各学科的分析器
         self.subject_analyzers = {
@@ -103,29 +117,49 @@ class HomeworkAnalysisAI:
             GradeLevel.HIGH_3: 6
         }
     
-    def analyze_homework_image(self, image_path: str, subject: str, 
-                             grade: str, student_id: str) -> HomeworkCorrectionResult:
+    def analyze_homework_image(self, image_path: ImageSource, subject: str, 
+                             grade: str, student_id: str,
+                             answer_key_id: Optional[int] = None) -> HomeworkCorrectionResult:
         """
         分析作业图片并生成批改结果
         
         Args:
-            image_path: 作业图片路径
+            image_path: 作业图片路径，或内存中的图片（bytes/memoryview/ndarray）
             subject: 学科
             grade: 年级
             student_id: 学生ID
+            answer_key_id: 教师登记的标准答案ID，答案中有的题目按题号直接取标准答案
             
         Returns:
             批改结果
         """
         try:
-            print(f"开始分析作业图片: {image_path}")
+            print(f"开始分析作业图片: {describe_image_source(image_path)}")
+            start_time = time.perf_counter()
+            answer_key = self._resolve_answer_key(answer_key_id, subject)
+            
+            # 0. 已登记的固定版式练习纸：对齐到模板后只识别作答单元格；
+            #    没有该学科的模板时不解码，解码后的图片在模板未匹配时直接用于整页识别
+            loaded = None
+            if (settings.WORKSHEET_TEMPLATE_MATCHING and 'mock' not in self.ocr_service.ocr_engines
+                    and self.template_index.has_entries(subject)):
+                try:
+                    loaded = self.ocr_service.load_image(image_path)
+                except Exception as e:
+                    print(f"练习纸模板匹配前解码图片失败: {e}")
+                if loaded is not None:
+                    template_result = self._analyze_with_template(loaded[0], subject, grade, student_id, answer_key)
+                    if template_result is not None:
+                        return template_result
             
             # 1. OCR文字提取
-            ocr_result = self.ocr_service.extract_text_from_image(image_path)
+            ocr_result = self.ocr_service.extract_text_from_image(image_path, subject=subject, preloaded=loaded)
+            ocr_done = time.perf_counter()
             
             if not ocr_result['success']:
                 return self._create_error_result(
-                    f"图片文字识别失败: {ocr_result['message']}"
+                    f"图片文字识别失败: {ocr_result['message']}",
+                    rejection=ocr_result.get('rejection')
                 )
             
             print(f"OCR提取成功，识别到{len(ocr_result['regions'])}个文字区域")
@@ -148,84 +182,305 @@ class HomeworkAnalysisAI:
             
             # 4. 逐题分析和批改
             question_results = []
-            correct_count = 0
-            total_score = 0
-            
+            cache_report = {'hits': 0, 'misses': 0}
+            key_matched = 0
             for i, question_data in enumerate(questions):
                 print(f"分析第{i+1}题...")
                 
-                # 题目分析
-                question_analysis = analyzer.analyze_question(
-                    question_data['question_text'], 
-                    grade_enum
+                # 题目分析：教师登记了标准答案的题目按题号直接取，其余题目的分析结果跨学生复用
+                question_analysis = self._answer_key_analysis(
+                    answer_key, question_data.get('question_number') or i + 1
                 )
+                if question_analysis is not None:
+                    key_matched += 1
+                else:
+                    question_analysis = self._analyze_question(
+                        analyzer, question_data['question_text'], subject_enum, grade_enum, cache_report
+                    )
                 
                 # 答案评估
-                user_answer = question_data.get('user_answer', '')
-                answer_evaluation = analyzer.evaluate_answer(
-                    question_analysis, 
-                    user_answer
-                )
-                
-                # 合并结果
-                question_result = {
-                    'question_number': i + 1,
-                    'question_text': question_analysis.question_text,
-                    'question_type': question_analysis.question_type,
-                    'knowledge_points': question_analysis.knowledge_points,
-                    'difficulty_level': question_analysis.difficulty_level,
-                    'user_answer': answer_evaluation.user_answer,
-                    'correct_answer': question_analysis.expected_answer,
-                    'is_correct': answer_evaluation.is_correct,
-                    'correctness_score': answer_evaluation.correctness_score,
-                    'error_type': answer_evaluation.error_type,
-                    'error_description': answer_evaluation.error_description,
-                    'step_by_step_solution': question_analysis.step_by_step_solution,
-                    'improvement_suggestions': answer_evaluation.improvement_suggestions,
-                    'explanation': self._generate_explanation(question_analysis, answer_evaluation)
-                }
-                
-                question_results.append(question_result)
-                
-                if answer_evaluation.is_correct:
-                    correct_count += 1
-                
-                total_score += answer_evaluation.correctness_score
+                question_results.append(self._evaluate_question(
+                    analyzer, question_analysis, question_data.get('user_answer', ''), i + 1
+                ))
             
-            # 5. 整体分析和建议
-            performance_analysis = self._analyze_overall_performance(
-                question_results, subject, grade
-            )
-            
-            learning_suggestions = self._generate_learning_suggestions(
-                question_results, performance_analysis, subject
-            )
-            
-            # 6. 构建最终结果
-            total_questions = len(question_results)
-            wrong_count = total_questions - correct_count
-            accuracy_rate = (correct_count / total_questions * 100) if total_questions > 0 else 0
-            overall_score = (total_score / total_questions * 100) if total_questions > 0 else 0
-            
-            return HomeworkCorrectionResult(
-                homework_id=f"hw_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                student_id=student_id,
-                subject=subject,
-                total_questions=total_questions,
-                correct_count=correct_count,
-                wrong_count=wrong_count,
-                accuracy_rate=round(accuracy_rate, 1),
-                overall_score=round(overall_score, 1),
-                question_details=question_results,
-                performance_analysis=performance_analysis,
-                learning_suggestions=learning_suggestions,
-                time_spent_estimate=self._estimate_time_spent(question_results)
-            )
+            # 5. 整体分析，构建最终结果
+            result = self._build_correction_result(question_results, subject, grade, student_id)
+            result.timings = {
+                'ocr': round(ocr_done - start_time, 3),
+                'correction': round(time.perf_counter() - ocr_done, 3)
+            }
+            result.analysis_cache = self._analysis_cache_report(cache_report)
+            result.answer_key = self._answer_key_report(answer_key, key_matched, len(questions))
+            return result
             
         except Exception as e:
             print(f"作业分析失败: {e}")
             return self._create_error_result(f"作业分析失败: {str(e)}")
     
+    def _analyze_with_template(self, image: np.ndarray, subject: str,
+                               grade: str, student_id: str,
+                               answer_key: Optional[AnswerKeyEntry] = None) -> Optional[HomeworkCorrectionResult]:
+        """
+        按已登记的练习纸模板批改：照片对齐到模板后只识别作答单元格，与模板中的标准答案比较
+        
+        image为按整页识别相同流程解码和预处理后的照片；
+        未指定标准答案时使用该模板已确认的答案；
+        没有匹配的模板、抽查文字与模板不一致或识别失败时返回None，由调用方走通用流程
+        """
+        subject_enum = self._get_subject_enum(subject)
+        analyzer = self.subject_analyzers.get(subject_enum)
+        if analyzer is None:
+            return None
+        
+        start_time = time.perf_counter()
+        try:
+            match = self.template_index.match(image, subject)
+        except Exception as e:
+            print(f"练习纸模板匹配失败: {e}")
+            return None
+        if match is None:
+            return None
+        
+        template = match.template
+        aligned = match.align(image)
+        height, width = aligned.shape[:2]
+        answer_cells = match.answer_cells(width, height)
+        verify_cells = match.verify_cells(width, height)
+        
+        # 作答单元格和抽查文字一起识别
+        ocr_result = self.ocr_service.extract_text_from_cells(aligned, answer_cells + verify_cells, subject)
+        if not ocr_result['success']:
+            return None
+        cells = ocr_result['cells']
+        ocr_done = time.perf_counter()
+        
+        verified, similarities = verify_printed_text(
+            [cell['text'] for cell in cells[len(answer_cells):]],
+            template.verify_regions,
+            settings.WORKSHEET_TEMPLATE_MIN_SIMILARITY
+        )
+        if not verified:
+            print(f"练习纸模板{template.id}抽查文字不一致，回退通用批改: {similarities}")
+            self.template_index.record('verify_failed')
+            return None
+        self.template_index.record('match', template.id)
+        print(f"匹配练习纸模板{template.id}（{template.name}），内点{match.inliers}个，识别{len(answer_cells)}个作答单元格")
+        
+        if answer_key is None:
+            answer_key = self.answer_key_index.for_template(template.id)
+        
+        grade_enum = self._get_grade_enum(grade)
+        question_results = []
+        cache_report = {'hits': 0, 'misses': 0}
+        key_matched = 0
+        for question, cell in zip(template.questions, cells):
+            question_analysis = self._answer_key_analysis(answer_key, question['number'])
+            if question_analysis is not None:
+                key_matched += 1
+            else:
+                question_analysis = self._analyze_question(
+                    analyzer, question['question_text'], subject_enum, grade_enum, cache_report
+                )
+                
+                # 模板中登记的标准答案、题型和知识点优先于自动分析
+                question_analysis = replace(
+                    question_analysis,
+                    question_number=question['number'],
+                    question_type=question.get('question_type') or question_analysis.question_type,
+                    knowledge_points=question.get('knowledge_points') or question_analysis.knowledge_points,
+                    expected_answer=question['answer'] if question.get('answer') is not None else question_analysis.expected_answer
+                )
+            question_results.append(self._evaluate_question(
+                analyzer, question_analysis, clean_answer(cell['text']), question['number']
+            ))
+        
+        template_report = match.to_dict()
+        template_report.update({
+            'answer_cells': len(answer_cells),
+            'verify_similarity': similarities,
+            'engine_report': ocr_result['engine_report']
+        })
+        result = self._build_correction_result(
+            question_results, subject, grade, student_id, template=template_report
+        )
+        result.timings = {
+            'ocr': round(ocr_done - start_time, 3),
+            'correction': round(time.perf_counter() - ocr_done, 3)
+        }
+        result.analysis_cache = self._analysis_cache_report(cache_report)
+        result.answer_key = self._answer_key_report(answer_key, key_matched, len(template.questions))
+        return result
+    
+    def _resolve_answer_key(self, answer_key_id: Optional[int], subject: str) -> Optional[AnswerKeyEntry]:
+        """查找指定的已确认答案，不存在或学科不符时不使用"""
+        if answer_key_id is None:
+            return None
+        answer_key = self.answer_key_index.get(answer_key_id)
+        if answer_key is None:
+            print(f"标准答案{answer_key_id}不存在或未确认，按题目自动分析")
+            return None
+        if answer_key.subject != subject:
+            print(f"标准答案{answer_key_id}的学科（{answer_key.subject}）与作业学科（{subject}）不符，已忽略")
+            return None
+        return answer_key
+    
+    def _answer_key_analysis(self, answer_key: Optional[AnswerKeyEntry],
+                             question_number: int) -> Optional[QuestionAnalysis]:
+        """按题号从标准答案中取题目分析，答案中没有该题时返回None"""
+        if answer_key is None:
+            return None
+        question = answer_key.lookup(question_number)
+        if question is None:
+            return None
+        return QuestionAnalysis(**{field.name: question[field.name] for field in fields(QuestionAnalysis)})
+    
+    def _answer_key_report(self, answer_key: Optional[AnswerKeyEntry], matched: int,
+                           total: int) -> Optional[Dict[str, Any]]:
+        """记录并返回本次批改使用的标准答案，未使用时返回None"""
+        if answer_key is None:
+            return None
+        self.answer_key_index.record(answer_key.id, matched, total - matched)
+        return {
+            'id': answer_key.id,
+            'name': answer_key.name,
+            'matched_questions': matched,
+            'total_questions': total
+        }
+    
+    def build_answer_key(self, questions: List[Dict[str, Any]], subject: str,
+                         grade: str) -> List[Dict[str, Any]]:
+        """
+        为教师提交的题目生成标准答案记录（登记答案时执行一次，批改时直接按题号取用）
+        
+        每道题保存完整的题目分析字段；教师未提供答案的题目使用自动计算的答案（answer_source为auto），
+        由教师确认或修改；auto_answer保留自动计算的结果供核对
+        
+        Raises:
+            ValueError: 题目格式错误或学科不支持
+        """
+        analyzer = self.subject_analyzers.get(self._get_subject_enum(subject))
+        if analyzer is None:
+            raise ValueError(f"暂不支持{subject}学科的标准答案")
+        grade_enum = self._get_grade_enum(grade)
+        
+        key_questions = []
+        for question in normalize_answer_key_questions(questions):
+            analysis = analyzer.analyze_question(question['question_text'], grade_enum)
+            auto_answer = analysis.expected_answer
+            answer = question['answer'] if question['answer'] is not None else auto_answer
+            if question['solution']:
+                solution = question['solution']
+            else:
+                # 自动生成的解题步骤按自动计算的答案推导，与教师答案不一致时不采用
+                solution = analysis.step_by_step_solution if answer == auto_answer else []
+            
+            analysis = replace(
+                analysis,
+                question_number=question['number'],
+                question_type=question['question_type'] or analysis.question_type,
+                knowledge_points=question['knowledge_points'] or analysis.knowledge_points,
+                expected_answer=answer,
+                step_by_step_solution=solution
+            )
+            key_questions.append({
+                **asdict(analysis),
+                'auto_answer': auto_answer,
+                'answer_source': 'teacher' if question['answer'] is not None else 'auto'
+            })
+        return key_questions
+    
+    def _analyze_question(self, analyzer: 'SubjectAnalyzer', question_text: str,
+                          subject_enum: SubjectType, grade_enum: GradeLevel,
+                          cache_report: Dict[str, int]) -> QuestionAnalysis:
+        """
+        分析题目，同一学科、年级下题干相同的题目复用缓存的分析结果
+        
+        分析只依据去掉作答后的题干，与是否启用缓存、哪个学生先提交无关；命中和未命中次数累加到cache_report
+        """
+        if not settings.QUESTION_ANALYSIS_CACHE_ENABLED:
+            question_analysis = analyzer.analyze_question(question_stem(question_text), grade_enum)
+            return replace(question_analysis, question_text=question_text)
+        
+        key = question_analysis_cache.make_key(subject_enum.value, grade_enum.value, question_text)
+        cached = question_analysis_cache.get(key)
+        if cached is not None:
+            cache_report['hits'] += 1
+            # 题目文字保留本次识别的原文
+            return replace(QuestionAnalysis(**cached), question_text=question_text)
+        
+        cache_report['misses'] += 1
+        question_analysis = analyzer.analyze_question(question_stem(question_text), grade_enum)
+        question_analysis_cache.set(key, asdict(question_analysis))
+        return replace(question_analysis, question_text=question_text)
+    
+    def _analysis_cache_report(self, cache_report: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        """本次批改的题目分析缓存命中率，未启用缓存时返回None"""
+        if not settings.QUESTION_ANALYSIS_CACHE_ENABLED:
+            return None
+        total = cache_report['hits'] + cache_report['misses']
+        return {
+            'hits': cache_report['hits'],
+            'misses': cache_report['misses'],
+            'hit_rate': round(cache_report['hits'] / total, 3) if total else 0.0
+        }
+    
+    def _evaluate_question(self, analyzer: 'SubjectAnalyzer', question_analysis: QuestionAnalysis,
+                           user_answer: str, question_number: int) -> Dict[str, Any]:
+        """评估一道题的答案，合并题目分析和答案评估结果"""
+        answer_evaluation = analyzer.evaluate_answer(question_analysis, user_answer)
+        
+        return {
+            'question_number': question_number,
+            'question_text': question_analysis.question_text,
+            'question_type': question_analysis.question_type,
+            'knowledge_points': question_analysis.knowledge_points,
+            'difficulty_level': question_analysis.difficulty_level,
+            'user_answer': answer_evaluation.user_answer,
+            'correct_answer': question_analysis.expected_answer,
+            'is_correct': answer_evaluation.is_correct,
+            'correctness_score': answer_evaluation.correctness_score,
+            'error_type': answer_evaluation.error_type,
+            'error_description': answer_evaluation.error_description,
+            'step_by_step_solution': question_analysis.step_by_step_solution,
+            'improvement_suggestions': answer_evaluation.improvement_suggestions,
+            'explanation': self._generate_explanation(question_analysis, answer_evaluation)
+        }
+    
+    def _build_correction_result(self, question_results: List[Dict[str, Any]], subject: str,
+                                 grade: str, student_id: str,
+                                 template: Optional[Dict[str, Any]] = None) -> HomeworkCorrectionResult:
+        """汇总逐题结果，生成整体分析和学习建议"""
+        performance_analysis = self._analyze_overall_performance(
+            question_results, subject, grade
+        )
+        
+        learning_suggestions = self._generate_learning_suggestions(
+            question_results, performance_analysis, subject
+        )
+        
+        total_questions = len(question_results)
+        correct_count = sum(1 for q in question_results if q['is_correct'])
+        total_score = sum(q['correctness_score'] for q in question_results)
+        wrong_count = total_questions - correct_count
+        accuracy_rate = (correct_count / total_questions * 100) if total_questions > 0 else 0
+        overall_score = (total_score / total_questions * 100) if total_questions > 0 else 0
+        
+        return HomeworkCorrectionResult(
+            homework_id=f"hw_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            student_id=student_id,
+            subject=subject,
+            total_questions=total_questions,
+            correct_count=correct_count,
+            wrong_count=wrong_count,
+            accuracy_rate=round(accuracy_rate, 1),
+            overall_score=round(overall_score, 1),
+            question_details=question_results,
+            performance_analysis=performance_analysis,
+            learning_suggestions=learning_suggestions,
+            time_spent_estimate=self._estimate_time_spent(question_results),
+            template=template
+        )
+    
     def _parse_questions_from_ocr(self, ocr_result: Dict[str, Any]) -> List[Dict[str, Any]]:
         """从OCR结果中解析题目结构"""
         structured_content = ocr_result.get('structured_content', {})
@@ -248,13 +503,12 @@ class HomeworkAnalysisAI:
                 
                 question_text = ' '.join(question_text_parts)
                 
-                # 尝试从选择题选项中找答案
+                # 选择题答案：题干括号内写的字母，或选项上的勾选/圈选标记
                 user_answer = ''
                 options = q_data.get('answer_options', [])
                 if options:
+                    user_answer = self._extract_user_choice(options, q_data.get('marked_choice'), question_text)
                     question_text += ' ' + ' '.join([f"{opt['option']}. {opt['text']}" for opt in options])
-                    # 简单的答案识别逻辑（实际应该更复杂）
-                    user_answer = self._extract_user_choice(options)
                 
                 questions.append({
                     'question_number': q_data.get('number', len(questions) + 1),
@@ -292,12 +546,25 @@ class HomeworkAnalysisAI:
         
         return questions
     
-    def _extract_user_choice(self, options: List[Dict[str, Any]]) -> str:
-        """从选择题选项中提取用户答案（简化版）"""
-        # 这里应该有更复杂的逻辑来识别用户的选择标记
-        # 现在简单返回一个模拟答案
-        if options:
-            return options[0]['option']  # 简化：返回第一个选项
+    def _extract_user_choice(self, options: List[Dict[str, Any]],
+                             marked_choice: Optional[Dict[str, Any]] = None,
+                             question_text: str = '') -> str:
+        """
+        从选择题中提取用户答案
+        
+        优先使用题干括号内写的选项字母，其次使用选项上识别到的标记；
+        未作答、多选或标记不明确时返回空字符串，不猜测答案
+        """
+        if not options:
+            return ''
+        
+        written = re.search(r'[（(]\s*([A-H])\s*[）)]', question_text)
+        if written:
+            return written.group(1)
+        
+        if (marked_choice and marked_choice.get('status') == 'marked'
+                and marked_choice.get('confidence', 0.0) >= settings.OMR_MIN_CONFIDENCE):
+            return marked_choice['option']
         return ''
     
     def _extract_answer_from_content(self, content: str) -> str:
@@ -498,8 +765,13 @@ class HomeworkAnalysisAI:
         
         return max(total_time, 10)  # 至少10分钟
     
-    def _create_error_result(self, error_message: str) -> HomeworkCorrectionResult:
-        """创建错误结果"""
+    def _create_error_result(self, error_message: str,
+                             rejection: Optional[Dict[str, Any]] = None) -> HomeworkCorrectionResult:
+        """创建错误结果（rejection为图片质量不合格的原因，供前端提示重拍）"""
+        performance_analysis = {'error': error_message}
+        if rejection:
+            performance_analysis['rejection'] = rejection
+        
         return HomeworkCorrectionResult(
             homework_id="error",
             student_id="",
@@ -510,7 +782,7 @@ class HomeworkAnalysisAI:
             accuracy_rate=0,
             overall_score=0,
             question_details=[],
-            performance_analysis={'error': error_message},
+            performance_analysis=performance_analysis,
             learning_suggestions=[f"⚠️ 分析失败: {error_message}"],
             time_spent_estimate=0
         )
@@ -0,0 +1,154 @@
+"""
+图片质量检查
+OCR之前在降采样的灰度图上快速评估清晰度、亮度、对比度和文字面积，
+模糊、过暗、过小的照片在毫秒级被拒绝，并返回可直接展示给用户的原因
+"""
+import io
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.image_preprocessing import ImageData, to_uint8
+
+# 拒绝原因 -> 提示给用户的文案，按检查顺序排列
+REJECTION_MESSAGES = {
+    'too_small': '图片分辨率过低，请靠近作业重新拍摄',
+    'too_dark': '图片太暗，请在光线充足的地方重新拍摄',
+    'no_text': '未检测到文字内容，请确认拍摄的是作业页面',
+    'blurry': '图片模糊，请对焦后保持手机稳定重新拍摄',
+    'too_bright': '图片过曝，字迹发白，请避开强光或闪光灯重新拍摄',
+    'low_contrast': '图片对比度太低，字迹不清晰，请重新拍摄'
+}
+
+
+@dataclass
+class QualityThresholds:
+    """质量检查阈值"""
+    analysis_long_side: int = 512  # 检查时使用的降采样长边
+    min_short_side: int = 480  # 原图短边下限
+    min_sharpness: float = 50.0  # 拉普拉斯方差下限
+    min_paper_level: float = 80.0  # 纸面亮度（灰度95分位）下限，低于则过暗
+    max_ink_level: float = 170.0  # 字迹亮度（灰度1分位）上限，高于则过曝
+    min_contrast: float = 50.0  # 纸面与字迹的亮度差下限
+    min_text_area: float = 0.01  # 文字区域占比下限
+
+    @classmethod
+    def from_settings(cls) -> 'QualityThresholds':
+        return cls(
+            min_short_side=settings.OCR_QUALITY_MIN_SHORT_SIDE,
+            min_sharpness=settings.OCR_QUALITY_MIN_SHARPNESS,
+            min_paper_level=settings.OCR_QUALITY_MIN_PAPER_LEVEL,
+            max_ink_level=settings.OCR_QUALITY_MAX_INK_LEVEL,
+            min_contrast=settings.OCR_QUALITY_MIN_CONTRAST,
+            min_text_area=settings.OCR_QUALITY_MIN_TEXT_AREA
+        )
+
+
+class ImageQualityGate:
+    """OCR前的图片质量检查"""
+
+    def __init__(self, thresholds: Optional[QualityThresholds] = None):
+        self.thresholds = thresholds or QualityThresholds.from_settings()
+
+    def check(self, image_bytes: ImageData) -> Dict[str, Any]:
+        """
+        评估图片质量
+
+        Args:
+            image_bytes: 图片文件内容或已解码的图片数组
+
+        Returns:
+            {'passed', 'reason', 'message', 'issues', 'metrics', 'time_ms'}，
+            reason为第一个未通过的检查项，全部通过时为None
+        """
+        start = time.perf_counter()
+        gray, source_size = self._decode_gray(image_bytes)
+        metrics = self._measure(gray)
+        metrics['width'], metrics['height'] = source_size
+
+        issues = self._find_issues(metrics)
+        reason = issues[0] if issues else None
+        return {
+            'passed': reason is None,
+            'reason': reason,
+            'message': REJECTION_MESSAGES.get(reason),
+            'issues': issues,
+            'metrics': metrics,
+            'time_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def _decode_gray(self, image_bytes: ImageData) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """按检查尺寸解码为灰度图，JPEG使用draft模式直接缩小解码"""
+        long_side = self.thresholds.analysis_long_side
+
+        if isinstance(image_bytes, np.ndarray):
+            gray = to_uint8(image_bytes)
+            if gray.ndim == 3:
+                code = cv2.COLOR_RGBA2GRAY if gray.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+                gray = cv2.cvtColor(gray, code)
+            source_size = (gray.shape[1], gray.shape[0])
+        else:
+            image = Image.open(io.BytesIO(image_bytes))
+            source_size = image.size
+
+            if image.format == 'JPEG':
+                image.draft('L', (long_side, long_side))
+            if image.mode != 'L':
+                image = image.convert('L')
+            gray = np.asarray(image)
+
+        height, width = gray.shape
+        scale = long_side / max(height, width)
+        if scale < 1:
+            gray = cv2.resize(
+                gray, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                interpolation=cv2.INTER_AREA
+            )
+        return gray, source_size
+
+    def _measure(self, gray: np.ndarray) -> Dict[str, Any]:
+        """计算清晰度、亮度/对比度和文字面积占比"""
+        # 亮度和对比度由灰度直方图计算：作业页面大部分是纸面，
+        # 高分位反映纸面亮度，低分位反映字迹亮度
+        histogram = np.bincount(gray.ravel(), minlength=256)
+        cumulative = np.cumsum(histogram) / gray.size
+        brightness = float((histogram * np.arange(256)).sum() / gray.size)
+        ink_level = int(np.searchsorted(cumulative, 0.01))
+        paper_level = int(np.searchsorted(cumulative, 0.95))
+
+        # 拉普拉斯方差：边缘越锐利方差越大
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+        # 局部自适应阈值得到笔画，膨胀后连成文字区域
+        ink = cv2.adaptiveThreshold(
+            gray, 1, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15
+        )
+        text_mask = cv2.dilate(ink, np.ones((5, 5), dtype=np.uint8))
+        text_area = float(text_mask.mean())
+
+        return {
+            'sharpness': round(sharpness, 1),
+            'brightness': round(brightness, 1),
+            'paper_level': paper_level,
+            'ink_level': ink_level,
+            'contrast': paper_level - ink_level,
+            'text_area': round(text_area, 4)
+        }
+
+    def _find_issues(self, metrics: Dict[str, Any]) -> List[str]:
+        """按检查顺序列出所有未通过的项目"""
+        t = self.thresholds
+        checks = {
+            'too_small': min(metrics['width'], metrics['height']) < t.min_short_side,
+            'too_dark': metrics['paper_level'] < t.min_paper_level,
+            'no_text': metrics['text_area'] < t.min_text_area,
+            'blurry': metrics['sharpness'] < t.min_sharpness,
+            'too_bright': metrics['ink_level'] > t.max_ink_level,
+            'low_contrast': metrics['contrast'] < t.min_contrast
+        }
+        return [reason for reason in REJECTION_MESSAGES if checks[reason]]
@@ -0,0 +1,259 @@
+"""
+OCR推理微批处理
+并发请求（或同一页的多个区块）送来的图片先进入队列，等待最多N毫秒或凑满M张后
+合并为一次批量识别调用，再把各自的结果分发回调用方
+
+EasyOCR的readtext_batched要求同一批图片尺寸相同：按OCR_MICRO_BATCH_BUCKET像素粒度分桶，
+桶内图片在右侧和下方补白到相同尺寸（文字坐标不变）后合并调用；
+PaddleOCR的检测+识别接口只接受单张图片，批内逐张识别，仍可省去每个请求单独排队等待推理锁的开销。
+各引擎实际推理调用的批大小分布见stats中的inference_batch_sizes
+"""
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.ocr_engine_registry import ocr_engine_registry
+
+BatchRunner = Callable[[List[np.ndarray], Optional[List[str]]], List[Any]]
+
+# 各引擎每次推理调用的图片数 -> 调用次数
+_inference_batch_sizes: Dict[str, Counter] = defaultdict(Counter)
+_inference_stats_lock = threading.Lock()
+
+
+def _record_inference(engine: str, size: int):
+    with _inference_stats_lock:
+        _inference_batch_sizes[engine][size] += 1
+
+
+def inference_batch_sizes() -> Dict[str, Dict[int, int]]:
+    """各引擎推理调用的批大小分布"""
+    with _inference_stats_lock:
+        return {engine: dict(sorted(sizes.items())) for engine, sizes in _inference_batch_sizes.items()}
+
+
+def bucket_shape(shape: Tuple[int, ...], bucket: int) -> Tuple[int, ...]:
+    """补白后的尺寸：高和宽向上取整到bucket像素的倍数，通道数不变"""
+    height, width = shape[:2]
+    return (-(-height // bucket) * bucket, -(-width // bucket) * bucket) + tuple(shape[2:])
+
+
+def pad_image(image: np.ndarray, shape: Tuple[int, ...]) -> np.ndarray:
+    """在右侧和下方补白（纸张底色）到指定尺寸，文字坐标不变"""
+    if image.shape == shape:
+        return image
+    padded = np.full(shape, 255, dtype=image.dtype)
+    padded[:image.shape[0], :image.shape[1]] = image
+    return padded
+
+
+def _run_easyocr_batch(images: List[np.ndarray], langs: Optional[List[str]]) -> List[Any]:
+    """EasyOCR批量识别：补白后尺寸相同的图片合并为一次readtext_batched调用"""
+    reader = ocr_engine_registry.get_engine('easyocr', langs)
+    if reader is None:
+        raise RuntimeError("EasyOCR模型不可用")
+
+    bucket = max(settings.OCR_MICRO_BATCH_BUCKET, 1)
+    groups: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+    for index, image in enumerate(images):
+        groups[bucket_shape(image.shape, bucket)].append(index)
+
+    results: List[Any] = [None] * len(images)
+    with ocr_engine_registry.get_inference_lock('easyocr', langs):
+        for shape, indices in groups.items():
+            _record_inference('easyocr', len(indices))
+            if len(indices) == 1:
+                results[indices[0]] = reader.readtext(images[indices[0]])
+                continue
+
+            batch_results = reader.readtext_batched(
+                [pad_image(images[i], shape) for i in indices], batch_size=len(indices)
+            )
+            for index, result in zip(indices, batch_results):
+                results[index] = result
+    return results
+
+
+def _run_paddleocr_batch(images: List[np.ndarray], langs: Optional[List[str]]) -> List[Any]:
+    """PaddleOCR批内逐张识别（检测+识别接口不支持多图输入）"""
+    paddle_ocr = ocr_engine_registry.get_engine('paddleocr', langs)
+    if paddle_ocr is None:
+        raise RuntimeError("PaddleOCR模型不可用")
+
+    with ocr_engine_registry.get_inference_lock('paddleocr', langs):
+        results = []
+        for image in images:
+            _record_inference('paddleocr', 1)
+            results.append(paddle_ocr.ocr(image, cls=True))
+        return results
+
+
+BATCH_RUNNERS: Dict[str, BatchRunner] = {
+    'easyocr': _run_easyocr_batch,
+    'paddleocr': _run_paddleocr_batch
+}
+
+
+class OCRMicroBatcher:
+    """单个OCR模型的微批处理队列，由一个后台线程消费"""
+
+    def __init__(self, engine: str, langs: Optional[List[str]], runner: BatchRunner,
+                 max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.engine = engine
+        self.langs = langs
+        self.runner = runner
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future, float]]" = queue.Queue()
+
+        # 指标
+        self._stats_lock = threading.Lock()
+        self.batch_count = 0
+        self.item_count = 0
+        self.max_batch_seen = 0
+        self.batch_sizes: Counter = Counter()  # 每批图片数 -> 批次数
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self.failed_batches = 0
+
+        self._worker = threading.Thread(
+            target=self._consume, name=f'ocr-batch-{engine}', daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, image: np.ndarray) -> Future:
+        """提交一张图片，返回识别结果的Future"""
+        future: Future = Future()
+        self._queue.put((image, future, time.perf_counter()))
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+        return future
+
+    def infer(self, image: np.ndarray, timeout: Optional[float] = None) -> Any:
+        """提交并等待识别结果（引擎原始输出格式），超过timeout秒时撤回请求并抛出TimeoutError"""
+        future = self.submit(image)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # 尚未开始识别的请求不再进入批次
+            future.cancel()
+            raise
+
+    def _collect(self) -> List[Tuple[np.ndarray, Future, float]]:
+        """阻塞等待第一项，然后在等待窗口内尽量凑满一批"""
+        batch = [self._queue.get()]
+        window_end = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = window_end - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _consume(self):
+        while True:
+            batch = self._collect()
+            # 调用方已放弃（如超过单页截止时间）的请求不再识别
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                results = self.runner([image for image, _, _ in batch], self.langs)
+            except Exception as e:
+                print(f"{self.engine}批量识别失败: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self.failed_batches += 1
+                continue
+
+            finished = time.perf_counter()
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            if len(results) != len(batch):
+                # 返回数量与批内图片数不一致时，没有对应结果的请求直接报错，避免调用方一直等待
+                print(f"{self.engine}批量识别返回{len(results)}个结果，批内有{len(batch)}张图片")
+                error = RuntimeError(f"{self.engine}批量识别结果数量不一致")
+                for _, future, _ in batch[len(results):]:
+                    future.set_exception(error)
+
+            with self._stats_lock:
+                self.batch_count += 1
+                self.item_count += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self.batch_sizes[len(batch)] += 1
+                self.total_wait += sum(start - enqueued for _, _, enqueued in batch)
+                self.total_run += finished - start
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            batches = self.batch_count
+            return {
+                'engine': self.engine,
+                'langs': self.langs,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': round(self.max_wait * 1000, 1),
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'batches': batches,
+                'items': self.item_count,
+                'failed_batches': self.failed_batches,
+                'avg_batch_size': round(self.item_count / batches, 2) if batches else 0.0,
+                'max_batch_seen': self.max_batch_seen,
+                'batch_size_histogram': dict(sorted(self.batch_sizes.items())),
+                'avg_wait_ms': round(self.total_wait / self.item_count * 1000, 2) if self.item_count else 0.0,
+                'avg_run_ms': round(self.total_run / batches * 1000, 2) if batches else 0.0
+            }
+
+
+class OCRBatcherPool:
+    """按(引擎, 语言)管理微批处理队列，首次使用时创建"""
+
+    def __init__(self):
+        self._batchers: Dict[Tuple[str, Tuple[str, ...]], OCRMicroBatcher] = {}
+        self._lock = threading.Lock()
+
+    def get(self, engine: str, langs: Optional[List[str]] = None) -> OCRMicroBatcher:
+        key = (engine, tuple(langs or ()))
+        batcher = self._batchers.get(key)
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(key)
+                if batcher is None:
+                    batcher = OCRMicroBatcher(
+                        engine, langs, BATCH_RUNNERS[engine],
+                        max_batch_size=settings.OCR_MICRO_BATCH_SIZE,
+                        max_wait_ms=settings.OCR_MICRO_BATCH_WAIT_MS
+                    )
+                    self._batchers[key] = batcher
+        return batcher
+
+    def stats(self) -> Dict[str, Any]:
+        """各队列的批大小、等待时间和队列深度，以及各引擎实际推理调用的批大小分布"""
+        with self._lock:
+            batchers = list(self._batchers.values())
+        return {
+            'enabled': settings.OCR_MICRO_BATCH_ENABLED,
+            'bucket': settings.OCR_MICRO_BATCH_BUCKET,
+            'batchers': [batcher.stats() for batcher in batchers],
+            'inference_batch_sizes': inference_batch_sizes()
+        }
+
+
+# 全局微批处理队列
+ocr_batchers = OCRBatcherPool()
@@ -0,0 +1,196 @@
+"""
+OCR引擎注册表
+进程级共享的OCR模型管理：每个模型在进程内只加载一次（懒加载、线程安全），
+供VisionOCRService、HomeworkAnalysisAI及各API端点共同使用
+"""
+import importlib.util
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# 只检查是否安装，模型库（torch/paddle）在首次加载模型时才导入，
+# 使用OCR工作进程池时API进程不必承担这部分内存
+EASYOCR_AVAILABLE = importlib.util.find_spec('easyocr') is not None
+if not EASYOCR_AVAILABLE:
+    print("EasyOCR未安装，将使用模拟OCR")
+
+PADDLEOCR_AVAILABLE = importlib.util.find_spec('paddleocr') is not None
+if not PADDLEOCR_AVAILABLE:
+    print("PaddleOCR未安装，将使用模拟OCR")
+
+
+def _get_rss_bytes() -> Optional[int]:
+    """获取当前进程常驻内存（字节），不支持的平台返回None"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _load_easyocr(langs: Tuple[str, ...]) -> Any:
+    """加载EasyOCR模型"""
+    import easyocr
+    return easyocr.Reader(list(langs), gpu=settings.OCR_USE_GPU)
+
+
+def _load_paddleocr(langs: Tuple[str, ...]) -> Any:
+    """加载PaddleOCR模型"""
+    import paddleocr
+    return paddleocr.PaddleOCR(
+        use_angle_cls=True,
+        lang=langs[0],
+        use_gpu=settings.OCR_USE_GPU,
+        show_log=False
+    )
+
+
+class EngineState:
+    """单个OCR模型的加载状态"""
+
+    def __init__(self, engine: str, langs: Tuple[str, ...]):
+        self.engine = engine
+        self.langs = langs
+        self.status = 'not_loaded'  # not_loaded/loading/loaded/failed
+        self.model = None
+        self.load_time: Optional[float] = None
+        self.memory_bytes: Optional[int] = None
+        self.loaded_at: Optional[str] = None
+        self.error: Optional[str] = None
+        self.load_lock = threading.Lock()
+        # 同一模型实例的推理调用串行化，第三方模型不保证线程安全
+        self.inference_lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'engine': self.engine,
+            'langs': list(self.langs),
+            'status': self.status,
+            'load_time': round(self.load_time, 3) if self.load_time is not None else None,
+            'memory_mb': round(self.memory_bytes / 1024 / 1024, 1) if self.memory_bytes is not None else None,
+            'loaded_at': self.loaded_at,
+            'error': self.error
+        }
+
+
+class OCREngineRegistry:
+    """OCR引擎注册表（进程级单例）"""
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[Tuple[str, ...]], Any]] = {}
+        self._default_langs: Dict[str, Tuple[str, ...]] = {}
+        self._states: Dict[Tuple[str, Tuple[str, ...]], EngineState] = {}
+        self._lock = threading.Lock()
+
+        if EASYOCR_AVAILABLE:
+            self.register('easyocr', _load_easyocr, settings.OCR_EASYOCR_LANGS)
+        if PADDLEOCR_AVAILABLE:
+            self.register('paddleocr', _load_paddleocr, [settings.OCR_PADDLE_LANG])
+
+    def register(self, engine: str, loader: Callable[[Tuple[str, ...]], Any],
+                 default_langs: List[str]):
+        """注册OCR引擎加载函数"""
+        with self._lock:
+            self._loaders[engine] = loader
+            self._default_langs[engine] = tuple(default_langs)
+
+    def available_engines(self) -> List[str]:
+        """已安装且未加载失败的引擎（不触发模型加载）"""
+        return [
+            engine for engine in self._loaders
+            if self._get_state(engine).status != 'failed'
+        ]
+
+    def get_engine(self, engine: str, langs: Optional[List[str]] = None) -> Any:
+        """
+        获取OCR模型实例，首次调用时加载
+
+        Args:
+            engine: 引擎名称（easyocr/paddleocr）
+            langs: 识别语言，默认使用配置中的语言
+
+        Returns:
+            模型实例，引擎不可用或加载失败时返回None
+        """
+        if engine not in self._loaders:
+            return None
+
+        state = self._get_state(engine, langs)
+        if state.status == 'loaded':
+            return state.model
+
+        with state.load_lock:
+            # 双重检查：等待锁期间可能已被其他线程加载
+            if state.status in ('loaded', 'failed'):
+                return state.model
+
+            state.status = 'loading'
+            rss_before = _get_rss_bytes()
+            start_time = time.perf_counter()
+
+            try:
+                state.model = self._loaders[engine](state.langs)
+            except Exception as e:
+                state.status = 'failed'
+                state.error = str(e)
+                print(f"{engine}初始化失败: {e}")
+                return None
+
+            state.load_time = time.perf_counter() - start_time
+            rss_after = _get_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                # 近似值：并发加载其他模型时会互相计入
+                state.memory_bytes = max(rss_after - rss_before, 0)
+            state.loaded_at = datetime.now().isoformat()
+            state.status = 'loaded'
+            print(f"{engine}初始化成功，耗时{state.load_time:.2f}秒")
+
+            return state.model
+
+    def get_inference_lock(self, engine: str, langs: Optional[List[str]] = None) -> threading.Lock:
+        """获取模型推理锁"""
+        return self._get_state(engine, langs).inference_lock
+
+    def warmup(self, engines: Optional[List[str]] = None):
+        """预加载模型"""
+        for engine in engines or list(self._loaders):
+            self.get_engine(engine)
+
+    def status(self) -> Dict[str, Any]:
+        """所有已注册模型的加载状态、耗时和内存占用"""
+        with self._lock:
+            for engine in self._loaders:
+                self._ensure_state(engine, self._default_langs[engine])
+            states = list(self._states.values())
+
+        engines = [state.to_dict() for state in states]
+        return {
+            'engines': engines,
+            'loaded_count': sum(1 for e in engines if e['status'] == 'loaded'),
+            'total_memory_mb': round(sum(e['memory_mb'] or 0 for e in engines), 1)
+        }
+
+    def _get_state(self, engine: str, langs: Optional[List[str]] = None) -> EngineState:
+        langs_key = tuple(langs) if langs else self._default_langs.get(engine, ())
+        with self._lock:
+            return self._ensure_state(engine, langs_key)
+
+    def _ensure_state(self, engine: str, langs_key: Tuple[str, ...]) -> EngineState:
+        key = (engine, langs_key)
+        if key not in self._states:
+            self._states[key] = EngineState(engine, langs_key)
+        return self._states[key]
+
+
+# 全局OCR引擎注册表
+ocr_engine_registry = OCREngineRegistry()
@@ -0,0 +1,162 @@
+"""
+OCR文字区域的批量表示
+bbox和置信度使用NumPy数组存储，文本使用列表；
+过滤、排序、重叠度计算均为向量化操作，只在序列化响应时才构建字典
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class TextRegionBatch:
+    """一页（或一个区块）的文字区域集合"""
+
+    __slots__ = ('texts', 'bboxes', 'confidences', 'analyses')
+
+    def __init__(self, texts: List[str], bboxes: Any, confidences: Any,
+                 analyses: Optional[List[Dict[str, Any]]] = None):
+        self.texts = texts
+        self.bboxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)  # [x1, y1, x2, y2]
+        self.confidences = np.asarray(confidences, dtype=np.float64).reshape(-1)
+        self.analyses = analyses  # 文字类型分析结果，与texts一一对应
+
+    @classmethod
+    def empty(cls) -> 'TextRegionBatch':
+        return cls([], np.empty((0, 4), dtype=np.int64), np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def from_quads(cls, quads: Sequence[Any], texts: Sequence[str],
+                   confidences: Sequence[float], min_confidence: float = 0.0) -> 'TextRegionBatch':
+        """
+        由引擎输出的四点坐标构建，过滤低置信度和空文本
+
+        Args:
+            quads: 每个区域四个角点 [[x, y] * 4]
+            texts: 识别文本
+            confidences: 识别置信度
+            min_confidence: 置信度阈值（不含）
+        """
+        if len(texts) == 0:
+            return cls.empty()
+
+        points = np.asarray(quads, dtype=np.float64).reshape(len(texts), -1, 2)
+        bboxes = np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1).astype(np.int64)
+        confidences = np.asarray(confidences, dtype=np.float64)
+        texts = [text.strip() for text in texts]
+
+        mask = (confidences > min_confidence) & np.fromiter(
+            (bool(text) for text in texts), dtype=bool, count=len(texts)
+        )
+        return cls(texts, bboxes, confidences).filter(mask)
+
+    @classmethod
+    def concat(cls, batches: Sequence['TextRegionBatch']) -> 'TextRegionBatch':
+        """合并多个区域集合"""
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty()
+
+        texts = [text for batch in batches for text in batch.texts]
+        analyses = None
+        if all(batch.analyses is not None for batch in batches):
+            analyses = [analysis for batch in batches for analysis in batch.analyses]
+
+        return cls(
+            texts,
+            np.concatenate([batch.bboxes for batch in batches]),
+            np.concatenate([batch.confidences for batch in batches]),
+            analyses
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def take(self, indices: Any) -> 'TextRegionBatch':
+        """按下标选取区域（保持下标顺序）"""
+        indices = np.asarray(indices, dtype=np.int64)
+        analyses = [self.analyses[i] for i in indices] if self.analyses is not None else None
+        return TextRegionBatch(
+            [self.texts[i] for i in indices],
+            self.bboxes[indices],
+            self.confidences[indices],
+            analyses
+        )
+
+    def filter(self, mask: np.ndarray) -> 'TextRegionBatch':
+        """按布尔掩码过滤区域"""
+        return self.take(np.flatnonzero(mask))
+
+    def offset(self, dx: int, dy: int) -> 'TextRegionBatch':
+        """平移坐标（区块坐标映射回整页坐标）"""
+        return TextRegionBatch(
+            self.texts,
+            self.bboxes + np.array([dx, dy, dx, dy], dtype=np.int64),
+            self.confidences,
+            self.analyses
+        )
+
+    def reading_order(self) -> np.ndarray:
+        """阅读顺序（从上到下、从左到右）的下标"""
+        return np.lexsort((self.bboxes[:, 0], self.bboxes[:, 1]))
+
+    def positions(self) -> List[Dict[str, int]]:
+        """计算各区域的位置信息"""
+        x1, y1, x2, y2 = self.bboxes.T
+        columns = zip(
+            x1.tolist(), y1.tolist(), (x2 - x1).tolist(), (y2 - y1).tolist(),
+            ((x1 + x2) // 2).tolist(), ((y1 + y2) // 2).tolist()
+        )
+        return [
+            {'x': x, 'y': y, 'width': w, 'height': h, 'center_x': cx, 'center_y': cy}
+            for x, y, w, h, cx, cy in columns
+        ]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """序列化为API响应中的区域字典"""
+        bboxes = self.bboxes.tolist()
+        confidences = self.confidences.tolist()
+        analyses = self.analyses or [{'type': 'text'}] * len(self)
+
+        return [
+            {
+                'text': text,
+                'bbox': bbox,
+                'confidence': confidence,
+                'position': position,
+                'type': analysis['type'],
+                'subtype': analysis.get('subtype'),
+                'properties': analysis.get('properties', {}),
+                'is_question_part': analysis.get('is_question_part', False),
+                'is_answer_part': analysis.get('is_answer_part', False)
+            }
+            for text, bbox, confidence, position, analysis
+            in zip(self.texts, bboxes, confidences, self.positions(), analyses)
+        ]
+
+
+def overlap_ratio(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    逐对计算重叠面积占较小区域面积的比例
+
+    Args:
+        boxes_a: (n, 4) bbox数组
+        boxes_b: (n, 4) bbox数组，与boxes_a逐行对应
+    """
+    ix1 = np.maximum(boxes_a[:, 0], boxes_b[:, 0])
+    iy1 = np.maximum(boxes_a[:, 1], boxes_b[:, 1])
+    ix2 = np.minimum(boxes_a[:, 2], boxes_b[:, 2])
+    iy2 = np.minimum(boxes_a[:, 3], boxes_b[:, 3])
+
+    intersects = (ix2 > ix1) & (iy2 > iy1)
+    intersection = np.where(intersects, (ix2 - ix1) * (iy2 - iy1), 0)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    smaller = np.minimum(area_a, area_b)
+
+    return np.divide(
+        intersection, smaller,
+        out=np.zeros(len(intersection), dtype=np.float64),
+        where=intersects & (smaller > 0)
+    )
+
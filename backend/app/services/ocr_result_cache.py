@@ -0,0 +1,124 @@
+"""
+OCR结果缓存
+按图片内容寻址：同一张图片（相同预处理参数和引擎组合）重复上传时直接返回缓存结果，跳过OCR
+一级为进程内LRU，二级为Redis（shared/utils/cache.py中的cache_ocr_result/get_ocr_result）
+"""
+import copy
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.lru_cache import LRUCache
+
+try:
+    from shared.utils.cache import cache_ocr_result, get_ocr_result
+    REDIS_CACHE_AVAILABLE = True
+except Exception as e:
+    # shared配置缺失或redis不可用时只使用进程内缓存
+    REDIS_CACHE_AVAILABLE = False
+    print(f"OCR结果Redis缓存不可用，仅使用进程内缓存: {e.__class__.__name__}")
+
+
+class OCRResultCache:
+    """OCR结果两级缓存"""
+
+    def __init__(self, max_size: int = 256, use_redis: bool = True):
+        self.local_cache = LRUCache(max_size=max_size)
+        self.use_redis = use_redis and REDIS_CACHE_AVAILABLE
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image_bytes: Any, preprocessing: bool, engines: List[str],
+                 **options: Any) -> str:
+        """
+        生成缓存键
+
+        Args:
+            image_bytes: 图片文件内容（base64已解码，bytes-like）或已解码的图片数组
+            preprocessing: 是否预处理
+            engines: 参与识别的引擎
+            options: 其他影响识别结果的参数
+
+        Returns:
+            内容哈希键
+        """
+        if isinstance(image_bytes, np.ndarray):
+            # 直接对数组内存做哈希，形状和类型一并计入
+            digest = hashlib.sha256(np.ascontiguousarray(image_bytes))
+            digest.update(f"|array={image_bytes.shape}:{image_bytes.dtype}".encode())
+        else:
+            digest = hashlib.sha256(image_bytes)
+        digest.update(f"|pre={int(bool(preprocessing))}".encode())
+        digest.update(f"|engines={','.join(sorted(engines))}".encode())
+        for name, value in sorted(options.items()):
+            digest.update(f"|{name}={value}".encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，命中时返回结果副本"""
+        result = self.local_cache.get(key)
+        if result is not None:
+            self._record('memory')
+            return self._with_cache_info(result, 'memory', key)
+
+        if self.use_redis:
+            result = get_ocr_result(key)
+            if isinstance(result, dict):
+                self.local_cache.set(key, result)
+                self._record('redis')
+                return self._with_cache_info(result, 'redis', key)
+
+        self._record('miss')
+        return None
+
+    def set(self, key: str, result: Dict[str, Any]):
+        """写入缓存（只缓存成功结果）"""
+        if not result.get('success'):
+            return
+
+        result = copy.deepcopy(result)
+        result.pop('cache', None)
+        self.local_cache.set(key, result)
+
+        if self.use_redis:
+            cache_ocr_result(key, result)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        total = self.memory_hits + self.redis_hits + self.misses
+        hits = self.memory_hits + self.redis_hits
+        return {
+            'memory_hits': self.memory_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+            'memory_size': len(self.local_cache),
+            'redis_enabled': self.use_redis
+        }
+
+    def _record(self, outcome: str):
+        with self._stats_lock:
+            if outcome == 'memory':
+                self.memory_hits += 1
+            elif outcome == 'redis':
+                self.redis_hits += 1
+            else:
+                self.misses += 1
+
+    def _with_cache_info(self, result: Dict[str, Any], layer: str, key: str) -> Dict[str, Any]:
+        result = copy.deepcopy(result)
+        result['cache'] = {'hit': True, 'layer': layer, 'key': key}
+        return result
+
+
+# 全局OCR结果缓存
+ocr_result_cache = OCRResultCache(
+    max_size=settings.OCR_RESULT_CACHE_SIZE,
+    use_redis=settings.OCR_RESULT_CACHE_REDIS
+)
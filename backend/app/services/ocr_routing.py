@@ -0,0 +1,108 @@
+"""
+OCR引擎路由策略
+按学科选择参与识别的引擎和识别语言，例如英语作业只用EasyOCR英文模型，
+语文、数学作业只用PaddleOCR中文模型；未配置的学科使用全部可用引擎
+"""
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+# 中文学科名到路由键的映射
+SUBJECT_ALIASES = {
+    '数学': 'math',
+    '语文': 'chinese',
+    '英语': 'english',
+    '物理': 'physics',
+    '化学': 'chemistry',
+    '生物': 'biology'
+}
+
+
+@dataclass
+class OCRRoute:
+    """一次识别的路由决策"""
+    subject: Optional[str]
+    rule: str  # 命中的规则：学科名/default/fallback
+    engines: List[str]
+    langs: Dict[str, List[str]] = field(default_factory=dict)  # 引擎 -> 识别语言，缺省用引擎默认语言
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'subject': self.subject,
+            'rule': self.rule,
+            'engines': self.engines,
+            'langs': self.langs
+        }
+
+
+class OCRRoutingPolicy:
+    """学科到OCR引擎/语言的路由策略"""
+
+    def __init__(self, rules: Dict[str, Dict[str, List[str]]], enabled: bool = True):
+        """
+        Args:
+            rules: {学科: {引擎: [语言, ...]}}，引擎按顺序排列（级联模式下第一个为主引擎）
+            enabled: 关闭时所有学科都使用全部可用引擎
+        """
+        self.rules = {subject.lower(): engines for subject, engines in rules.items()}
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._decisions: Counter = Counter()
+
+    @classmethod
+    def from_settings(cls) -> 'OCRRoutingPolicy':
+        return cls(settings.OCR_ROUTING_RULES, enabled=settings.OCR_ROUTING_ENABLED)
+
+    def route(self, subject: Optional[str], available_engines: List[str]) -> OCRRoute:
+        """
+        确定本次识别使用的引擎和语言
+
+        Args:
+            subject: 学科（英文或中文名），None表示未知
+            available_engines: 当前可用的引擎
+
+        Returns:
+            路由决策；规则中的引擎都不可用时回退到全部可用引擎
+        """
+        key = self._normalize_subject(subject)
+        rule = self.rules.get(key) if self.enabled and key else None
+
+        if rule is None:
+            route = OCRRoute(key, 'default', list(available_engines))
+        else:
+            engines = [engine for engine in rule if engine in available_engines]
+            if engines:
+                route = OCRRoute(key, key, engines, {engine: list(rule[engine]) for engine in engines})
+            else:
+                route = OCRRoute(key, 'fallback', list(available_engines))
+
+        with self._lock:
+            self._decisions[(route.subject or 'unknown', route.rule, ','.join(route.engines))] += 1
+        return route
+
+    def stats(self) -> Dict[str, Any]:
+        """路由规则和各决策的累计次数"""
+        with self._lock:
+            decisions = [
+                {'subject': subject, 'rule': rule, 'engines': engines.split(',') if engines else [], 'count': count}
+                for (subject, rule, engines), count in self._decisions.most_common()
+            ]
+        return {
+            'enabled': self.enabled,
+            'rules': self.rules,
+            'decisions': decisions
+        }
+
+    @staticmethod
+    def _normalize_subject(subject: Optional[str]) -> Optional[str]:
+        if not subject:
+            return None
+        subject = subject.strip()
+        return SUBJECT_ALIASES.get(subject, subject.lower())
+
+
+# 全局路由策略
+ocr_routing_policy = OCRRoutingPolicy.from_settings()
@@ -0,0 +1,87 @@
+"""
+OCR工作进程池客户端
+OCR_WORKER_MODE=pooled时，API进程不加载OCR模型，而是通过本地UNIX socket
+把图片提交给独立的OCR工作进程池（python -m app.workers.ocr_worker）并等待识别结果
+"""
+import threading
+from multiprocessing.connection import Client, Connection
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class OCRWorkerError(Exception):
+    """OCR工作进程池不可用或识别失败"""
+
+
+class OCRWorkerClient:
+    """OCR工作进程池客户端（线程安全，复用连接）"""
+
+    def __init__(self, address: str, authkey: bytes, timeout: float = 30.0):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._idle: List[Connection] = []
+        self._lock = threading.Lock()
+
+    def recognize(self, engine: str, image: np.ndarray, langs: Optional[List[str]] = None) -> Any:
+        """
+        提交一张图片识别
+
+        Returns:
+            引擎原始输出（与进程内调用readtext/ocr的返回值相同）
+        """
+        return self._request(('recognize', engine, langs, np.ascontiguousarray(image)))
+
+    def available_engines(self) -> List[str]:
+        """工作进程池中可用的引擎"""
+        return self._request(('engines',))
+
+    def status(self) -> Dict[str, Any]:
+        """工作进程池状态"""
+        return self._request(('status',))
+
+    def _request(self, message: tuple) -> Any:
+        connection = self._acquire()
+        try:
+            connection.send(message)
+            if not connection.poll(self.timeout):
+                raise OCRWorkerError(f"OCR工作进程池响应超时（{self.timeout}秒）")
+            status, payload = connection.recv()
+        except (OSError, EOFError, OCRWorkerError) as e:
+            # 连接状态未知，直接丢弃
+            connection.close()
+            if isinstance(e, OCRWorkerError):
+                raise
+            raise OCRWorkerError(f"OCR工作进程池连接失败: {e}") from e
+
+        self._release(connection)
+        if status != 'ok':
+            raise OCRWorkerError(payload)
+        return payload
+
+    def _acquire(self) -> Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return Client(self.address, family='AF_UNIX', authkey=self.authkey)
+        except OSError as e:
+            raise OCRWorkerError(f"无法连接OCR工作进程池 {self.address}: {e}") from e
+
+    def _release(self, connection: Connection):
+        with self._lock:
+            self._idle.append(connection)
+
+
+def get_worker_authkey() -> bytes:
+    """客户端与工作进程池共用的认证密钥"""
+    return settings.SECRET_KEY.encode()
+
+
+# 全局OCR工作进程池客户端
+ocr_worker_client = OCRWorkerClient(
+    settings.OCR_WORKER_SOCKET, get_worker_authkey(), timeout=settings.OCR_WORKER_TIMEOUT
+)
@@ -0,0 +1,222 @@
+"""
+选择题光学标记识别（OMR）
+学生在选项上打勾、圈选或涂黑后，被选中的选项周围墨迹明显多于同题其他选项。
+按OCR得到的选项区域把选项字母和整个选项划分为核心区和外圈，
+在整页二值图的积分图上一次性计算所有选项各区域的墨迹密度，
+与同题选项的中位数比较得到选中的选项和置信度，不需要识别手写内容
+"""
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.services.answer_region_ocr import char_offset
+
+# 选项字母：行首或空白之后的A-H加分隔符
+OPTION_LABEL = re.compile(r'(?:^|(?<=\s))([A-H])\s*[.、．)）]')
+
+Box = Tuple[int, int, int, int]
+
+
+@dataclass
+class OptionBox:
+    """一个选项在页面上的位置"""
+    option: str
+    label_box: Box  # 选项字母和分隔符
+    span_box: Box  # 整个选项
+
+
+def split_option_boxes(text: str, bbox: List[int]) -> List[OptionBox]:
+    """
+    按字符位置把一个文字区域拆分为各选项的区域
+
+    OCR常把同一行的几个选项识别为一个区域（如"A. 1000    B. 1200"），
+    字符宽度按中文两个、其他一个估算
+    """
+    x1, y1, x2, y2 = bbox
+    width = x2 - x1
+    labels = list(OPTION_LABEL.finditer(text))
+
+    boxes = []
+    for index, match in enumerate(labels):
+        end = labels[index + 1].start() if index + 1 < len(labels) else len(text)
+        # 去掉选项之间的空白
+        while end > match.end() and text[end - 1].isspace():
+            end -= 1
+        start_x = x1 + int(width * char_offset(text, match.start()))
+        label_x = x1 + int(round(width * char_offset(text, match.end())))
+        end_x = x1 + int(round(width * char_offset(text, end)))
+        boxes.append(OptionBox(
+            match.group(1),
+            (start_x, y1, max(label_x, start_x + 1), y2),
+            (start_x, y1, max(end_x, start_x + 1), y2)
+        ))
+    return boxes
+
+
+@dataclass
+class MarkResult:
+    """一道选择题的识别结果"""
+    option: str  # 选中的选项，未作答或无法判断时为空
+    status: str  # marked/blank/multiple/unknown
+    confidence: float
+    scores: Dict[str, float] = field(default_factory=dict)  # 各选项高于同题中位数的墨迹密度
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'option': self.option,
+            'status': self.status,
+            'confidence': round(self.confidence, 3),
+            'scores': {option: round(score, 4) for option, score in self.scores.items()}
+        }
+
+
+def box_sums(integral: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """在积分图上批量计算矩形 [x1, x2) × [y1, y2) 内的像素和"""
+    x1, y1, x2, y2 = boxes.T
+    return (integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]).astype(np.float64)
+
+
+class OpticalMarkReader:
+    """选择题标记识别器"""
+
+    def __init__(self, min_mark_density: float = 0.06, ring_scale: float = 0.6,
+                 block_size: int = 31, threshold_offset: int = 15):
+        self.min_mark_density = min_mark_density  # 选中选项需高出同题中位数的墨迹密度
+        self.ring_scale = ring_scale  # 外圈宽度（占选项高度）
+        self.block_size = block_size  # 自适应二值化窗口
+        self.threshold_offset = threshold_offset
+
+    @classmethod
+    def from_settings(cls) -> 'OpticalMarkReader':
+        return cls(min_mark_density=settings.OMR_MIN_MARK_DENSITY)
+
+    def binarize(self, image: np.ndarray) -> np.ndarray:
+        """自适应二值化（墨迹为1），容忍拍照时的光照不均"""
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+        return cv2.adaptiveThreshold(
+            gray, 1, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV,
+            self.block_size, self.threshold_offset
+        )
+
+    def read(self, image: np.ndarray, questions: List[List[OptionBox]]) -> List[MarkResult]:
+        """
+        识别每道题选中的选项
+
+        Args:
+            image: OCR使用的图片（选项坐标与其一致）
+            questions: 每道题的选项区域
+
+        Returns:
+            与questions一一对应的识别结果
+        """
+        counts = np.array([len(options) for options in questions], dtype=np.int64)
+        if not counts.sum():
+            return [MarkResult('', 'unknown', 0.0) for _ in questions]
+
+        options = [option for question in questions for option in question]
+        label = np.array([option.label_box for option in options], dtype=np.int64)
+        span = np.array([option.span_box for option in options], dtype=np.int64)
+
+        # 外圈按选项高度向四周扩展
+        pad = np.maximum((label[:, 3] - label[:, 1]) * self.ring_scale, 2).astype(np.int64)[:, None]
+        expand = np.hstack([-pad, -pad, pad, pad])
+
+        # 只二值化包含所有选项外圈的区域，坐标换算到该区域
+        outer = span + expand
+        left = int(np.clip(outer[:, 0].min(), 0, image.shape[1]))
+        top = int(np.clip(outer[:, 1].min(), 0, image.shape[0]))
+        right = int(np.clip(outer[:, 2].max(), left + 1, image.shape[1]))
+        bottom = int(np.clip(outer[:, 3].max(), top + 1, image.shape[0]))
+        offset = np.array([left, top, left, top])
+        label, span = label - offset, span - offset
+
+        binary = self.binarize(image[top:bottom, left:right])
+        integral = cv2.integral(binary)
+        height, width = binary.shape
+        limits = np.array([width, height, width, height])
+
+        def clip(boxes: np.ndarray) -> np.ndarray:
+            return np.clip(boxes, 0, limits)
+
+        def density(outer: np.ndarray, inner: Optional[np.ndarray] = None) -> np.ndarray:
+            """outer内（去掉inner）的墨迹占比"""
+            area = (outer[:, 2] - outer[:, 0]) * (outer[:, 3] - outer[:, 1]).astype(np.float64)
+            ink = box_sums(integral, outer)
+            if inner is not None:
+                area -= (inner[:, 2] - inner[:, 0]) * (inner[:, 3] - inner[:, 1])
+                ink -= box_sums(integral, inner)
+            return ink / np.maximum(area, 1)
+
+        label, span = clip(label), clip(span)
+        label_outer, span_outer = clip(label + expand), clip(span + expand)
+
+        # 涂黑/打勾增加字母本身的墨迹，圈选增加字母或整个选项外圈的墨迹
+        raw = density(label) + density(label_outer, label) + density(span_outer, span)
+
+        return self._label_results(questions, raw, counts)
+
+    def _label_results(self, questions: List[List[OptionBox]], raw: np.ndarray,
+                       counts: np.ndarray) -> List[MarkResult]:
+        """每道题的墨迹密度减去同题中位数后，按最高和次高选项判断"""
+        results = []
+        for question, scores in zip(questions, np.split(raw, np.cumsum(counts)[:-1])):
+            if len(question) < 2:
+                # 只有一个选项时没有可比较的基准
+                results.append(MarkResult('', 'unknown', 0.0))
+                continue
+
+            relative = scores - np.median(scores)
+            order = np.argsort(relative)[::-1]
+            best, second = relative[order[0]], max(relative[order[1]], 0.0)
+            labelled = {option.option: float(score) for option, score in zip(question, relative)}
+
+            if best < self.min_mark_density:
+                confidence = 1.0 - max(best, 0.0) / self.min_mark_density
+                results.append(MarkResult('', 'blank', confidence, labelled))
+                continue
+
+            # 与次高选项拉开的幅度，以及标记本身的强度
+            confidence = (best - second) / best * min(best / (2 * self.min_mark_density), 1.0)
+            status = 'multiple' if second >= self.min_mark_density else 'marked'
+            results.append(MarkResult(question[order[0]].option, status, float(confidence), labelled))
+        return results
+
+    def read_structured(self, image: np.ndarray, structured: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        识别结构化结果中每道选择题的标记，结果写入题目的marked_choice
+
+        Returns:
+            识别报告
+        """
+        start_time = time.perf_counter()
+        choice_questions, option_boxes = [], []
+        for question in structured.get('questions', []):
+            if not question.get('answer_options'):
+                continue
+            boxes, seen = [], set()
+            for option in question['answer_options']:
+                for box in split_option_boxes(option['text'], option['bbox']):
+                    if box.option not in seen:
+                        seen.add(box.option)
+                        boxes.append(box)
+            choice_questions.append(question)
+            option_boxes.append(boxes)
+
+        results = self.read(image, option_boxes) if choice_questions else []
+        for question, result in zip(choice_questions, results):
+            question['marked_choice'] = result.to_dict()
+
+        return {
+            'questions': len(choice_questions),
+            'marked': sum(1 for result in results if result.status == 'marked'),
+            'time_ms': round((time.perf_counter() - start_time) * 1000, 2)
+        }
+
+
+# 全局标记识别器
+optical_mark_reader = OpticalMarkReader.from_settings()
@@ -0,0 +1,198 @@
+"""
+作业页面感知哈希
+同一页作业换个角度重拍时文件内容完全不同，按内容哈希的OCR缓存无法命中。
+上传时计算每页的pHash（DCT低频）和dHash（相邻像素梯度），按用户保存在作业记录上，
+新上传的作业与该用户近期作业逐页比较汉明距离。页数相同、每页都近似且使用同一份标准答案时
+提示用户可复用之前的批改结果（由用户确认后复用，不自动套用）
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.grading_job import GradingJob
+from app.models.homework import Homework
+from app.services.image_preprocessing import ImageData
+
+HASH_BITS = 64
+HASH_HEX_LENGTH = HASH_BITS // 4
+
+
+def _load_grayscale(image: ImageData) -> np.ndarray:
+    """解码为灰度图；JPEG按1/4尺寸解码，哈希只需要低频信息"""
+    if isinstance(image, np.ndarray):
+        if image.ndim == 3:
+            return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        return image
+
+    buffer = np.frombuffer(image, dtype=np.uint8)
+    gray = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None or min(gray.shape) < 32:
+        gray = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError("无法解码图片")
+    return gray
+
+
+def _bits_to_hex(bits: np.ndarray) -> str:
+    return np.packbits(bits.astype(np.uint8).ravel()).tobytes().hex()
+
+
+def compute_phash(gray: np.ndarray) -> str:
+    """pHash：32x32缩略图DCT变换后左上8x8低频系数与中位数比较"""
+    thumbnail = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_freq = cv2.dct(thumbnail)[:8, :8]
+    # 直流分量只反映整体亮度，不参与中位数
+    median = np.median(low_freq.ravel()[1:])
+    return _bits_to_hex(low_freq > median)
+
+
+def compute_dhash(gray: np.ndarray) -> str:
+    """dHash：9x8缩略图中每行相邻像素的亮度梯度方向"""
+    thumbnail = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _bits_to_hex(thumbnail[:, 1:] > thumbnail[:, :-1])
+
+
+@dataclass
+class PageHash:
+    """页面感知哈希（各64位，十六进制）"""
+    phash: str
+    dhash: str
+
+    def to_string(self) -> str:
+        """存入Homework.perceptual_hash的格式：pHash在前、dHash在后"""
+        return self.phash + self.dhash
+
+    @classmethod
+    def from_string(cls, value: str) -> 'PageHash':
+        return cls(value[:HASH_HEX_LENGTH], value[HASH_HEX_LENGTH:])
+
+
+def compute_page_hash(image: ImageData) -> PageHash:
+    """计算页面的pHash和dHash"""
+    gray = _load_grayscale(image)
+    return PageHash(compute_phash(gray), compute_dhash(gray))
+
+
+def hamming_distances(target: str, candidates: List[str]) -> np.ndarray:
+    """target与每个候选哈希（等长十六进制）的汉明距离"""
+    if not candidates:
+        return np.zeros(0, dtype=np.int64)
+    target_bytes = np.frombuffer(bytes.fromhex(target), dtype=np.uint8)
+    candidate_bytes = np.frombuffer(
+        bytes.fromhex(''.join(candidates)), dtype=np.uint8
+    ).reshape(len(candidates), -1)
+    return np.unpackbits(candidate_bytes ^ target_bytes, axis=1).sum(axis=1)
+
+
+@dataclass
+class DuplicateMatch:
+    """与新作业近似重复的历史作业"""
+    homework: Homework
+    phash_distance: int  # 各页中最大的pHash距离
+    dhash_distance: int  # 各页中最大的dHash距离
+    pages: int = 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'homework_id': self.homework.id,
+            'status': self.homework.status,
+            'subject': self.homework.subject,
+            'created_at': self.homework.created_at.isoformat() if self.homework.created_at else None,
+            'pages': self.pages,
+            'phash_distance': self.phash_distance,
+            'dhash_distance': self.dhash_distance
+        }
+
+
+class HomeworkDuplicateFinder:
+    """在用户近期作业中查找近似重复的作业"""
+
+    def __init__(self, max_phash_distance: int = 8, max_dhash_distance: int = 10,
+                 lookback_days: int = 30, max_candidates: int = 500):
+        self.max_phash_distance = max_phash_distance
+        self.max_dhash_distance = max_dhash_distance
+        self.lookback_days = lookback_days
+        self.max_candidates = max_candidates
+
+    @classmethod
+    def from_settings(cls) -> 'HomeworkDuplicateFinder':
+        return cls(
+            max_phash_distance=settings.HOMEWORK_DUPLICATE_PHASH_DISTANCE,
+            max_dhash_distance=settings.HOMEWORK_DUPLICATE_DHASH_DISTANCE,
+            lookback_days=settings.HOMEWORK_DUPLICATE_LOOKBACK_DAYS,
+            max_candidates=settings.HOMEWORK_DUPLICATE_MAX_CANDIDATES
+        )
+
+    def find(self, db: Session, user_id: int, page_hashes: List[PageHash],
+             subject: Optional[str] = None,
+             exclude_id: Optional[int] = None,
+             answer_key_id: Optional[int] = None) -> Optional[DuplicateMatch]:
+        """
+        返回页数相同、每页两种哈希距离都在阈值内、且总距离最小的已完成作业
+
+        候选范围由(user_id, perceptual_hash)索引限定为该用户近期有哈希、自行批改（非复用）的作业，
+        且批改时使用的标准答案与answer_key_id相同；距离在内存中批量计算
+        """
+        if not page_hashes:
+            return None
+
+        since = datetime.now() - timedelta(days=self.lookback_days)
+        query = db.query(Homework.id, Homework.perceptual_hash, Homework.page_hashes).outerjoin(
+            GradingJob, GradingJob.homework_id == Homework.id
+        ).filter(
+            Homework.user_id == user_id,
+            Homework.perceptual_hash.isnot(None),
+            Homework.status == 'completed',
+            Homework.duplicate_of_id.is_(None),
+            Homework.created_at >= since
+        )
+        if answer_key_id is None:
+            query = query.filter(GradingJob.answer_key_id.is_(None))
+        else:
+            query = query.filter(GradingJob.answer_key_id == answer_key_id)
+        if subject:
+            query = query.filter(Homework.subject == subject)
+        if exclude_id is not None:
+            query = query.filter(Homework.id != exclude_id)
+        rows = query.order_by(Homework.created_at.desc()).limit(self.max_candidates).all()
+
+        # 只比较页数相同的作业（早期记录只保存了第一页的哈希，视为单页）
+        candidates = [
+            (homework_id, stored or [first_page])
+            for homework_id, first_page, stored in rows
+            if len(stored or [first_page]) == len(page_hashes)
+        ]
+        if not candidates:
+            return None
+
+        page_count = len(page_hashes)
+        phash_distances = np.zeros((len(candidates), page_count), dtype=np.int64)
+        dhash_distances = np.zeros((len(candidates), page_count), dtype=np.int64)
+        for page, page_hash in enumerate(page_hashes):
+            hashes = [PageHash.from_string(stored[page]) for _, stored in candidates]
+            phash_distances[:, page] = hamming_distances(page_hash.phash, [h.phash for h in hashes])
+            dhash_distances[:, page] = hamming_distances(page_hash.dhash, [h.dhash for h in hashes])
+
+        within = ((phash_distances <= self.max_phash_distance)
+                  & (dhash_distances <= self.max_dhash_distance)).all(axis=1)
+        if not within.any():
+            return None
+
+        # 距离相同时取最近的一次（候选已按时间倒序）
+        scores = np.where(within, (phash_distances + dhash_distances).sum(axis=1), np.iinfo(np.int64).max)
+        best = int(np.argmin(scores))
+        homework = db.query(Homework).filter(Homework.id == candidates[best][0]).first()
+        if homework is None:
+            return None
+        return DuplicateMatch(
+            homework, int(phash_distances[best].max()), int(dhash_distances[best].max()), pages=page_count
+        )
+
+
+# 全局重复页面查找器
+homework_duplicate_finder = HomeworkDuplicateFinder.from_settings()
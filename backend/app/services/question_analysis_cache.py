@@ -0,0 +1,132 @@
+"""
+题目分析缓存
+同一班级的学生提交同一份练习纸时，题目文字相同，题型、知识点、难度、标准答案和解题步骤只需分析一次，
+每个学生只对作答做评估。
+识别出的题目文字中带有学生的作答（"7+3=10"与"7+3=9"），缓存键和题目分析只依据去掉作答后的题干。
+按学科、年级和规范化题干的哈希寻址，一级为进程内LRU，
+二级为Redis（shared/utils/cache.py中的cache_question_analysis/get_question_analysis）
+"""
+import copy
+import hashlib
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.lru_cache import LRUCache
+from app.services.answer_region_ocr import SLOT_PATTERN
+
+try:
+    from shared.utils.cache import cache_question_analysis, get_question_analysis
+    REDIS_CACHE_AVAILABLE = True
+except Exception as e:
+    # shared配置缺失或redis不可用时只使用进程内缓存
+    REDIS_CACHE_AVAILABLE = False
+    print(f"题目分析Redis缓存不可用，仅使用进程内缓存: {e.__class__.__name__}")
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+# 与中文等非ASCII字符相邻的空格（OCR识别中文时随机插入）
+_NON_ASCII_SPACE_PATTERN = re.compile(r'(?<=[^\x00-\x7f]) | (?=[^\x00-\x7f])')
+# 学生在题目后写的解答过程和答句（"解：……"、"答：……"）
+_SOLUTION_PATTERN = re.compile(r'(?:^|(?<=[\s。？?！!]))[解答]\s*[:：].*$', re.S)
+
+
+def question_stem(question_text: str) -> str:
+    """
+    去掉学生作答后的题干：等号后的答案、选择题括号内的字母、填空横线，以及"解："、"答："之后的内容
+
+    只剩作答内容时返回原文
+    """
+    text = _SOLUTION_PATTERN.sub('', question_text or '')
+    return SLOT_PATTERN.sub('', text).strip() or (question_text or '')
+
+
+def normalize_question_text(question_text: str) -> str:
+    """
+    规范化题目文字：全角字符转半角（NFKC），连续空白合并为一个空格，去掉与中文相邻的空格
+
+    同一道印刷题目在不同照片上的OCR结果常只在空格和全半角上不同；
+    ASCII字符之间的空格保留，避免"1. 7+3="与"1.7+3="之类的题目被视为同一道
+    """
+    text = unicodedata.normalize('NFKC', question_text or '')
+    text = _WHITESPACE_PATTERN.sub(' ', text).strip()
+    return _NON_ASCII_SPACE_PATTERN.sub('', text)
+
+
+class QuestionAnalysisCache:
+    """题目分析结果两级缓存，缓存值为QuestionAnalysis的字段字典"""
+
+    def __init__(self, max_size: int = 4096, use_redis: bool = True, ttl: int = 604800):
+        self.local_cache = LRUCache(max_size=max_size)
+        self.use_redis = use_redis and REDIS_CACHE_AVAILABLE
+        self.ttl = ttl
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls) -> 'QuestionAnalysisCache':
+        return cls(
+            max_size=settings.QUESTION_ANALYSIS_CACHE_SIZE,
+            use_redis=settings.QUESTION_ANALYSIS_CACHE_REDIS,
+            ttl=settings.QUESTION_ANALYSIS_CACHE_TTL
+        )
+
+    @staticmethod
+    def make_key(subject: str, grade_level: str, question_text: str) -> str:
+        """按学科、年级和规范化题干生成缓存键，不同学生的作答不影响缓存键"""
+        digest = hashlib.sha256(normalize_question_text(question_stem(question_text)).encode('utf-8'))
+        return f"{subject}:{grade_level}:{digest.hexdigest()}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，命中时返回副本"""
+        analysis = self.local_cache.get(key)
+        if analysis is not None:
+            self._record('memory')
+            return copy.deepcopy(analysis)
+
+        if self.use_redis:
+            analysis = get_question_analysis(key)
+            if isinstance(analysis, dict):
+                self.local_cache.set(key, analysis)
+                self._record('redis')
+                return copy.deepcopy(analysis)
+
+        self._record('miss')
+        return None
+
+    def set(self, key: str, analysis: Dict[str, Any]):
+        """写入缓存"""
+        analysis = copy.deepcopy(analysis)
+        self.local_cache.set(key, analysis)
+
+        if self.use_redis:
+            cache_question_analysis(key, analysis, self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        total = self.memory_hits + self.redis_hits + self.misses
+        hits = self.memory_hits + self.redis_hits
+        return {
+            'memory_hits': self.memory_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+            'memory_size': len(self.local_cache),
+            'redis_enabled': self.use_redis
+        }
+
+    def _record(self, outcome: str):
+        with self._stats_lock:
+            if outcome == 'memory':
+                self.memory_hits += 1
+            elif outcome == 'redis':
+                self.redis_hits += 1
+            else:
+                self.misses += 1
+
+
+# 全局题目分析缓存
+question_analysis_cache = QuestionAnalysisCache.from_settings()
@@ -0,0 +1,162 @@
+"""
+OCR文字区域类型分类器
+所有类型规则预编译为一个正则：每条规则是位于开头的前向断言，按优先级排列成分支，
+一次匹配即得到第一个命中的类型（match.lastgroup），不再逐条调用re.match/re.search
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+# 文字类型识别模式（与VisionOCRService.text_patterns一致）
+TEXT_PATTERNS = {
+    'question_number': r'^(\d+)[\.、)]\s*',
+    'choice_option': r'^[A-H][\.、)]\s*',
+    'formula': r'[\+\-\×\÷\=\(\)\^\²\³\√\∫\∑]',
+    'number': r'^\d+\.?\d*$',
+    'fraction': r'\d+/\d+',
+    'percentage': r'\d+\.?\d*%',
+    'chinese_number': r'[零一二三四五六七八九十百千万]',
+    'english_word': r'^[A-Za-z]+$',
+    'mixed_math': r'[0-9\+\-\×\÷\=\(\)]+',
+    'punctuation': r'^[。，！？、；：""''（）【】]+$'
+}
+
+# (类型, 模式, 是否从开头匹配)，按判断优先级排列
+_RULES = [
+    ('question_number', TEXT_PATTERNS['question_number'], True),
+    ('choice_option', TEXT_PATTERNS['choice_option'], True),
+    ('formula', TEXT_PATTERNS['formula'], False),
+    ('number', TEXT_PATTERNS['number'], True),
+    ('fraction', TEXT_PATTERNS['fraction'], False),
+    ('percentage', TEXT_PATTERNS['percentage'], False),
+    ('english_word', TEXT_PATTERNS['english_word'], True),
+    ('chinese_text', r'[\u4e00-\u9fff]', False),
+    ('punctuation', TEXT_PATTERNS['punctuation'], True),
+    ('mixed_math', TEXT_PATTERNS['mixed_math'], False),
+]
+
+_QUESTION_NUMBER = re.compile(r'^(\d+)')
+_CHOICE_OPTION = re.compile(r'^([A-H])')
+_FORMULA_OPERATORS = re.compile(r'[+\-×÷=()]')
+
+
+def _compile_rules() -> 're.Pattern[str]':
+    """
+    合并为单个正则：(?=规则1)(?P<类型1>)|(?=规则2)(?P<类型2>)|...
+    re.match对应从开头断言，re.search对应断言前加非贪婪的任意前缀
+    """
+    branches = []
+    for name, pattern, anchored in _RULES:
+        prefix = '' if anchored else r'[\s\S]*?'
+        branches.append(f'(?={prefix}(?:{pattern}))(?P<{name}>)')
+    return re.compile('|'.join(branches))
+
+
+class TextTypeClassifier:
+    """单次扫描的文字类型分类器"""
+
+    def __init__(self):
+        self._matcher = _compile_rules()
+        self._builders: Dict[str, Callable[[str], Dict[str, Any]]] = {
+            'question_number': self._question_number,
+            'choice_option': self._choice_option,
+            'formula': self._formula,
+            'number': self._number,
+            'fraction': lambda text: {
+                'type': 'fraction',
+                'is_answer_part': True,
+                'properties': {'format': 'fraction'}
+            },
+            'percentage': lambda text: {
+                'type': 'percentage',
+                'is_answer_part': True,
+                'properties': {'format': 'percentage'}
+            },
+            'english_word': lambda text: {
+                'type': 'english_text',
+                'subtype': 'word' if len(text.split()) == 1 else 'phrase',
+                'properties': {'word_count': len(text.split())}
+            },
+            'chinese_text': lambda text: {
+                'type': 'chinese_text',
+                'subtype': 'sentence' if len(text) > 10 else 'word',
+                'properties': {'char_count': len(text)}
+            },
+            'punctuation': lambda text: {
+                'type': 'punctuation',
+                'properties': {'symbols': list(text)}
+            },
+            'mixed_math': lambda text: {
+                'type': 'math_expression',
+                'is_question_part': True,
+                'properties': {'has_operators': True}
+            },
+        }
+
+    def match_type(self, text: str) -> Optional[str]:
+        """返回第一个命中的规则名，都不命中时返回None"""
+        match = self._matcher.match(text)
+        return match.lastgroup if match else None
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """识别单个文字区域的类型"""
+        text_clean = text.strip()
+        rule = self.match_type(text_clean)
+        if rule is None:
+            # 默认为普通文本
+            return {
+                'type': 'text',
+                'subtype': 'general',
+                'properties': {'length': len(text_clean)}
+            }
+        return self._builders[rule](text_clean)
+
+    def classify_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """识别整页文字区域的类型"""
+        classify = self.classify
+        return [classify(text) for text in texts]
+
+    @staticmethod
+    def _question_number(text: str) -> Dict[str, Any]:
+        return {
+            'type': 'question_number',
+            'subtype': 'primary',
+            'is_question_part': True,
+            'properties': {'number': _QUESTION_NUMBER.match(text).group(1)}
+        }
+
+    @staticmethod
+    def _choice_option(text: str) -> Dict[str, Any]:
+        return {
+            'type': 'choice_option',
+            'subtype': 'option',
+            'is_answer_part': True,
+            'properties': {'option': _CHOICE_OPTION.match(text).group(1)}
+        }
+
+    @staticmethod
+    def _formula(text: str) -> Dict[str, Any]:
+        formula_type = 'arithmetic'
+        if '=' in text:
+            formula_type = 'equation'
+        elif any(symbol in text for symbol in ['√', '∫', '∑']):
+            formula_type = 'advanced'
+
+        return {
+            'type': 'formula',
+            'subtype': formula_type,
+            'is_question_part': True,
+            'properties': {'complexity': len(_FORMULA_OPERATORS.findall(text))}
+        }
+
+    @staticmethod
+    def _number(text: str) -> Dict[str, Any]:
+        return {
+            'type': 'number',
+            'subtype': 'decimal' if '.' in text else 'integer',
+            'is_answer_part': True,
+            'properties': {'value': float(text) if '.' in text else int(text)}
+        }
+
+
+# 全局分类器（编译后的正则可在线程间共享）
+text_type_classifier = TextTypeClassifier()
@@ -4,133 +4,212 @@
 """
 import base64
 import json
-import re
 import cv2
 import numpy as np
-from typing import Dict, List, Tuple, Optional, Any
-from PIL import Image, ImageEnhance, ImageFilter
+from typing import Dict, List, Tuple, Optional, Any, Union
 import io
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
-    print("EasyOCR未安装，将使用模拟OCR")
+from app.core.config import settings
+from app.services.ocr_engine_registry import ocr_engine_registry
+from app.services.ocr_result_cache import ocr_result_cache
+from app.services.ocr_regions import TextRegionBatch, overlap_ratio
+from app.services.image_preprocessing import ImagePreprocessor, ImageData
+from app.services.image_quality import ImageQualityGate
+from app.services.layout_analysis import LayoutAnalyzer, LayoutBlock
+from app.services.ocr_routing import ocr_routing_policy
+from app.services.ocr_batcher import ocr_batchers, BATCH_RUNNERS
+from app.services.ocr_worker_client import ocr_worker_client, OCRWorkerError
+from app.services.text_type_classifier import text_type_classifier, TEXT_PATTERNS
+from app.services.perceptual_hash import compute_page_hash
+from app.services.answer_region_ocr import (
+    WorksheetLayout, center_inside, printed_text, text_similarity, worksheet_layout_cache
+)
+from app.services.optical_mark_recognition import optical_mark_reader
 
-try:
-    import paddleocr
-    PADDLEOCR_AVAILABLE = True
-except ImportError:
-    PADDLEOCR_AVAILABLE = False
-    print("PaddleOCR未安装，将使用模拟OCR")
+# 图片来源：文件路径、data URL，或内存中的文件内容/图片数组
+ImageSource = Union[str, ImageData]
 
 
-class TextRegion:
-    """文字区域信息"""
-    def __init__(self, text: str, bbox: List[int], confidence: float, 
-                 region_type: str = 'text'):
-        self.text = text.strip()
-        self.bbox = bbox  # [x1, y1, x2, y2]
-        self.confidence = confidence
-        self.region_type = region_type  # text, number, formula, choice
-        self.position = self._calculate_position()
-    
-    def _calculate_position(self) -> Dict[str, int]:
-        """计算文字区域的位置信息"""
-        return {
-            'x': self.bbox[0],
-            'y': self.bbox[1], 
-            'width': self.bbox[2] - self.bbox[0],
-            'height': self.bbox[3] - self.bbox[1],
-            'center_x': (self.bbox[0] + self.bbox[2]) // 2,
-            'center_y': (self.bbox[1] + self.bbox[3]) // 2
-        }
+def describe_image_source(image_source: ImageSource) -> str:
+    """用于日志的图片来源描述（内存图片不打印内容）"""
+    if isinstance(image_source, str):
+        return image_source if not image_source.startswith('data:') else 'data URL'
+    if isinstance(image_source, np.ndarray):
+        return f"内存图片数组{image_source.shape}"
+    return f"内存图片({memoryview(image_source).nbytes}字节)"
+
+
+# 多引擎并发执行的线程池（进程内共享，有界）
+_engine_executor: Optional[ThreadPoolExecutor] = None
+_engine_executor_lock = threading.Lock()
+
+
+def _get_engine_executor() -> ThreadPoolExecutor:
+    """获取OCR引擎线程池"""
+    global _engine_executor
+    if _engine_executor is None:
+        with _engine_executor_lock:
+            if _engine_executor is None:
+                _engine_executor = ThreadPoolExecutor(
+                    max_workers=settings.OCR_ENGINE_MAX_WORKERS,
+                    thread_name_prefix='ocr-engine'
+                )
+    return _engine_executor
 
 
 class VisionOCRService:
     """视觉OCR服务"""
     
     def __init__(self):
+        self.engine_registry = ocr_engine_registry
+        self.result_cache = ocr_result_cache
+        self.preprocessor = ImagePreprocessor()
+        self.quality_gate = ImageQualityGate()
+        self.layout_analyzer = LayoutAnalyzer()
+        self.routing_policy = ocr_routing_policy
+        self.layout_cache = worksheet_layout_cache
+        self.worker_pool = None  # 进程池模式下的客户端，None表示进程内识别
         self.ocr_engines = []
         self._init_ocr_engines()
         
-        # 文字类型识别模式
-        self.text_patterns = {
-            'question_number': r'^(\d+)[\.、)]\s*',
-            'choice_option': r'^[A-H][\.、)]\s*',
-            'formula': r'[\+\-\×\÷\=\(\)\^\²\³\√\∫\∑]',
-            'number': r'^\d+\.?\d*$',
-            'fraction': r'\d+/\d+',
-            'percentage': r'\d+\.?\d*%',
-            'chinese_number': r'[零一二三四五六七八九十百千万]',
-            'english_word': r'^[A-Za-z]+$',
-            'mixed_math': r'[0-9\+\-\×\÷\=\(\)]+',
-            'punctuation': r'^[。，！？、；：""''（）【】]+$'
-        }
+        # 文字类型识别模式（预编译为单次扫描的分类器）
+        self.text_patterns = dict(TEXT_PATTERNS)
+        self.text_classifier = text_type_classifier
     
     def _init_ocr_engines(self):
-        """初始化OCR引擎"""
-        try:
-            # 初始化EasyOCR
-            if EASYOCR_AVAILABLE:
-                self.easy_reader = easyocr.Reader(['ch_sim', 'en'], gpu=False)
-                self.ocr_engines.append('easyocr')
-                print("EasyOCR初始化成功")
-        except Exception as e:
-            print(f"EasyOCR初始化失败: {e}")
+        """
+        确定可用的OCR引擎
         
-        try:
-            # 初始化PaddleOCR  
-            if PADDLEOCR_AVAILABLE:
-                self.paddle_ocr = paddleocr.PaddleOCR(
-                    use_angle_cls=True, 
-                    lang='ch',
-                    show_log=False
-                )
-                self.ocr_engines.append('paddleocr')
-                print("PaddleOCR初始化成功")
-        except Exception as e:
-            print(f"PaddleOCR初始化失败: {e}")
+        进程内模式下模型由注册表在首次使用时加载；进程池模式下模型由OCR工作进程持有，
+        工作进程池不可用时回退到进程内模式
+        """
+        if settings.OCR_WORKER_MODE == 'pooled':
+            try:
+                self.ocr_engines = ocr_worker_client.available_engines()
+                self.worker_pool = ocr_worker_client
+            except OCRWorkerError as e:
+                print(f"OCR工作进程池不可用，使用进程内识别: {e}")
+        
+        if self.worker_pool is None:
+            self.ocr_engines = self.engine_registry.available_engines()
         
         if not self.ocr_engines:
             print("警告：没有可用的OCR引擎，将使用模拟OCR")
             self.ocr_engines.append('mock')
     
-    def extract_text_from_image(self, image_path: str, 
-                              preprocessing: bool = True) -> Dict[str, Any]:
+    @property
+    def easy_reader(self):
+        """共享的EasyOCR模型"""
+        return self.engine_registry.get_engine('easyocr')
+    
+    @property
+    def paddle_ocr(self):
+        """共享的PaddleOCR模型"""
+        return self.engine_registry.get_engine('paddleocr')
+    
+    def extract_text_from_image(self, image_path: ImageSource, 
+                              preprocessing: bool = True,
+                              execution_mode: Optional[str] = None,
+                              use_cache: bool = True,
+                              layout_analysis: Optional[bool] = None,
+                              subject: Optional[str] = None,
+                              quality_check: Optional[bool] = None,
+                              answer_only: Optional[bool] = None,
+                              preloaded: Optional[Tuple[np.ndarray, Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         从图片中提取文字内容
         
         Args:
-            image_path: 图片文件路径
+            image_path: 图片文件路径、data URL，或内存中的图片（bytes/memoryview/ndarray），
+                内存图片直接从缓冲区解码，不经过磁盘
             preprocessing: 是否进行图片预处理
+            execution_mode: 多引擎执行方式（sequential/concurrent/cascade），默认读取配置
+            use_cache: 是否使用OCR结果缓存
+            layout_analysis: 是否先切分题目区块再逐块并行识别，默认读取配置
+            subject: 学科，用于按路由策略选择引擎和识别语言
+            quality_check: 是否在OCR前检查图片质量，默认读取配置
+            answer_only: 教师登记过的练习纸是否只识别作答区域，默认读取配置
+            preloaded: 调用方已用load_image解码和预处理好的(图片, 预处理报告)，
+                传入后不再重复解码；缓存键和质量检查仍按原始图片内容计算
             
         Returns:
             包含提取结果的字典
         """
         try:
-            # 读取和预处理图片
-            image = self._load_and_preprocess_image(image_path, preprocessing)
+            # 读取图片内容，相同内容的图片直接命中缓存
+            image_bytes = self._read_image_bytes(image_path)
             
-            # 使用多个OCR引擎提取文字
-            ocr_results = []
-            
-            for engine in self.ocr_engines:
-                if engine == 'easyocr' and EASYOCR_AVAILABLE:
-                    result = self._extract_with_easyocr(image)
-                elif engine == 'paddleocr' and PADDLEOCR_AVAILABLE:
-                    result = self._extract_with_paddleocr(image)
-                else:
-                    result = self._extract_with_mock_ocr(image_path)
-                
-                if result:
-                    ocr_results.append(result)
+            # 模拟OCR不读取图片内容，切分区块没有意义
+            if layout_analysis is None:
+                layout_analysis = settings.OCR_LAYOUT_ANALYSIS
+            layout_analysis = layout_analysis and 'mock' not in self.ocr_engines
+            if answer_only is None:
+                answer_only = settings.OCR_ANSWER_ONLY_ENABLED
+            answer_only = answer_only and 'mock' not in self.ocr_engines
+            execution_mode = execution_mode or settings.OCR_EXECUTION_MODE
+            
+            # 按学科选择引擎和语言
+            route = self.routing_policy.route(subject, self.ocr_engines)
+            engines, engine_langs = route.engines, route.langs
+            
+            cache_key = None
+            if use_cache and settings.OCR_RESULT_CACHE_ENABLED:
+                cache_key = self.result_cache.make_key(
+                    image_bytes, preprocessing, engines,
+                    layout_analysis=layout_analysis,
+                    cascade=execution_mode == 'cascade',
+                    answer_only=answer_only,
+                    omr=settings.OMR_ENABLED and 'mock' not in self.ocr_engines,
+                    langs=sorted(engine_langs.items())
+                )
+                cached_result = self.result_cache.get(cache_key)
+                if cached_result is not None:
+                    return cached_result
+            
+            # 质量检查：模糊、过暗、过小的照片直接拒绝，不进入预处理和OCR
+            quality_report = None
+            if quality_check is None:
+                quality_check = settings.OCR_QUALITY_GATE_ENABLED
+            if quality_check:
+                quality_report = self.quality_gate.check(image_bytes)
+                if not quality_report['passed']:
+                    print(f"图片质量不合格: {quality_report['reason']} {quality_report['metrics']}")
+                    return self._create_rejection_result(quality_report)
+            
+            # 解码和预处理图片（调用方已解码过的直接复用）
+            if preloaded is not None:
+                image, preprocessing_report = preloaded
+            else:
+                image, preprocessing_report = self._load_and_preprocess_image(
+                    image_path, preprocessing, image_bytes
+                )
+            
+            deadline = settings.OCR_PAGE_DEADLINE_SECONDS
             
-            # 融合多个OCR结果
-            final_result = self._merge_ocr_results(ocr_results)
+            # 教师登记过的练习纸只识别作答区域
+            page_hash, answer_regions, answer_report = None, None, None
+            if answer_only:
+                answer_report = {'status': 'miss'}
+                page_hash = compute_page_hash(image)
+                worksheet_layout = self.layout_cache.find(page_hash)
+                if worksheet_layout is not None:
+                    answer_regions, engine_report, answer_report = self._run_answer_only(
+                        image, worksheet_layout, image_path, deadline, engines, engine_langs
+                    )
+            
+            # 使用多个OCR引擎提取文字
+            layout_report = None
+            if answer_regions is not None:
+                final_result = {'regions': answer_regions}
+            else:
+                final_result, engine_report, layout_report = self._run_full_page(
+                    image, image_path, deadline, layout_analysis, execution_mode, engines, engine_langs
+                )
             
             # 分析文字区域和类型
             analyzed_regions = self._analyze_text_regions(final_result['regions'])
@@ -138,17 +217,36 @@ class VisionOCRService:
             # 构建结构化结果
             structured_result = self._build_structured_result(analyzed_regions)
             
-            return {
+            # 按选项区域的墨迹识别选择题的勾选/圈选（模拟OCR的坐标与图片无关，不识别）
+            omr_report = None
+            if settings.OMR_ENABLED and 'mock' not in self.ocr_engines:
+                omr_report = optical_mark_reader.read_structured(image, structured_result)
+            
+            result = {
                 'success': True,
                 'message': f'成功提取文字，共识别{len(analyzed_regions)}个文字区域',
                 'total_regions': len(analyzed_regions),
-                'regions': analyzed_regions,
+                'regions': analyzed_regions.to_dicts(),
                 'structured_content': structured_result,
                 'raw_text': self._extract_plain_text(analyzed_regions),
                 'confidence_score': self._calculate_overall_confidence(analyzed_regions),
+                'engine_report': engine_report,
+                'preprocessing': preprocessing_report,
+                'layout': layout_report,
+                'answer_only': answer_report,
+                'omr': omr_report,
+                'routing': route.to_dict(),
+                'quality': quality_report,
                 'extraction_time': datetime.now().isoformat()
             }
             
+            # 有引擎超时的不完整结果不写入缓存
+            if cache_key and not engine_report['timed_out_engines']:
+                self.result_cache.set(cache_key, result)
+                result['cache'] = {'hit': False, 'layer': None, 'key': cache_key}
+            
+            return result
+            
         except Exception as e:
             print(f"文字提取失败: {e}")
             return {
@@ -160,72 +258,571 @@ class VisionOCRService:
                 'confidence_score': 0.0
             }
     
-    def _load_and_preprocess_image(self, image_path: str, 
-                                 preprocessing: bool = True) -> np.ndarray:
-        """加载并预处理图片"""
+    def load_image(self, image_path: ImageSource, preprocessing: bool = True) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """按整页识别相同的流程读取、解码和预处理图片，返回图片数组和预处理报告"""
+        return self._load_and_preprocess_image(image_path, preprocessing)
+    
+    def extract_text_from_cells(self, image: np.ndarray, cells: List[Tuple[int, int, int, int]],
+                                subject: Optional[str] = None) -> Dict[str, Any]:
+        """
+        只识别给定的单元格（如已对齐到练习纸模板的作答区域）
         
-        # 读取图片
-        if image_path.startswith('data:image'):
-            # 处理base64编码的图片
-            image_data = base64.b64decode(image_path.split(',')[1])
-            image = Image.open(io.BytesIO(image_data))
+        Args:
+            image: 已解码的图片
+            cells: 单元格像素坐标 [(x1, y1, x2, y2), ...]
+            subject: 学科，用于按路由策略选择引擎和识别语言
+            
+        Returns:
+            {'success', 'cells': [{'text', 'confidence'}], 'engine_report'}，cells与输入一一对应
+        """
+        route = self.routing_policy.route(subject, self.ocr_engines)
+        height, width = image.shape[:2]
+        blocks = [
+            LayoutBlock(max(x1, 0), max(y1, 0), min(x2, width), min(y2, height), ink_ratio=0.0)
+            for x1, y1, x2, y2 in cells
+        ]
+        
+        ocr_results, engine_report = self._run_engines_on_blocks(
+            image, blocks, image, settings.OCR_PAGE_DEADLINE_SECONDS, route.engines, route.langs
+        )
+        engine_report['mode'] = 'cells'
+        recognized = self._merge_ocr_results(ocr_results)['regions']
+        
+        results = []
+        for block in blocks:
+            text, confidence = self._texts_in_block(recognized, block)
+            results.append({'text': text, 'confidence': confidence})
+        
+        return {
+            'success': bool(ocr_results) and not engine_report['timed_out_engines'],
+            'cells': results,
+            'engine_report': engine_report
+        }
+    
+    def _run_full_page(self, image: np.ndarray, image_path: ImageSource, deadline: float,
+                       layout_analysis: bool, execution_mode: str, engines: List[str],
+                       engine_langs: Dict[str, List[str]]) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        整页识别并融合多个引擎的结果
+        
+        Returns:
+            (融合结果, 引擎报告, 版面分析报告)
+        """
+        blocks, layout_report = None, None
+        if layout_analysis:
+            # 只识别题目区块，空白页边距不送入OCR引擎
+            blocks, layout_report = self.layout_analyzer.analyze(image)
+        
+        if execution_mode == 'cascade' and len(engines) > 1:
+            ocr_results, engine_report = self._run_engines_cascade(
+                image, image_path, blocks, deadline, engines, engine_langs
+            )
+        elif blocks is not None:
+            ocr_results, engine_report = self._run_engines_on_blocks(
+                image, blocks, image_path, deadline, engines, engine_langs
+            )
+        elif execution_mode == 'concurrent' and len(engines) > 1:
+            ocr_results, engine_report = self._run_engines_concurrently(
+                image, image_path, deadline, engines, engine_langs
+            )
         else:
-            # 处理文件路径
-            image = Image.open(image_path)
+            ocr_results, engine_report = self._run_engines_sequentially(
+                image, image_path, engines, engine_langs, deadline
+            )
+        
+        # 所有模型均加载失败时回退到模拟OCR
+        if not ocr_results and self.worker_pool is None and not self.engine_registry.available_engines():
+            ocr_results.append(self._extract_with_mock_ocr(image_path))
+        
+        # 融合多个OCR结果
+        return self._merge_ocr_results(ocr_results), engine_report, layout_report
+    
+    def _run_answer_only(self, image: np.ndarray, worksheet_layout: WorksheetLayout,
+                         image_path: ImageSource, deadline: float, engines: List[str],
+                         engine_langs: Dict[str, List[str]]) -> Tuple[Optional[TextRegionBatch], Optional[Dict[str, Any]], Dict[str, Any]]:
+        """
+        只识别作答区域和几行抽查文字，与模板保存的印刷文字拼成整页结果
+        
+        Returns:
+            (整页文字区域, 引擎报告, 作答区域报告)；抽查不通过或引擎超时时文字区域为None，
+            由调用方回退到整页识别
+        """
+        height, width = image.shape[:2]
+        margin = settings.OCR_ANSWER_ONLY_MARGIN
+        answer_blocks = worksheet_layout.area_blocks(width, height, margin)
+        verify_blocks = worksheet_layout.verify_blocks(width, height, margin)
+        
+        ocr_results, engine_report = self._run_engines_on_blocks(
+            image, answer_blocks + verify_blocks, image_path, deadline, engines, engine_langs
+        )
+        engine_report['mode'] = 'answer_only'
+        report = {
+            'status': 'hit',
+            'layout_id': worksheet_layout.layout_id,
+            'answer_areas': len(answer_blocks),
+            'verified_regions': len(verify_blocks),
+            'ocr_area_ratio': worksheet_layout.ocr_area_ratio(width, height, margin)
+        }
+        if engine_report['timed_out_engines'] or not ocr_results:
+            report['status'] = 'failed'
+            return None, None, report
         
-        # 转换为RGB模式
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        recognized = self._merge_ocr_results(ocr_results)['regions']
         
-        # 图片预处理（如果启用）
-        if preprocessing:
-            image = self._enhance_image_quality(image)
+        # 抽查印刷文字：同一模板上题目不同的练习纸哈希也相近
+        similarities = [
+            text_similarity(printed_text(self._texts_in_block(recognized, block)[0]), expected)
+            for block, expected in zip(verify_blocks, worksheet_layout.verify_texts)
+        ]
+        report['verify_similarity'] = [round(value, 3) for value in similarities]
+        if any(value < settings.OCR_ANSWER_ONLY_MIN_SIMILARITY for value in similarities):
+            print(f"练习纸布局{worksheet_layout.layout_id}抽查不一致，回退整页识别: {report['verify_similarity']}")
+            self.layout_cache.record('verify_failed')
+            report['status'] = 'verify_failed'
+            return None, None, report
+        self.layout_cache.record('hit')
+        
+        answers = []
+        confidences = worksheet_layout.confidences.copy()
+        for area, block in zip(worksheet_layout.answer_areas, answer_blocks):
+            answer, answer_confidence = self._texts_in_block(recognized, block)
+            answers.append(answer)
+            if answer_confidence is not None:
+                # 整行的可信度取决于作答内容的识别
+                confidences[area.region_index] = min(confidences[area.region_index], answer_confidence)
+        
+        regions = TextRegionBatch(
+            worksheet_layout.compose_texts(answers), worksheet_layout.scaled_bboxes(width, height), confidences
+        )
+        return regions, engine_report, report
+    
+    @staticmethod
+    def _texts_in_block(regions: TextRegionBatch, block: LayoutBlock) -> Tuple[str, Optional[float]]:
+        """中心落在区块内的文字（按阅读顺序拼接）及其平均置信度"""
+        if not len(regions):
+            return '', None
         
-        # 转换为numpy数组
-        return np.array(image)
+        bboxes = regions.bboxes
+        inside = np.flatnonzero(center_inside(bboxes, block.bbox))
+        if len(inside) == 0:
+            return '', None
+        
+        inside = inside[np.lexsort((bboxes[inside, 0], bboxes[inside, 1] // 20))]
+        text = ' '.join(regions.texts[i] for i in inside.tolist())
+        return text, float(regions.confidences[inside].mean())
+    
+    def _create_rejection_result(self, quality_report: Dict[str, Any]) -> Dict[str, Any]:
+        """图片质量不合格时的结构化结果"""
+        return {
+            'success': False,
+            'message': quality_report['message'],
+            'rejection': {
+                'reason': quality_report['reason'],
+                'message': quality_report['message'],
+                'issues': quality_report['issues'],
+                'metrics': quality_report['metrics']
+            },
+            'quality': quality_report,
+            'regions': [],
+            'structured_content': {},
+            'raw_text': '',
+            'confidence_score': 0.0
+        }
+    
+    def _run_engine(self, engine: str, image: np.ndarray, image_path: ImageSource,
+                    langs: Optional[List[str]] = None,
+                    timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """使用单个引擎提取文字（langs为空时使用引擎默认语言，timeout为最多等待推理结果的秒数）"""
+        if engine == 'easyocr':
+            return self._extract_with_easyocr(image, langs, timeout)
+        elif engine == 'paddleocr':
+            return self._extract_with_paddleocr(image, langs, timeout)
+        else:
+            return self._extract_with_mock_ocr(image_path)
+    
+    def _timed_run_engine(self, engine: str, image: np.ndarray, image_path: ImageSource,
+                          langs: Optional[List[str]] = None,
+                          deadline_at: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], float]:
+        """执行单个引擎并记录耗时，deadline_at为本页截止的time.perf_counter()时刻"""
+        start_time = time.perf_counter()
+        timeout = max(deadline_at - start_time, 0) if deadline_at is not None else None
+        result = self._run_engine(engine, image, image_path, langs, timeout)
+        return result, time.perf_counter() - start_time
+    
+    def _run_engines_sequentially(self, image: np.ndarray, image_path: ImageSource,
+                                  engines: Optional[List[str]] = None,
+                                  engine_langs: Optional[Dict[str, List[str]]] = None,
+                                  deadline: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """依次执行所有引擎，每个引擎最多等待deadline秒"""
+        ocr_results = []
+        engine_stats = {}
+        engine_langs = engine_langs or {}
+        
+        for engine in engines or self.ocr_engines:
+            deadline_at = time.perf_counter() + deadline if deadline is not None else None
+            result, elapsed = self._timed_run_engine(
+                engine, image, image_path, engine_langs.get(engine), deadline_at
+            )
+            engine_stats[engine] = {
+                'status': 'completed' if result else 'failed',
+                'time': round(elapsed, 3)
+            }
+            
+            if result:
+                ocr_results.append(result)
+        
+        return ocr_results, {
+            'mode': 'sequential',
+            'engines': engine_stats,
+            'timed_out_engines': []
+        }
     
-    def _enhance_image_quality(self, image: Image.Image) -> Image.Image:
-        """增强图片质量以提高OCR识别率"""
+    def _run_engines_concurrently(self, image: np.ndarray, image_path: ImageSource, deadline: float,
+                                  engines: Optional[List[str]] = None,
+                                  engine_langs: Optional[Dict[str, List[str]]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        在共享线程池中并发执行所有引擎，超过单页截止时间的引擎结果被丢弃
+        
+        超时引擎的线程无法被强制终止，会在后台跑完后释放，
+        但其结果不参与本页融合
+        """
+        executor = _get_engine_executor()
+        start_time = time.perf_counter()
         
-        # 调整对比度
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.2)
+        engine_langs = engine_langs or {}
         
-        # 调整锐度
-        enhancer = ImageEnhance.Sharpness(image)
-        image = enhancer.enhance(1.1)
+        futures = {
+            engine: executor.submit(
+                self._timed_run_engine, engine, image, image_path, engine_langs.get(engine),
+                start_time + deadline
+            )
+            for engine in engines or self.ocr_engines
+        }
+        wait(list(futures.values()), timeout=deadline)
         
-        # 降噪
-        image = image.filter(ImageFilter.MedianFilter(size=3))
+        ocr_results = []
+        engine_stats = {}
+        timed_out_engines = []
+        
+        # 按引擎顺序收集结果，保证融合结果与顺序执行一致
+        for engine, future in futures.items():
+            if not future.done():
+                future.cancel()
+                timed_out_engines.append(engine)
+                engine_stats[engine] = {'status': 'timeout', 'time': None}
+                continue
+            
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                print(f"{engine}并发提取失败: {e}")
+                engine_stats[engine] = {'status': 'failed', 'time': None}
+                continue
+            
+            engine_stats[engine] = {
+                'status': 'completed' if result else 'failed',
+                'time': round(elapsed, 3)
+            }
+            if result:
+                ocr_results.append(result)
         
-        # 如果图片太小，进行放大
-        width, height = image.size
-        if width < 800 or height < 600:
-            scale = max(800/width, 600/height)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            image = image.resize((new_width, new_height), Image.LANCZOS)
+        if timed_out_engines:
+            print(f"OCR引擎超时（{deadline}秒）: {', '.join(timed_out_engines)}")
         
-        return image
+        return ocr_results, {
+            'mode': 'concurrent',
+            'engines': engine_stats,
+            'timed_out_engines': timed_out_engines,
+            'deadline': deadline,
+            'wall_time': round(time.perf_counter() - start_time, 3)
+        }
     
-    def _extract_with_easyocr(self, image: np.ndarray) -> Dict[str, Any]:
+    def _run_engines_on_blocks(self, image: np.ndarray, blocks: List[LayoutBlock],
+                               image_path: ImageSource, deadline: float,
+                               engines: Optional[List[str]] = None,
+                               engine_langs: Optional[Dict[str, List[str]]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        按题目区块并行识别：每个(区块, 引擎)作为一个任务提交到共享线程池，
+        区块结果平移回整页坐标后按引擎合并，再进入多引擎融合
+        
+        任一区块超过单页截止时间的引擎视为超时，其结果整体丢弃
+        """
+        executor = _get_engine_executor()
+        start_time = time.perf_counter()
+        engines = engines or self.ocr_engines
+        engine_langs = engine_langs or {}
+        
+        futures = []
+        for block in blocks:
+            # 连续内存的裁剪副本，避免引擎内部对视图再做拷贝
+            crop = np.ascontiguousarray(image[block.y1:block.y2, block.x1:block.x2])
+            for engine in engines:
+                future = executor.submit(
+                    self._timed_run_engine, engine, crop, image_path, engine_langs.get(engine),
+                    start_time + deadline
+                )
+                futures.append((engine, block, future))
+        wait([future for _, _, future in futures], timeout=deadline)
+        
+        engine_regions = {engine: [] for engine in engines}
+        engine_stats = {
+            engine: {'status': 'completed', 'time': 0.0, 'blocks': 0}
+            for engine in engines
+        }
+        
+        for engine, block, future in futures:
+            stats = engine_stats[engine]
+            if not future.done():
+                future.cancel()
+                stats['status'] = 'timeout'
+                continue
+            
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                print(f"{engine}区块提取失败: {e}")
+                result, elapsed = None, 0.0
+            
+            stats['time'] += elapsed
+            if result is None:
+                if stats['status'] == 'completed':
+                    stats['status'] = 'failed'
+                continue
+            
+            stats['blocks'] += 1
+            engine_regions[engine].append(result['regions'].offset(block.x1, block.y1))
+        
+        ocr_results = []
+        timed_out_engines = []
+        for engine in engines:
+            stats = engine_stats[engine]
+            stats['time'] = round(stats['time'], 3)
+            if stats['status'] == 'timeout':
+                timed_out_engines.append(engine)
+                continue
+            # 部分区块失败时仍使用成功区块的结果
+            if stats['blocks'] or not blocks:
+                stats['status'] = 'completed'
+                regions = TextRegionBatch.concat(engine_regions[engine])
+                ocr_results.append({
+                    'engine': engine,
+                    'regions': regions,
+                    'total_detected': len(regions)
+                })
+        
+        if timed_out_engines:
+            print(f"OCR引擎超时（{deadline}秒）: {', '.join(timed_out_engines)}")
+        
+        return ocr_results, {
+            'mode': 'layout',
+            'engines': engine_stats,
+            'timed_out_engines': timed_out_engines,
+            'deadline': deadline,
+            'wall_time': round(time.perf_counter() - start_time, 3)
+        }
+    
+    def _run_engines_cascade(self, image: np.ndarray, image_path: ImageSource,
+                             blocks: Optional[List[LayoutBlock]], deadline: float,
+                             engines: Optional[List[str]] = None,
+                             engine_langs: Optional[Dict[str, List[str]]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        置信度级联：主引擎识别整页（或版面区块），只有置信度低于阈值的区域
+        按外扩边距裁剪后交给次引擎重新识别，两者取置信度更高的读数
+        
+        主引擎读得清楚的页面只需要一次OCR
+        """
+        start_time = time.perf_counter()
+        engines = engines or self.ocr_engines
+        engine_langs = engine_langs or {}
+        primary = settings.OCR_CASCADE_PRIMARY
+        if primary not in engines:
+            primary = engines[0]
+        secondary = next(engine for engine in engines if engine != primary)
+        
+        # 第一遍：主引擎
+        if blocks is not None:
+            primary_results, primary_report = self._run_engines_on_blocks(
+                image, blocks, image_path, deadline, [primary], engine_langs
+            )
+            engine_stats = primary_report['engines']
+            timed_out_engines = primary_report['timed_out_engines']
+        else:
+            result, elapsed = self._timed_run_engine(
+                primary, image, image_path, engine_langs.get(primary), start_time + deadline
+            )
+            primary_results = [result] if result else []
+            engine_stats = {primary: {
+                'status': 'completed' if result else 'failed',
+                'time': round(elapsed, 3)
+            }}
+            timed_out_engines = []
+        
+        report = {
+            'mode': 'cascade',
+            'primary': primary,
+            'secondary': secondary,
+            'threshold': settings.OCR_CASCADE_CONFIDENCE_THRESHOLD,
+            'engines': engine_stats,
+            'timed_out_engines': timed_out_engines,
+            'escalated_regions': 0,
+            'replaced_regions': 0
+        }
+        
+        if not primary_results:
+            # 主引擎失败或超时时由次引擎识别整页
+            remaining = max(deadline - (time.perf_counter() - start_time), 0)
+            fallback_results, fallback_report = self._run_engines_on_blocks(
+                image, blocks, image_path, remaining, [secondary], engine_langs
+            ) if blocks is not None else self._run_engines_concurrently(
+                image, image_path, remaining, [secondary], engine_langs
+            )
+            engine_stats.update(fallback_report['engines'])
+            timed_out_engines.extend(fallback_report['timed_out_engines'])
+            report['wall_time'] = round(time.perf_counter() - start_time, 3)
+            return fallback_results, report
+        
+        regions = primary_results[0]['regions']
+        low_indices = np.flatnonzero(
+            regions.confidences < settings.OCR_CASCADE_CONFIDENCE_THRESHOLD
+        )
+        report['escalated_regions'] = len(low_indices)
+        
+        if len(low_indices):
+            remaining = max(deadline - (time.perf_counter() - start_time), 0)
+            regions, secondary_stats = self._escalate_regions(
+                image, image_path, regions, low_indices, secondary, remaining,
+                engine_langs.get(secondary)
+            )
+            engine_stats[secondary] = secondary_stats
+            report['replaced_regions'] = secondary_stats.pop('replaced')
+            if secondary_stats['status'] == 'timeout':
+                timed_out_engines.append(secondary)
+        
+        report['wall_time'] = round(time.perf_counter() - start_time, 3)
+        return [{
+            'engine': primary,
+            'regions': regions,
+            'total_detected': len(regions)
+        }], report
+    
+    def _escalate_regions(self, image: np.ndarray, image_path: ImageSource,
+                          regions: TextRegionBatch, indices: np.ndarray,
+                          engine: str, deadline: float,
+                          langs: Optional[List[str]] = None) -> Tuple[TextRegionBatch, Dict[str, Any]]:
+        """用次引擎重新识别低置信度区域的裁剪图，读数更可信时替换文本和置信度"""
+        executor = _get_engine_executor()
+        deadline_at = time.perf_counter() + deadline
+        height, width = image.shape[:2]
+        padding = settings.OCR_CASCADE_PADDING
+        
+        x1 = np.clip(regions.bboxes[indices, 0] - padding, 0, width)
+        y1 = np.clip(regions.bboxes[indices, 1] - padding, 0, height)
+        x2 = np.clip(regions.bboxes[indices, 2] + padding, 0, width)
+        y2 = np.clip(regions.bboxes[indices, 3] + padding, 0, height)
+        
+        futures = [
+            executor.submit(
+                self._timed_run_engine, engine,
+                np.ascontiguousarray(image[top:bottom, left:right]), image_path, langs, deadline_at
+            )
+            for left, top, right, bottom in zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist())
+        ]
+        wait(futures, timeout=deadline)
+        
+        texts = list(regions.texts)
+        confidences = regions.confidences.copy()
+        stats = {'status': 'completed', 'time': 0.0, 'replaced': 0}
+        
+        for index, future in zip(indices.tolist(), futures):
+            if not future.done():
+                future.cancel()
+                stats['status'] = 'timeout'
+                continue
+            
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                print(f"{engine}级联识别失败: {e}")
+                continue
+            
+            stats['time'] += elapsed
+            if not result or not len(result['regions']):
+                continue
+            
+            # 裁剪图中可能识别出多个片段，按阅读顺序拼接为一个读数
+            candidate = result['regions']
+            candidate_text = ' '.join(candidate.texts[i] for i in candidate.reading_order())
+            candidate_confidence = float(candidate.confidences.mean())
+            
+            if candidate_confidence > confidences[index]:
+                texts[index] = candidate_text
+                confidences[index] = candidate_confidence
+                stats['replaced'] += 1
+        
+        stats['time'] = round(stats['time'], 3)
+        return TextRegionBatch(texts, regions.bboxes, confidences), stats
+    
+    def _read_image_bytes(self, image_path: ImageSource) -> ImageData:
+        """读取图片内容，内存中的图片原样返回"""
+        if not isinstance(image_path, str):
+            return image_path
+        
+        if image_path.startswith('data:image'):
+            # 处理base64编码的图片
+            return base64.b64decode(image_path[image_path.index(',') + 1:])
+        
+        # 处理文件路径
+        with open(image_path, 'rb') as f:
+            return f.read()
+    
+    def _load_and_preprocess_image(self, image_path: ImageSource, 
+                                 preprocessing: bool = True,
+                                 image_bytes: Optional[ImageData] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """加载并预处理图片，返回图片数组和各阶段耗时报告"""
+        
+        # 读取图片
+        if image_bytes is None:
+            image_bytes = self._read_image_bytes(image_path)
+        
+        # 按OCR目标尺寸解码并增强（如果启用）
+        return self.preprocessor.process(image_bytes, enhance=preprocessing)
+    
+    def _recognize(self, engine: str, image: np.ndarray,
+                   langs: Optional[List[str]] = None,
+                   timeout: Optional[float] = None) -> Any:
+        """
+        执行引擎推理，返回引擎原始输出；模型不可用时返回None
+        
+        进程池模式提交给OCR工作进程，进程内模式经微批处理队列或直接调用共享模型；
+        微批处理最多等待timeout秒，超时后撤回请求并抛出TimeoutError
+        """
+        if self.worker_pool is not None:
+            return self.worker_pool.recognize(engine, image, langs)
+        
+        if self.engine_registry.get_engine(engine, langs) is None:
+            return None
+        
+        if settings.OCR_MICRO_BATCH_ENABLED:
+            # 与并发请求的图片合并为批量识别
+            return ocr_batchers.get(engine, langs).infer(image, timeout=timeout)
+        return BATCH_RUNNERS[engine]([image], langs)[0]
+    
+    def _extract_with_easyocr(self, image: np.ndarray,
+                              langs: Optional[List[str]] = None,
+                              timeout: Optional[float] = None) -> Dict[str, Any]:
         """使用EasyOCR提取文字"""
         try:
-            results = self.easy_reader.readtext(image)
-            regions = []
-            
-            for (bbox, text, confidence) in results:
-                if confidence > 0.3 and text.strip():  # 过滤置信度过低的结果
-                    # EasyOCR返回的bbox是四个点的坐标，转换为矩形坐标
-                    x_coords = [point[0] for point in bbox]
-                    y_coords = [point[1] for point in bbox]
-                    bbox_rect = [
-                        int(min(x_coords)), int(min(y_coords)),
-                        int(max(x_coords)), int(max(y_coords))
-                    ]
-                    
-                    region = TextRegion(text, bbox_rect, confidence)
-                    regions.append(region)
+            results = self._recognize('easyocr', image, langs, timeout)
+            if results is None:
+                return None
+            
+            # EasyOCR返回的bbox是四个点的坐标，批量转换为矩形坐标并过滤置信度过低的结果
+            regions = TextRegionBatch.from_quads(
+                [bbox for bbox, _, _ in results],
+                [text for _, text, _ in results],
+                [confidence for _, _, confidence in results],
+                min_confidence=0.3
+            )
             
             return {
                 'engine': 'easyocr',
@@ -237,28 +834,23 @@ class VisionOCRService:
             print(f"EasyOCR提取失败: {e}")
             return None
     
-    def _extract_with_paddleocr(self, image: np.ndarray) -> Dict[str, Any]:
+    def _extract_with_paddleocr(self, image: np.ndarray,
+                                langs: Optional[List[str]] = None,
+                                timeout: Optional[float] = None) -> Dict[str, Any]:
         """使用PaddleOCR提取文字"""
         try:
-            results = self.paddle_ocr.ocr(image, cls=True)
-            regions = []
-            
-            if results and results[0]:
-                for line in results[0]:
-                    if line and len(line) >= 2:
-                        bbox_points, (text, confidence) = line
-                        
-                        if confidence > 0.5 and text.strip():
-                            # 转换坐标格式
-                            x_coords = [point[0] for point in bbox_points]
-                            y_coords = [point[1] for point in bbox_points]
-                            bbox_rect = [
-                                int(min(x_coords)), int(min(y_coords)),
-                                int(max(x_coords)), int(max(y_coords))
-                            ]
-                            
-                            region = TextRegion(text, bbox_rect, confidence)
-                            regions.append(region)
+            results = self._recognize('paddleocr', image, langs, timeout)
+            
+            lines = results[0] if results and results[0] else []
+            lines = [line for line in lines if line and len(line) >= 2]
+            
+            # 批量转换坐标格式并过滤置信度过低的结果
+            regions = TextRegionBatch.from_quads(
+                [bbox_points for bbox_points, _ in lines],
+                [text for _, (text, _) in lines],
+                [confidence for _, (_, confidence) in lines],
+                min_confidence=0.5
+            )
             
             return {
                 'engine': 'paddleocr',
@@ -270,7 +862,7 @@ class VisionOCRService:
             print(f"PaddleOCR提取失败: {e}")
             return None
     
-    def _extract_with_mock_ocr(self, image_path: str) -> Dict[str, Any]:
+    def _extract_with_mock_ocr(self, image_path: ImageSource) -> Dict[str, Any]:
         """模拟OCR提取（用于开发测试）"""
         print("使用模拟OCR进行文字提取")
         
@@ -285,15 +877,14 @@ class VisionOCRService:
             "A. 走投无路  B. 变本加利  C. 再接再励  D. 一如即往"
         ]
         
-        regions = []
-        y_offset = 50
+        y_offsets = 50 + 60 * np.arange(len(mock_texts))
+        bboxes = np.stack([
+            np.full(len(mock_texts), 50), y_offsets,
+            np.full(len(mock_texts), 300), y_offsets + 30
+        ], axis=1)
+        confidences = 0.85 + (np.arange(len(mock_texts)) % 3) * 0.05  # 模拟不同的置信度
         
-        for i, text in enumerate(mock_texts):
-            bbox = [50, y_offset, 300, y_offset + 30]
-            confidence = 0.85 + (i % 3) * 0.05  # 模拟不同的置信度
-            region = TextRegion(text, bbox, confidence)
-            regions.append(region)
-            y_offset += 60
+        regions = TextRegionBatch(mock_texts, bboxes, confidences)
         
         return {
             'engine': 'mock',
@@ -304,16 +895,14 @@ class VisionOCRService:
     def _merge_ocr_results(self, ocr_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """融合多个OCR引擎的结果"""
         if not ocr_results:
-            return {'regions': []}
+            return {'regions': TextRegionBatch.empty()}
         
         # 如果只有一个结果，直接返回
         if len(ocr_results) == 1:
             return ocr_results[0]
         
         # 合并多个引擎的结果，去重并选择最佳结果
-        all_regions = []
-        for result in ocr_results:
-            all_regions.extend(result.get('regions', []))
+        all_regions = TextRegionBatch.concat([r['regions'] for r in ocr_results])
         
         # 简单的去重策略：按位置相近度合并
         merged_regions = self._deduplicate_regions(all_regions)
@@ -323,190 +912,71 @@ class VisionOCRService:
             'engines_used': [r['engine'] for r in ocr_results]
         }
     
-    def _deduplicate_regions(self, regions: List[TextRegion]) -> List[TextRegion]:
-        """去重相似的文字区域"""
-        if not regions:
-            return []
-        
-        # 按Y坐标排序
-        sorted_regions = sorted(regions, key=lambda r: r.position['y'])
-        
-        deduplicated = []
-        used_indices = set()
-        
-        for i, region in enumerate(sorted_regions):
-            if i in used_indices:
-                continue
-            
-            # 找到位置相近的区域
-            similar_regions = [region]
-            
-            for j, other_region in enumerate(sorted_regions):
-                if j <= i or j in used_indices:
-                    continue
-                
-                # 判断是否为相似区域
-                if self._are_regions_similar(region, other_region):
-                    similar_regions.append(other_region)
-                    used_indices.add(j)
-            
-            # 选择置信度最高的区域
-            best_region = max(similar_regions, key=lambda r: r.confidence)
-            deduplicated.append(best_region)
-            used_indices.add(i)
+    def _deduplicate_regions(self, regions: TextRegionBatch, 
+                             threshold: float = 0.7) -> TextRegionBatch:
+        """
+        去重相似的文字区域
         
-        return deduplicated
-    
-    def _are_regions_similar(self, region1: TextRegion, region2: TextRegion, 
-                           threshold: float = 0.7) -> bool:
-        """判断两个文字区域是否相似"""
+        按上边界排序后做扫描线：区域i只与上边界落在[y1, y2)内的后续区域比较。
+        候选对的重叠度一次性向量化计算，之后按原顺序贪心合并，
+        每组保留置信度最高（并列时取先出现）的区域
+        """
+        count = len(regions)
+        if count == 0:
+            return regions
         
-        # 计算位置重叠度
-        bbox1, bbox2 = region1.bbox, region2.bbox
+        # 按Y坐标排序（稳定排序，与原实现顺序一致）
+        regions = regions.take(np.argsort(regions.bboxes[:, 1], kind='stable'))
+        bboxes = regions.bboxes
         
-        # 计算重叠区域
-        overlap_x1 = max(bbox1[0], bbox2[0])
-        overlap_y1 = max(bbox1[1], bbox2[1]) 
-        overlap_x2 = min(bbox1[2], bbox2[2])
-        overlap_y2 = min(bbox1[3], bbox2[3])
+        # 候选对：j ∈ [i+1, 第一个上边界 >= y2_i 的位置)
+        candidate_start = np.arange(1, count + 1)
+        candidate_end = np.searchsorted(bboxes[:, 1], bboxes[:, 3], side='left')
+        candidate_count = np.maximum(candidate_end - candidate_start, 0)
         
-        if overlap_x2 <= overlap_x1 or overlap_y2 <= overlap_y1:
-            return False
+        left = np.repeat(np.arange(count), candidate_count)
+        group_offsets = np.repeat(np.cumsum(candidate_count) - candidate_count, candidate_count)
+        right = np.arange(len(left)) - group_offsets + np.repeat(candidate_start, candidate_count)
         
-        overlap_area = (overlap_x2 - overlap_x1) * (overlap_y2 - overlap_y1)
+        # 向量化计算所有候选对的重叠度，只保留相似对
+        similar = overlap_ratio(bboxes[left], bboxes[right]) > threshold
+        left, right = left[similar], right[similar]
+        pair_start = np.searchsorted(left, np.arange(count), side='left').tolist()
+        pair_end = np.searchsorted(left, np.arange(count), side='right').tolist()
+        right = right.tolist()
+        confidences = regions.confidences.tolist()
         
-        area1 = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
-        area2 = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
+        kept = []
+        used = [False] * count
         
-        # 计算重叠比例
-        overlap_ratio = overlap_area / min(area1, area2)
+        for i in range(count):
+            if used[i]:
+                continue
+            
+            best = i
+            for k in range(pair_start[i], pair_end[i]):
+                j = right[k]
+                if used[j]:
+                    continue
+                used[j] = True
+                if confidences[j] > confidences[best]:
+                    best = j
+            
+            kept.append(best)
+            used[i] = True
         
-        return overlap_ratio > threshold
+        return regions.take(kept)
     
-    def _analyze_text_regions(self, regions: List[TextRegion]) -> List[Dict[str, Any]]:
+    def _analyze_text_regions(self, regions: TextRegionBatch) -> TextRegionBatch:
         """分析文字区域并识别类型"""
-        analyzed_regions = []
-        
-        for region in regions:
-            analysis = self._classify_text_type(region.text)
-            
-            region_dict = {
-                'text': region.text,
-                'bbox': region.bbox,
-                'confidence': region.confidence,
-                'position': region.position,
-                'type': analysis['type'],
-                'subtype': analysis.get('subtype'),
-                'properties': analysis.get('properties', {}),
-                'is_question_part': analysis.get('is_question_part', False),
-                'is_answer_part': analysis.get('is_answer_part', False)
-            }
-            
-            analyzed_regions.append(region_dict)
-        
-        return analyzed_regions
+        regions.analyses = self.text_classifier.classify_batch(regions.texts)
+        return regions
     
     def _classify_text_type(self, text: str) -> Dict[str, Any]:
         """识别文字类型"""
-        text_clean = text.strip()
-        
-        # 题号识别
-        if re.match(self.text_patterns['question_number'], text_clean):
-            return {
-                'type': 'question_number',
-                'subtype': 'primary',
-                'is_question_part': True,
-                'properties': {'number': re.match(r'^(\d+)', text_clean).group(1)}
-            }
-        
-        # 选择题选项
-        if re.match(self.text_patterns['choice_option'], text_clean):
-            return {
-                'type': 'choice_option',
-                'subtype': 'option',
-                'is_answer_part': True,
-                'properties': {'option': re.match(r'^([A-H])', text_clean).group(1)}
-            }
-        
-        # 数学公式
-        if re.search(self.text_patterns['formula'], text_clean):
-            formula_type = 'arithmetic'
-            if '=' in text_clean:
-                formula_type = 'equation'
-            elif any(symbol in text_clean for symbol in ['√', '∫', '∑']):
-                formula_type = 'advanced'
-            
-            return {
-                'type': 'formula',
-                'subtype': formula_type,
-                'is_question_part': True,
-                'properties': {'complexity': len(re.findall(r'[+\-×÷=()]', text_clean))}
-            }
-        
-        # 纯数字
-        if re.match(self.text_patterns['number'], text_clean):
-            return {
-                'type': 'number',
-                'subtype': 'decimal' if '.' in text_clean else 'integer',
-                'is_answer_part': True,
-                'properties': {'value': float(text_clean) if '.' in text_clean else int(text_clean)}
-            }
-        
-        # 分数
-        if re.search(self.text_patterns['fraction'], text_clean):
-            return {
-                'type': 'fraction',
-                'is_answer_part': True,
-                'properties': {'format': 'fraction'}
-            }
-        
-        # 百分比
-        if re.search(self.text_patterns['percentage'], text_clean):
-            return {
-                'type': 'percentage', 
-                'is_answer_part': True,
-                'properties': {'format': 'percentage'}
-            }
-        
-        # 英文单词
-        if re.match(self.text_patterns['english_word'], text_clean):
-            return {
-                'type': 'english_text',
-                'subtype': 'word' if len(text_clean.split()) == 1 else 'phrase',
-                'properties': {'word_count': len(text_clean.split())}
-            }
-        
-        # 中文文本
-        if any('\u4e00' <= char <= '\u9fff' for char in text_clean):
-            return {
-                'type': 'chinese_text',
-                'subtype': 'sentence' if len(text_clean) > 10 else 'word',
-                'properties': {'char_count': len(text_clean)}
-            }
-        
-        # 标点符号
-        if re.match(self.text_patterns['punctuation'], text_clean):
-            return {
-                'type': 'punctuation',
-                'properties': {'symbols': list(text_clean)}
-            }
-        
-        # 混合数学表达式
-        if re.search(self.text_patterns['mixed_math'], text_clean):
-            return {
-                'type': 'math_expression',
-                'is_question_part': True,
-                'properties': {'has_operators': True}
-            }
-        
-        # 默认为普通文本
-        return {
-            'type': 'text',
-            'subtype': 'general',
-            'properties': {'length': len(text_clean)}
-        }
+        return self.text_classifier.classify(text)
     
-    def _build_structured_result(self, regions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _build_structured_result(self, regions: TextRegionBatch) -> Dict[str, Any]:
         """构建结构化的内容结果"""
         
         structured = {
@@ -519,7 +989,8 @@ class VisionOCRService:
         
         current_question = None
         
-        for region in regions:
+        for text, bbox, analysis in zip(regions.texts, regions.bboxes.tolist(), regions.analyses):
+            region = dict(analysis, text=text, bbox=bbox)
             region_type = region['type']
             
             # 题号处理
@@ -591,36 +1062,33 @@ class VisionOCRService:
         
         return structured
     
-    def _extract_plain_text(self, regions: List[Dict[str, Any]]) -> str:
+    def _extract_plain_text(self, regions: TextRegionBatch) -> str:
         """提取纯文本内容"""
         # 按位置排序（从上到下，从左到右）
-        sorted_regions = sorted(regions, 
-                              key=lambda r: (r['position']['y'], r['position']['x']))
+        order = regions.reading_order()
+        row_tops = regions.bboxes[order, 1].tolist()
         
         text_parts = []
         last_y = 0
         
-        for region in sorted_regions:
-            current_y = region['position']['y']
-            
+        for index, current_y in zip(order.tolist(), row_tops):
             # 如果是新行，添加换行符
             if current_y > last_y + 20:  # 20像素的行间距阈值
                 text_parts.append('\n')
             
-            text_parts.append(region['text'])
+            text_parts.append(regions.texts[index])
             text_parts.append(' ')  # 添加空格分隔
             
             last_y = current_y
         
         return ''.join(text_parts).strip()
     
-    def _calculate_overall_confidence(self, regions: List[Dict[str, Any]]) -> float:
+    def _calculate_overall_confidence(self, regions: TextRegionBatch) -> float:
         """计算整体置信度"""
-        if not regions:
+        if not len(regions):
             return 0.0
         
-        total_confidence = sum(region['confidence'] for region in regions)
-        return round(total_confidence / len(regions), 3)
+        return round(float(regions.confidences.mean()), 3)
     
     def get_text_statistics(self, ocr_result: Dict[str, Any]) -> Dict[str, Any]:
         """获取文字提取统计信息"""
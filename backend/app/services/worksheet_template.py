@@ -0,0 +1,476 @@
+"""
+练习纸模板匹配
+教师登记固定版式的练习纸（如口算练习）后，保存参考图片的ORB关键点、描述子和投影签名，
+以及每道题作答单元格的位置和标准答案。批改时先用投影签名预筛模板，再用ORB特征匹配
+估计单应性矩阵把照片对齐到模板坐标系，只识别已知的作答单元格，
+不再经过整页OCR、题目解析和逐题分析
+
+同一网格上题目不同的练习纸特征也相近，因此对齐后会抽查几行印刷文字，
+与模板不一致时回退到通用批改流程
+"""
+import io
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.services.answer_region_ocr import (
+    build_worksheet_layout, choose_verify_indices, printed_text, text_similarity
+)
+from app.services.ocr_regions import TextRegionBatch
+from app.services.perceptual_hash import compute_page_hash
+
+# 投影签名每个方向的采样点数
+SIGNATURE_BINS = 64
+
+# Lowe比值检验阈值
+RATIO_TEST = 0.75
+
+# 模板页面投影到照片中的面积下限（占照片面积）
+MIN_PAGE_AREA = 0.1
+
+# 题号：行首的数字加分隔符
+_NUMBER_PATTERN = re.compile(r'^\s*(\d+)\s*[.、．)）]')
+
+
+def _to_working_gray(image: np.ndarray, long_side: int) -> Tuple[np.ndarray, float]:
+    """
+    转为灰度并缩小到提取特征的尺寸
+
+    Returns:
+        (灰度图, 原图坐标与灰度图坐标的比例)
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    scale = max(gray.shape) / float(long_side)
+    if scale > 1:
+        size = (int(round(gray.shape[1] / scale)), int(round(gray.shape[0] / scale)))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    else:
+        scale = 1.0
+    return gray, scale
+
+
+def projection_signature(gray: np.ndarray) -> np.ndarray:
+    """二值化后水平/垂直投影各重采样为SIGNATURE_BINS点并标准化"""
+    _, binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    profiles = []
+    for axis in (1, 0):
+        profile = binary.sum(axis=axis).astype(np.float32)
+        profile = np.interp(
+            np.linspace(0, len(profile) - 1, SIGNATURE_BINS), np.arange(len(profile)), profile
+        )
+        profiles.append((profile - profile.mean()) / (profile.std() + 1e-6))
+    return np.concatenate(profiles).astype(np.float32)
+
+
+def signature_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """两个投影签名的平均相关系数"""
+    return float(np.dot(a, b) / len(a))
+
+
+@dataclass
+class TemplateFingerprint:
+    """版面特征：关键点坐标（所在图片的原始像素坐标）、ORB描述子和投影签名"""
+    keypoints: np.ndarray  # (N, 2) float32
+    descriptors: np.ndarray  # (N, 32) uint8
+    signature: np.ndarray  # (2 * SIGNATURE_BINS,) float32
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer, keypoints=self.keypoints, descriptors=self.descriptors, signature=self.signature
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TemplateFingerprint':
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(arrays['keypoints'], arrays['descriptors'], arrays['signature'])
+
+
+def compute_fingerprint(image: np.ndarray, max_features: Optional[int] = None,
+                        long_side: Optional[int] = None) -> TemplateFingerprint:
+    """在缩小的灰度图上提取ORB特征，关键点坐标换算回原图"""
+    gray, scale = _to_working_gray(image, long_side or settings.WORKSHEET_TEMPLATE_LONG_SIDE)
+    orb = cv2.ORB_create(nfeatures=max_features or settings.WORKSHEET_TEMPLATE_FEATURES)
+    keypoints, descriptors = orb.detectAndCompute(gray, None)
+    if descriptors is None:
+        return TemplateFingerprint(
+            np.zeros((0, 2), np.float32), np.zeros((0, 32), np.uint8), projection_signature(gray)
+        )
+    points = np.array([kp.pt for kp in keypoints], dtype=np.float32) * scale
+    return TemplateFingerprint(points, descriptors, projection_signature(gray))
+
+
+@dataclass
+class TemplateEntry:
+    """内存中的模板（模板坐标系为参考图片的像素坐标）"""
+    id: int
+    name: str
+    subject: str
+    width: int
+    height: int
+    fingerprint: TemplateFingerprint
+    questions: List[Dict[str, Any]]
+    verify_regions: List[Dict[str, Any]]
+
+    @classmethod
+    def from_model(cls, template: Any) -> 'TemplateEntry':
+        return cls(
+            id=template.id,
+            name=template.name,
+            subject=template.subject,
+            width=template.width,
+            height=template.height,
+            fingerprint=TemplateFingerprint.from_bytes(template.fingerprint),
+            questions=template.questions or [],
+            verify_regions=template.verify_regions or []
+        )
+
+
+def _scale_box(bbox: List[float], width: int, height: int) -> Tuple[int, int, int, int]:
+    x1, y1, x2, y2 = bbox
+    return int(x1 * width), int(y1 * height), int(round(x2 * width)), int(round(y2 * height))
+
+
+@dataclass
+class TemplateMatch:
+    """照片与模板的匹配结果，homography把照片坐标映射到模板坐标"""
+    template: TemplateEntry
+    homography: np.ndarray
+    good_matches: int
+    inliers: int
+    match_time: float
+
+    @property
+    def inlier_ratio(self) -> float:
+        return self.inliers / self.good_matches if self.good_matches else 0.0
+
+    def align(self, image: np.ndarray) -> np.ndarray:
+        """
+        把照片透视变换到模板坐标系
+
+        输出尺寸按模板宽高比例缩放到不超过照片长边，避免放大
+        """
+        scale = min(1.0, max(image.shape[:2]) / float(max(self.template.width, self.template.height)))
+        size = (int(round(self.template.width * scale)), int(round(self.template.height * scale)))
+        homography = np.diag([scale, scale, 1.0]) @ self.homography
+        border = 255 if image.ndim == 2 else (255, 255, 255)
+        return cv2.warpPerspective(image, homography, size, flags=cv2.INTER_LINEAR,
+                                   borderMode=cv2.BORDER_CONSTANT, borderValue=border)
+
+    def answer_cells(self, width: int, height: int) -> List[Tuple[int, int, int, int]]:
+        """作答单元格在对齐后图片中的像素坐标"""
+        return [_scale_box(q['bbox'], width, height) for q in self.template.questions]
+
+    def verify_cells(self, width: int, height: int, margin: float = 0.01) -> List[Tuple[int, int, int, int]]:
+        """抽查文字行在对齐后图片中的像素坐标，四周留出margin（占页面尺寸）容忍对齐误差"""
+        pad_x, pad_y = int(margin * width), int(margin * height)
+        cells = []
+        for region in self.template.verify_regions:
+            x1, y1, x2, y2 = _scale_box(region['bbox'], width, height)
+            cells.append((max(x1 - pad_x, 0), max(y1 - pad_y, 0), min(x2 + pad_x, width), min(y2 + pad_y, height)))
+        return cells
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'template_id': self.template.id,
+            'name': self.template.name,
+            'good_matches': self.good_matches,
+            'inliers': self.inliers,
+            'inlier_ratio': round(self.inlier_ratio, 3),
+            'match_time': round(self.match_time, 3)
+        }
+
+
+class WorksheetTemplateIndex:
+    """
+    已登记模板的内存索引（线程安全）
+
+    首次匹配时从数据库加载启用的模板，之后每隔refresh_seconds重新加载，
+    模板增删后调用invalidate立即生效；各模板的匹配次数在重新加载时批量写回数据库
+    """
+
+    def __init__(self, max_candidates: int = 5, min_inliers: int = 30,
+                 min_inlier_ratio: float = 0.25, refresh_seconds: int = 60):
+        self.max_candidates = max_candidates
+        self.min_inliers = min_inliers
+        self.min_inlier_ratio = min_inlier_ratio
+        self.refresh_seconds = refresh_seconds
+        self._entries: List[TemplateEntry] = []
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+        self.matches = 0
+        self.misses = 0
+        self.verify_failures = 0
+        self._pending_matches: Dict[int, int] = {}
+
+    @classmethod
+    def from_settings(cls) -> 'WorksheetTemplateIndex':
+        return cls(
+            max_candidates=settings.WORKSHEET_TEMPLATE_MAX_CANDIDATES,
+            min_inliers=settings.WORKSHEET_TEMPLATE_MIN_INLIERS,
+            min_inlier_ratio=settings.WORKSHEET_TEMPLATE_MIN_INLIER_RATIO,
+            refresh_seconds=settings.WORKSHEET_TEMPLATE_REFRESH_SECONDS
+        )
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def load(self, db) -> int:
+        """写回匹配次数并从数据库加载启用的模板，返回模板数量"""
+        from app.models.worksheet_template import WorksheetTemplate
+
+        with self._lock:
+            pending, self._pending_matches = self._pending_matches, {}
+        for template_id, count in pending.items():
+            db.query(WorksheetTemplate).filter(WorksheetTemplate.id == template_id).update(
+                {WorksheetTemplate.match_count: WorksheetTemplate.match_count + count},
+                synchronize_session=False
+            )
+        if pending:
+            db.commit()
+
+        templates = db.query(WorksheetTemplate).filter(WorksheetTemplate.is_active == True).all()
+        entries = []
+        for template in templates:
+            try:
+                entries.append(TemplateEntry.from_model(template))
+            except Exception as e:
+                print(f"练习纸模板{template.id}特征损坏，已跳过: {e}")
+        with self._lock:
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+        return len(entries)
+
+    def _active_entries(self, subject: Optional[str]) -> List[TemplateEntry]:
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+        if stale:
+            from app.core.database import SessionLocal
+
+            db = SessionLocal()
+            try:
+                self.load(db)
+            except Exception as e:
+                print(f"加载练习纸模板失败: {e}")
+                with self._lock:
+                    # 数据库不可用时沿用已加载的模板，等下个周期再试
+                    self._loaded_at = time.monotonic()
+            finally:
+                db.close()
+
+        with self._lock:
+            entries = list(self._entries)
+        if subject:
+            entries = [entry for entry in entries if entry.subject == subject]
+        return entries
+
+    def has_entries(self, subject: Optional[str] = None) -> bool:
+        """是否有该学科的启用模板（不解码图片，批改前先用它跳过模板匹配）"""
+        return bool(self._active_entries(subject))
+
+    def match(self, image: np.ndarray, subject: Optional[str] = None) -> Optional[TemplateMatch]:
+        """
+        查找与照片匹配的模板
+
+        Args:
+            image: 预处理后的照片（RGB或灰度）
+            subject: 学科，只与该学科的模板比较
+
+        Returns:
+            内点最多且通过阈值的匹配，没有时返回None
+        """
+        entries = self._active_entries(subject)
+        if not entries:
+            return None
+
+        start_time = time.perf_counter()
+        query = compute_fingerprint(image)
+        if len(query.descriptors) < self.min_inliers:
+            self.record('miss')
+            return None
+
+        if len(entries) > self.max_candidates:
+            # 投影签名预筛：只对版面最相近的几个模板做特征匹配
+            scores = [signature_similarity(query.signature, entry.fingerprint.signature) for entry in entries]
+            entries = [entries[i] for i in np.argsort(scores)[::-1][:self.max_candidates]]
+
+        best = None
+        for entry in entries:
+            candidate = self._match_entry(query, entry, image.shape[:2])
+            if candidate is not None and (best is None or candidate.inliers > best.inliers):
+                best = candidate
+
+        if best is None:
+            self.record('miss')
+            return None
+        best.match_time = time.perf_counter() - start_time
+        return best
+
+    def _match_entry(self, query: TemplateFingerprint, entry: TemplateEntry,
+                     image_shape: Tuple[int, int]) -> Optional[TemplateMatch]:
+        """ORB描述子比值检验 + RANSAC估计单应性矩阵"""
+        if len(entry.fingerprint.descriptors) < 2:
+            return None
+
+        matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        pairs = matcher.knnMatch(query.descriptors, entry.fingerprint.descriptors, k=2)
+        good = [pair[0] for pair in pairs if len(pair) == 2 and pair[0].distance < RATIO_TEST * pair[1].distance]
+        if len(good) < self.min_inliers:
+            return None
+
+        source = query.keypoints[[m.queryIdx for m in good]]
+        target = entry.fingerprint.keypoints[[m.trainIdx for m in good]]
+        # 重投影误差阈值按模板尺寸换算（约为长边的0.5%）
+        threshold = max(entry.width, entry.height) * 0.005
+        homography, mask = cv2.findHomography(source, target, cv2.RANSAC, threshold)
+        if homography is None:
+            return None
+
+        inliers = int(mask.sum())
+        if inliers < self.min_inliers or inliers / len(good) < self.min_inlier_ratio:
+            return None
+        if not self._plausible(homography, entry, image_shape):
+            return None
+        return TemplateMatch(entry, homography, len(good), inliers, 0.0)
+
+    @staticmethod
+    def _plausible(homography: np.ndarray, entry: TemplateEntry, image_shape: Tuple[int, int]) -> bool:
+        """模板页面投影回照片后应为凸四边形，且占照片足够面积"""
+        try:
+            inverse = np.linalg.inv(homography)
+        except np.linalg.LinAlgError:
+            return False
+        corners = np.array(
+            [[[0, 0]], [[entry.width, 0]], [[entry.width, entry.height]], [[0, entry.height]]],
+            dtype=np.float32
+        )
+        projected = cv2.perspectiveTransform(corners, inverse)
+        if not cv2.isContourConvex(projected):
+            return False
+        height, width = image_shape
+        return cv2.contourArea(projected) >= MIN_PAGE_AREA * width * height
+
+    def record(self, outcome: str, template_id: Optional[int] = None):
+        """记录匹配结果：match/miss/verify_failed"""
+        with self._lock:
+            if outcome == 'match':
+                self.matches += 1
+                if template_id is not None:
+                    self._pending_matches[template_id] = self._pending_matches.get(template_id, 0) + 1
+            elif outcome == 'verify_failed':
+                self.verify_failures += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.matches + self.misses + self.verify_failures
+            return {
+                'enabled': settings.WORKSHEET_TEMPLATE_MATCHING,
+                'templates': len(self._entries),
+                'matches': self.matches,
+                'misses': self.misses,
+                'verify_failures': self.verify_failures,
+                'match_rate': round(self.matches / lookups, 3) if lookups else 0.0
+            }
+
+
+def verify_printed_text(recognized: List[str], verify_regions: List[Dict[str, Any]],
+                        min_similarity: float) -> Tuple[bool, List[float]]:
+    """对齐后抽查的印刷文字是否与模板一致"""
+    similarities = [
+        text_similarity(printed_text(text), region['text'])
+        for text, region in zip(recognized, verify_regions)
+    ]
+    return all(value >= min_similarity for value in similarities), [round(v, 3) for v in similarities]
+
+
+def normalize_questions(questions: List[Dict[str, Any]], width: int, height: int) -> List[Dict[str, Any]]:
+    """
+    校验教师提交的题目，作答单元格从参考图片像素坐标换算为相对坐标
+
+    每道题需要bbox [x1, y1, x2, y2]；answer为标准答案，缺省时按题目文字自动计算
+    """
+    normalized = []
+    for index, question in enumerate(questions):
+        bbox = question.get('bbox')
+        if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+            raise ValueError(f"第{index + 1}题缺少作答单元格坐标bbox [x1, y1, x2, y2]")
+        x1, y1, x2, y2 = [float(v) for v in bbox]
+        if not (0 <= x1 < x2 <= width and 0 <= y1 < y2 <= height):
+            raise ValueError(f"第{index + 1}题的作答单元格超出参考图片范围")
+        normalized.append({
+            'number': int(question.get('number') or index + 1),
+            'question_text': str(question.get('question_text') or ''),
+            'question_type': question.get('question_type'),
+            'knowledge_points': question.get('knowledge_points') or [],
+            'answer': None if question.get('answer') is None else str(question['answer']),
+            'bbox': [round(x1 / width, 4), round(y1 / height, 4), round(x2 / width, 4), round(y2 / height, 4)]
+        })
+    return normalized
+
+
+def detect_questions(regions: TextRegionBatch, image: np.ndarray,
+                     answers: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+    """
+    从参考图片的整页识别结果中自动查找作答单元格（等号后的空位、选择题括号、填空横线）
+
+    Args:
+        regions: 参考图片的文字区域（坐标与image一致）
+        image: 识别时使用的图片
+        answers: 按阅读顺序排列的标准答案，数量需与找到的作答单元格一致
+    """
+    height, width = image.shape[:2]
+    layout = build_worksheet_layout(regions, width, height, compute_page_hash(image), verify_count=0)
+    if layout is None:
+        return []
+    # 冒号后的横线是姓名、班级等填写栏，不是题目
+    areas = [
+        area for area in layout.answer_areas
+        if not (area.kind == 'blank' and area.prefix.rstrip().endswith(('：', ':')))
+    ]
+    if answers is not None and len(answers) != len(areas):
+        raise ValueError(f"找到{len(areas)}个作答单元格，但提供了{len(answers)}个答案")
+
+    questions = []
+    for index, area in enumerate(areas):
+        question_text = area.compose('').strip()
+        number = _NUMBER_PATTERN.match(area.prefix)
+        questions.append({
+            'number': int(number.group(1)) if number else index + 1,
+            'question_text': question_text,
+            'question_type': None,
+            'knowledge_points': [],
+            'answer': None if answers is None or answers[index] is None else str(answers[index]),
+            'bbox': list(area.bbox)
+        })
+    return questions
+
+
+def select_verify_regions(regions: TextRegionBatch, width: int, height: int,
+                          count: int) -> List[Dict[str, Any]]:
+    """抽取几行印刷文字，匹配模板后用于校验（相对坐标和去掉作答内容的文字）"""
+    if not len(regions) or count <= 0:
+        return []
+    indices = choose_verify_indices(regions.texts, np.arange(len(regions)), regions.bboxes, count)
+    scale = np.array([width, height, width, height], dtype=np.float64)
+    return [
+        {
+            'bbox': np.clip(regions.bboxes[i] / scale, 0.0, 1.0).round(4).tolist(),
+            'text': printed_text(regions.texts[i])
+        }
+        for i in indices
+    ]
+
+
+# 全局练习纸模板索引
+worksheet_template_index = WorksheetTemplateIndex.from_settings()
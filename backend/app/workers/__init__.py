@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+后台工作进程
+"""
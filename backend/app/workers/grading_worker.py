@@ -0,0 +1,188 @@
+"""
+批改工作进程
+从批改任务队列（grading_jobs表）领取提交的作业，逐页批改后写回作业记录。
+每个进程各自持有一份批改流程（OCR模型按OCR_WORKER_MODE在进程内加载或使用OCR工作进程池），
+吞吐量随进程数线性增加
+
+用法: python -m app.workers.grading_worker [--processes 2] [--poll-interval 1.0]
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.grading_job import GradingJob
+from app.models.homework import Homework
+from app.services.grading_queue import grading_job_queue
+from app.services.homework_analysis_ai import HomeworkAnalysisAI
+
+# 每隔多少次轮询检查一次租约到期的任务
+EXPIRED_CHECK_EVERY = 30
+
+
+class GradingPageError(Exception):
+    """作业图片无法批改（识别失败、质量不合格等），重试也不会成功"""
+
+
+class GradingLeaseLost(Exception):
+    """续租失败：任务租约已到期被重新排队，或已被其他工作进程领取"""
+
+
+def grade_homework(analysis_ai: HomeworkAnalysisAI, homework: Homework, image_paths: List[str],
+                   answer_key_id: Optional[int] = None,
+                   on_page: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    逐页批改作业，合并各页结果（指定标准答案时各页按题号取标准答案）
+
+    on_page在每页批改后调用（参数为页码），工作进程用于续租
+
+    Returns:
+        写入作业记录的字段
+
+    Raises:
+        GradingPageError: 所有页面都无法批改
+    """
+    question_details, errors = [], []
+    ocr_time = correction_time = 0.0
+    for page, image_path in enumerate(image_paths, 1):
+        result = analysis_ai.analyze_homework_image(
+            image_path=image_path,
+            subject=homework.subject,
+            grade=homework.grade_level or '',
+            student_id=str(homework.user_id),
+            answer_key_id=answer_key_id
+        )
+        if on_page is not None:
+            on_page(page)
+        if result.homework_id == 'error':
+            errors.append(f"第{page}页: {result.learning_suggestions[0] if result.learning_suggestions else '分析失败'}")
+            continue
+        if result.timings:
+            ocr_time += result.timings['ocr']
+            correction_time += result.timings['correction']
+        question_details.extend({**question, 'page': page} for question in result.question_details)
+
+    if not question_details:
+        raise GradingPageError('；'.join(errors) or '未能识别到有效的题目')
+
+    total_questions = len(question_details)
+    correct_count = sum(1 for question in question_details if question['is_correct'])
+    return {
+        'correction_result': question_details,
+        'total_questions': total_questions,
+        'correct_count': correct_count,
+        'wrong_count': total_questions - correct_count,
+        'accuracy_rate': round(correct_count / total_questions, 3),
+        'ocr_time': round(ocr_time, 3),
+        'correction_time': round(correction_time, 3),
+        'error_message': '；'.join(errors) or None
+    }
+
+
+def process_job(db, job: GradingJob, analysis_ai: HomeworkAnalysisAI, worker_id: str):
+    """执行一个批改任务，结果写回作业记录；任务租约失效时丢弃结果"""
+    homework = db.get(Homework, job.homework_id)
+    if homework is None:
+        grading_job_queue.fail(db, job, '作业记录不存在', retry=False, worker_id=worker_id)
+        return
+
+    def renew_lease(page: int):
+        if not grading_job_queue.renew(db, job, worker_id):
+            raise GradingLeaseLost(f"第{page}页批改后续租失败")
+
+    start_time = time.perf_counter()
+    try:
+        fields = grade_homework(analysis_ai, homework, job.image_paths, job.answer_key_id, on_page=renew_lease)
+    except GradingLeaseLost as e:
+        db.rollback()
+        print(f"批改任务{job.id}已不属于工作进程{worker_id}，停止批改: {e}")
+        return
+    except GradingPageError as e:
+        print(f"作业{homework.id}无法批改: {e}")
+        grading_job_queue.fail(db, job, str(e), retry=False, worker_id=worker_id)
+        return
+    except Exception as e:
+        db.rollback()
+        requeued = grading_job_queue.fail(db, job, f"{e.__class__.__name__}: {e}", worker_id=worker_id)
+        print(f"批改任务{job.id}失败（第{job.attempts}次）{'，稍后重试' if requeued else ''}: {e}")
+        return
+
+    for key, value in fields.items():
+        setattr(homework, key, value)
+    homework.status = 'completed'
+    homework.processing_time = round(time.perf_counter() - start_time, 3)
+    homework.completed_at = datetime.now()
+    if grading_job_queue.complete(db, job, worker_id):
+        print(f"作业{homework.id}批改完成: {fields['correct_count']}/{fields['total_questions']}，"
+              f"耗时{homework.processing_time}秒")
+
+
+def run_worker(poll_interval: float, stop_event):
+    """工作进程主循环：领取任务并执行，队列为空时等待"""
+    # fork继承的连接池不能跨进程使用
+    engine.dispose(close=False)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    analysis_ai = HomeworkAnalysisAI()
+    print(f"批改工作进程已启动: {worker_id}")
+
+    polls = 0
+    while not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            if polls % EXPIRED_CHECK_EVERY == 0:
+                grading_job_queue.requeue_expired(db)
+            polls += 1
+
+            job = grading_job_queue.claim(db, worker_id)
+            if job is None:
+                stop_event.wait(poll_interval)
+                continue
+            process_job(db, job, analysis_ai, worker_id)
+        except Exception as e:
+            print(f"批改工作进程异常: {e}")
+            db.rollback()
+            stop_event.wait(poll_interval)
+        finally:
+            db.close()
+
+    print(f"批改工作进程已退出: {worker_id}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批改工作进程")
+    parser.add_argument("--processes", type=int, default=settings.GRADING_WORKER_PROCESSES,
+                        help="批改工作进程数")
+    parser.add_argument("--poll-interval", type=float, default=settings.GRADING_WORKER_POLL_INTERVAL,
+                        help="队列为空时的轮询间隔（秒）")
+    args = parser.parse_args()
+
+    stop_event = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(args.poll_interval, stop_event), daemon=True)
+        for _ in range(max(args.processes, 1))
+    ]
+    for worker in workers:
+        worker.start()
+    print(f"批改工作进程数: {len(workers)}")
+
+    # 收到退出信号后等待进行中的任务完成
+    def stop(signum, frame):
+        print("正在停止批改工作进程...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
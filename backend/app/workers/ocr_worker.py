@@ -0,0 +1,205 @@
+"""
+OCR工作进程池
+由一组工作进程持有OCR模型，所有API进程（uvicorn workers）通过本地UNIX socket共享，
+模型份数等于工作进程数，与API进程数无关。
+模型在各工作进程中加载，各进程启动后和模型状态变化时把加载状态报告给服务端，
+可用引擎和模型状态按各工作进程的报告汇总
+
+用法: python -m app.workers.ocr_worker [--socket /tmp/zyjc_ocr_worker.sock] [--processes 2]
+"""
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import Connection, Listener
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.ocr_engine_registry import ocr_engine_registry
+from app.services.ocr_worker_client import get_worker_authkey
+
+
+# 工作进程向服务端报告模型加载状态的队列，以及上次报告的内容
+_status_queue = None
+_reported_state = None
+
+
+def _report_engine_state():
+    """模型加载状态与上次报告不同时报告给服务端"""
+    global _reported_state
+    state = {
+        'engines': ocr_engine_registry.available_engines(),
+        'models': ocr_engine_registry.status()
+    }
+    if state != _reported_state:
+        _status_queue.put((os.getpid(), state))
+        _reported_state = state
+
+
+def _init_worker(status_queue):
+    """工作进程初始化：按配置预加载模型"""
+    global _status_queue
+    _status_queue = status_queue
+    if settings.OCR_PRELOAD_ENGINES:
+        ocr_engine_registry.warmup()
+    _report_engine_state()
+    print(f"OCR工作进程已启动: pid={os.getpid()}")
+
+
+def _recognize(engine: str, langs: Optional[List[str]], image: np.ndarray) -> Any:
+    """在工作进程中执行识别，返回引擎原始输出"""
+    # 与进程内模式共用同一套引擎调用
+    from app.services.ocr_batcher import BATCH_RUNNERS
+
+    if engine not in BATCH_RUNNERS:
+        raise ValueError(f"不支持的OCR引擎: {engine}")
+    try:
+        return BATCH_RUNNERS[engine]([image], langs)[0]
+    finally:
+        # 首次识别时按需加载的模型（或加载失败）
+        _report_engine_state()
+
+
+def _worker_engine_state() -> Dict[str, Any]:
+    """在工作进程中查询可用引擎和模型加载状态（各进程尚未报告时使用）"""
+    return {
+        'engines': ocr_engine_registry.available_engines(),
+        'models': ocr_engine_registry.status()
+    }
+
+
+class OCRWorkerServer:
+    """OCR工作进程池服务端"""
+
+    def __init__(self, address: str, processes: int, authkey: bytes):
+        self.address = address
+        self.processes = max(processes, 1)
+        self.authkey = authkey
+        self.pool = None
+        self.started_at = None
+        self._stats_lock = threading.Lock()
+        self.active_requests = 0
+        self.completed_requests = 0
+        self.failed_requests = 0
+        self.worker_states: Dict[int, Dict[str, Any]] = {}  # 工作进程pid -> 模型加载状态
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            # 上次异常退出残留的socket文件
+            os.remove(self.address)
+
+        # 先创建进程池再启动连接线程，避免fork时复制线程状态
+        status_queue = multiprocessing.Queue()
+        self.pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(status_queue,))
+        threading.Thread(target=self._collect_worker_states, args=(status_queue,), daemon=True).start()
+        listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        self.started_at = time.time()
+        print(f"OCR工作进程池监听 {self.address}，工作进程数: {self.processes}")
+
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+                    print(f"拒绝OCR工作进程池连接: {e}")
+                    continue
+
+                threading.Thread(
+                    target=self._handle_connection, args=(connection,), daemon=True
+                ).start()
+        finally:
+            listener.close()
+            self.pool.terminate()
+
+    def _collect_worker_states(self, status_queue):
+        """接收各工作进程报告的模型加载状态"""
+        while True:
+            pid, state = status_queue.get()
+            with self._stats_lock:
+                self.worker_states[pid] = state
+
+    def _available_engines(self) -> List[str]:
+        """所有已报告的工作进程中都可用的引擎（请求可能分配给任一工作进程）"""
+        with self._stats_lock:
+            states = list(self.worker_states.values())
+        if not states:
+            states = [self.pool.apply(_worker_engine_state)]
+        engines = states[0]['engines']
+        return [engine for engine in engines if all(engine in state['engines'] for state in states[1:])]
+
+    def _handle_connection(self, connection: Connection):
+        """处理一个API进程连接上的请求（同一连接上的请求依次处理）"""
+        with connection:
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    payload = self._dispatch(message)
+                    response = ('ok', payload)
+                except Exception as e:
+                    response = ('error', f"{e.__class__.__name__}: {e}")
+
+                try:
+                    connection.send(response)
+                except (OSError, EOFError):
+                    return
+
+    def _dispatch(self, message: tuple) -> Any:
+        operation = message[0]
+
+        if operation == 'recognize':
+            _, engine, langs, image = message
+            with self._stats_lock:
+                self.active_requests += 1
+            try:
+                result = self.pool.apply(_recognize, (engine, langs, image))
+            except Exception:
+                with self._stats_lock:
+                    self.failed_requests += 1
+                raise
+            finally:
+                with self._stats_lock:
+                    self.active_requests -= 1
+
+            with self._stats_lock:
+                self.completed_requests += 1
+            return result
+
+        if operation == 'engines':
+            return self._available_engines()
+
+        if operation == 'status':
+            with self._stats_lock:
+                return {
+                    'address': self.address,
+                    'processes': self.processes,
+                    'uptime': round(time.time() - self.started_at, 1),
+                    'active_requests': self.active_requests,
+                    'completed_requests': self.completed_requests,
+                    'failed_requests': self.failed_requests,
+                    'workers': [
+                        {'pid': pid, **state['models']} for pid, state in sorted(self.worker_states.items())
+                    ]
+                }
+
+        raise ValueError(f"未知操作: {operation}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR工作进程池")
+    parser.add_argument("--socket", default=settings.OCR_WORKER_SOCKET, help="UNIX socket路径")
+    parser.add_argument("--processes", type=int, default=settings.OCR_WORKER_PROCESSES,
+                        help="持有OCR模型的工作进程数")
+    args = parser.parse_args()
+
+    OCRWorkerServer(args.socket, args.processes, get_worker_authkey()).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+OCR流水线性能基准
+在test_images目录和合成练习纸语料上逐阶段计时VisionOCRService：
+读取、质量检查、解码、预处理、版面分析、各OCR引擎、合并、去重、类型分类、结构化，
+另测一次完整的extract_text_from_image调用。模拟引擎总是参与，已安装的真实引擎逐个参与，
+结果输出为JSON报告，可用--compare与其他提交的报告对比
+
+用法: python scripts/benchmark_ocr_pipeline.py [--output report.json] [--compare baseline.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import PIL
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.ocr_regions import TextRegionBatch
+from app.services.vision_ocr_service import VisionOCRService
+from synthetic_worksheets import NOISE_LEVELS, RESOLUTIONS, WORKSHEET_KINDS, WorksheetRenderer
+
+REPORT_VERSION = 1
+DEFAULT_IMAGES_DIR = Path(__file__).resolve().parents[2] / 'test_images'
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.bmp', '.webp', '.svg'}
+
+# 报告中阶段的输出顺序（引擎阶段插在layout之后）
+STAGES_BEFORE_ENGINES = ['read', 'quality', 'decode', 'preprocess', 'layout']
+STAGES_AFTER_ENGINES = ['merge', 'dedup', 'classify', 'structure', 'total', 'end_to_end']
+
+
+class BenchmarkImage:
+    """基准输入图片"""
+
+    def __init__(self, name: str, source: str, image_bytes: bytes, meta: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.source = source
+        self.image_bytes = image_bytes
+        self.meta = meta or {}
+
+
+def load_test_images(directory: Path) -> Tuple[List[BenchmarkImage], List[Dict[str, str]]]:
+    """
+    读取test_images目录；SVG需要安装cairosvg才能栅格化，否则跳过
+
+    Returns:
+        (图片列表, 跳过的文件及原因)
+    """
+    images, skipped = [], []
+    if not directory.is_dir():
+        return images, [{'file': str(directory), 'reason': '目录不存在'}]
+
+    try:
+        import cairosvg
+    except ImportError:
+        cairosvg = None
+
+    for path in sorted(directory.iterdir()):
+        suffix = path.suffix.lower()
+        if suffix not in IMAGE_SUFFIXES:
+            continue
+        if suffix == '.svg':
+            if cairosvg is None:
+                skipped.append({'file': path.name, 'reason': 'SVG需要安装cairosvg'})
+                continue
+            image_bytes = cairosvg.svg2png(url=str(path))
+        else:
+            image_bytes = path.read_bytes()
+        images.append(BenchmarkImage(path.stem, 'test_images', image_bytes, {'file': path.name}))
+    return images, skipped
+
+
+def load_synthetic_images(args) -> Tuple[List[BenchmarkImage], Optional[str]]:
+    """在内存中渲染合成练习纸，返回(图片列表, 使用的中文字体)"""
+    renderer = WorksheetRenderer(font_path=args.font, seed=args.seed)
+    worksheets = renderer.render_corpus(args.kinds, args.resolutions, args.noise, args.pages)
+    images = [
+        BenchmarkImage(worksheet.name, 'synthetic', worksheet.image_bytes, {
+            'kind': worksheet.kind,
+            'resolution': worksheet.resolution,
+            'noise': worksheet.noise,
+            'width': worksheet.width,
+            'height': worksheet.height,
+        })
+        for worksheet in worksheets
+    ]
+    return images, renderer.font_path
+
+
+class PipelineBenchmark:
+    """按VisionOCRService的处理顺序逐阶段计时"""
+
+    def __init__(self, service: VisionOCRService, preprocessing: bool = True,
+                 layout_analysis: bool = True, verbose: bool = False):
+        self.service = service
+        self.preprocessing = preprocessing
+        self.layout_analysis = layout_analysis
+        self.verbose = verbose
+
+    def _quiet(self):
+        """服务内部的print（如模拟OCR提示）会淹没基准输出"""
+        if self.verbose:
+            return contextlib.nullcontext()
+        return contextlib.redirect_stdout(io.StringIO())
+
+    @staticmethod
+    def _timed(timings: Dict[str, float], stage: str, func: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        output = func()
+        timings[stage] = (time.perf_counter() - start) * 1000
+        return output
+
+    def run_stages(self, image: BenchmarkImage, engines: List[str]) -> Tuple[Dict[str, float], Dict[str, Any]]:
+        """
+        执行一次分阶段流水线；引擎在整页上依次执行，以便单独计时
+
+        Returns:
+            (各阶段耗时毫秒, 本次运行的识别信息)
+        """
+        service = self.service
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        with self._quiet():
+            image_bytes = self._timed(timings, 'read', lambda: bytes(image.image_bytes))
+            quality = self._timed(timings, 'quality', lambda: service.quality_gate.check(image_bytes))
+
+            page, preprocessing_report = service.preprocessor.process(image_bytes, enhance=self.preprocessing)
+            decode_ms = sum(s['time_ms'] for s in preprocessing_report['stages'] if s['stage'] == 'decode')
+            timings['decode'] = decode_ms
+            timings['preprocess'] = preprocessing_report['total_ms'] - decode_ms
+
+            blocks = None
+            if self.layout_analysis:
+                blocks, _ = self._timed(timings, 'layout', lambda: service.layout_analyzer.analyze(page))
+
+            ocr_results = []
+            for engine in engines:
+                result, elapsed = service._timed_run_engine(engine, page, image.name)
+                timings[f'engine:{engine}'] = elapsed * 1000
+                if result:
+                    ocr_results.append(result)
+
+            regions = self._timed(timings, 'merge', lambda: TextRegionBatch.concat(
+                [result['regions'] for result in ocr_results]
+            ) if ocr_results else TextRegionBatch.empty())
+            if len(ocr_results) > 1:
+                regions = self._timed(timings, 'dedup', lambda: service._deduplicate_regions(regions))
+
+            regions = self._timed(timings, 'classify', lambda: service._analyze_text_regions(regions))
+            self._timed(timings, 'structure', lambda: (
+                service._build_structured_result(regions),
+                service._extract_plain_text(regions),
+                service._calculate_overall_confidence(regions)
+            ))
+
+        timings['total'] = (time.perf_counter() - start) * 1000
+        return timings, {
+            'regions': len(regions),
+            'blocks': len(blocks) if blocks is not None else None,
+            'quality_passed': quality['passed'],
+            'output_size': preprocessing_report['output_size'],
+        }
+
+    def run_end_to_end(self, image: BenchmarkImage) -> float:
+        """完整调用一次extract_text_from_image（不使用缓存、不做质量拒绝），返回毫秒"""
+        start = time.perf_counter()
+        with self._quiet():
+            result = self.service.extract_text_from_image(
+                image.image_bytes, preprocessing=self.preprocessing, use_cache=False,
+                layout_analysis=self.layout_analysis, quality_check=False
+            )
+        elapsed = (time.perf_counter() - start) * 1000
+        if not result['success']:
+            print(f"  {image.name}: 完整识别失败 - {result['message']}")
+        return elapsed
+
+
+def stage_order(engines: List[str]) -> List[str]:
+    return STAGES_BEFORE_ENGINES + [f'engine:{engine}' for engine in engines] + STAGES_AFTER_ENGINES
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """耗时分布（毫秒）"""
+    ordered = sorted(samples)
+    p95_index = min(int(round(0.95 * (len(ordered) - 1))), len(ordered) - 1)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p50_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[p95_index], 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def resolve_engine_sets(service: VisionOCRService, requested: Optional[List[str]]) -> List[List[str]]:
+    """
+    要测试的引擎组合：模拟引擎、每个已安装的真实引擎，以及多个真实引擎的组合（测试去重）
+    --engines可用逗号连接多个引擎，如 easyocr,paddleocr
+    """
+    if requested:
+        return [name.split(',') for name in requested]
+
+    available = [engine for engine in service.ocr_engines if engine != 'mock']
+    engine_sets = [['mock']] + [[engine] for engine in available]
+    if len(available) > 1:
+        engine_sets.append(available)
+    return engine_sets
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).parent, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    service = VisionOCRService()
+    bench = PipelineBenchmark(
+        service, preprocessing=not args.no_preprocessing,
+        layout_analysis=not args.no_layout, verbose=args.verbose
+    )
+
+    images, skipped, font = [], [], None
+    if not args.no_test_images:
+        images, skipped = load_test_images(Path(args.images_dir))
+    for path in args.images:
+        images.append(BenchmarkImage(Path(path).stem, 'file', Path(path).read_bytes(), {'file': path}))
+    if not args.no_synthetic:
+        synthetic, font = load_synthetic_images(args)
+        images.extend(synthetic)
+    if not images:
+        raise SystemExit("没有可用的基准图片")
+
+    engine_sets = resolve_engine_sets(service, args.engines)
+    print(f"图片: {len(images)}张（跳过{len(skipped)}张），引擎组合: "
+          f"{', '.join('+'.join(engines) for engines in engine_sets)}，重复{args.repeat}次")
+
+    # 预热：首次加载模型、初始化线程池等不计入结果
+    for engines in engine_sets:
+        bench.run_stages(images[0], engines)
+
+    cases, summary = [], {}
+    for engines in engine_sets:
+        set_name = '+'.join(engines)
+        samples: Dict[str, List[float]] = {}
+        wall_start = time.perf_counter()
+
+        for image in images:
+            runs = [bench.run_stages(image, engines) for _ in range(args.repeat)]
+            case_stages: Dict[str, List[float]] = {}
+            for timings, _ in runs:
+                for stage, elapsed in timings.items():
+                    case_stages.setdefault(stage, []).append(elapsed)
+
+            # 完整调用使用服务配置的引擎，只在默认组合上测量
+            if engines == service.ocr_engines:
+                case_stages['end_to_end'] = [bench.run_end_to_end(image) for _ in range(args.repeat)]
+
+            for stage, values in case_stages.items():
+                samples.setdefault(stage, []).extend(values)
+
+            cases.append({
+                'image': image.name,
+                'source': image.source,
+                **image.meta,
+                'engine_set': set_name,
+                **runs[-1][1],
+                'stages_ms': {
+                    stage: round(statistics.median(case_stages[stage]), 3)
+                    for stage in stage_order(engines) if stage in case_stages
+                },
+            })
+
+        wall_time = time.perf_counter() - wall_start
+        summary[set_name] = {
+            'engines': engines,
+            'images': len(images),
+            'runs': len(images) * args.repeat,
+            'pages_per_second': round(len(samples['total']) / (sum(samples['total']) / 1000), 3),
+            'wall_time_s': round(wall_time, 3),
+            'stages': {
+                stage: summarize(samples[stage])
+                for stage in stage_order(engines) if stage in samples
+            },
+        }
+
+    return {
+        'version': REPORT_VERSION,
+        'meta': {
+            'created_at': datetime.now().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'pillow': PIL.__version__,
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'preprocessing': not args.no_preprocessing,
+            'layout_analysis': not args.no_layout,
+            'service_engines': service.ocr_engines,
+            'execution_mode': settings.OCR_EXECUTION_MODE,
+            'micro_batch': settings.OCR_MICRO_BATCH_ENABLED,
+            'target_long_side': settings.OCR_TARGET_LONG_SIDE,
+            'cjk_font': font,
+        },
+        'skipped': skipped,
+        'summary': summary,
+        'cases': cases,
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    逐引擎组合、逐阶段对比p50耗时并打印，返回超过阈值的回退项
+
+    只对比两份报告都有的组合和阶段；基线小于0.05毫秒的阶段波动太大，不判定回退
+    """
+    regressions = []
+    print(f"\n对比基线 {baseline['meta'].get('git_commit')} -> 当前 {current['meta'].get('git_commit')}")
+    if {case['image'] for case in baseline['cases']} != {case['image'] for case in current['cases']}:
+        print("警告: 两份报告的图片集合不同，对比结果仅供参考")
+    for set_name, current_set in current['summary'].items():
+        baseline_set = baseline['summary'].get(set_name)
+        if baseline_set is None:
+            continue
+
+        print(f"\n[{set_name}]")
+        print(f"  {'阶段':<20}{'基线p50':>12}{'当前p50':>12}{'变化':>10}")
+        for stage, stats in current_set['stages'].items():
+            baseline_stats = baseline_set['stages'].get(stage)
+            if baseline_stats is None:
+                continue
+            before, after = baseline_stats['p50_ms'], stats['p50_ms']
+            change = (after - before) / before if before else 0.0
+            flag = ''
+            if before >= 0.05 and change > threshold:
+                flag = '  回退'
+                regressions.append(f"{set_name} {stage}: {before:.3f}ms -> {after:.3f}ms ({change:+.1%})")
+            print(f"  {stage:<20}{before:>12.3f}{after:>12.3f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def print_summary(report: Dict[str, Any]):
+    for set_name, stats in report['summary'].items():
+        print(f"\n[{set_name}] {stats['runs']}次运行，{stats['pages_per_second']}页/秒")
+        for stage, stage_stats in stats['stages'].items():
+            print(f"  {stage:<20}p50 {stage_stats['p50_ms']:>10.3f}ms   p95 {stage_stats['p95_ms']:>10.3f}ms")
+    for item in report['skipped']:
+        print(f"跳过 {item['file']}: {item['reason']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR流水线性能基准")
+    parser.add_argument("--output", help="JSON报告输出路径")
+    parser.add_argument("--compare", help="作为基线对比的JSON报告")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p50耗时回退阈值（比例）")
+    parser.add_argument("--fail-on-regression", action="store_true", help="存在回退时以非零状态退出")
+    parser.add_argument("--engines", nargs="*", help="引擎组合，如 mock easyocr easyocr,paddleocr")
+    parser.add_argument("--repeat", type=int, default=3, help="每张图片重复次数")
+    parser.add_argument("--images-dir", default=str(DEFAULT_IMAGES_DIR), help="测试图片目录")
+    parser.add_argument("--images", nargs="*", default=[], help="额外的图片文件")
+    parser.add_argument("--no-test-images", action="store_true", help="不使用测试图片目录")
+    parser.add_argument("--no-synthetic", action="store_true", help="不使用合成练习纸")
+    parser.add_argument("--kinds", nargs="*", choices=WORKSHEET_KINDS, help="合成练习纸类型")
+    parser.add_argument("--resolutions", nargs="*", choices=list(RESOLUTIONS), help="合成练习纸分辨率")
+    parser.add_argument("--noise", nargs="*", choices=NOISE_LEVELS, help="合成练习纸噪声等级")
+    parser.add_argument("--pages", type=int, default=1, help="每种组合的合成页数")
+    parser.add_argument("--font", help="中文字体路径")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--no-preprocessing", action="store_true", help="关闭预处理增强")
+    parser.add_argument("--no-layout", action="store_true", help="关闭版面分析")
+    parser.add_argument("--verbose", action="store_true", help="显示服务内部日志")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_summary(report)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)}项超过{args.threshold:.0%}的回退:")
+            for line in regressions:
+                print(f"  {line}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+文字区域去重微基准
+对比原两两比较算法与扫描线+向量化算法在100/500/2000个区域下的耗时，并校验输出完全一致
+
+用法: python scripts/benchmark_region_dedup.py [--repeat 5] [--seed 42]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.ocr_regions import TextRegionBatch
+from app.services.vision_ocr_service import VisionOCRService
+
+Region = Tuple[str, List[int], float]
+
+
+def legacy_are_regions_similar(bbox1: List[int], bbox2: List[int], threshold: float = 0.7) -> bool:
+    """原逐对相似度判断"""
+    overlap_x1 = max(bbox1[0], bbox2[0])
+    overlap_y1 = max(bbox1[1], bbox2[1])
+    overlap_x2 = min(bbox1[2], bbox2[2])
+    overlap_y2 = min(bbox1[3], bbox2[3])
+
+    if overlap_x2 <= overlap_x1 or overlap_y2 <= overlap_y1:
+        return False
+
+    overlap_area = (overlap_x2 - overlap_x1) * (overlap_y2 - overlap_y1)
+    area1 = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
+    area2 = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
+
+    return overlap_area / min(area1, area2) > threshold
+
+
+def legacy_deduplicate(regions: List[Region]) -> List[Region]:
+    """原O(n²)去重算法（对照基线）"""
+    if not regions:
+        return []
+
+    sorted_regions = sorted(regions, key=lambda r: r[1][1])
+    deduplicated = []
+    used_indices = set()
+
+    for i, region in enumerate(sorted_regions):
+        if i in used_indices:
+            continue
+
+        similar_regions = [region]
+        for j, other_region in enumerate(sorted_regions):
+            if j <= i or j in used_indices:
+                continue
+            if legacy_are_regions_similar(region[1], other_region[1]):
+                similar_regions.append(other_region)
+                used_indices.add(j)
+
+        best_region = max(similar_regions, key=lambda r: r[2])
+        deduplicated.append(best_region)
+        used_indices.add(i)
+
+    return deduplicated
+
+
+def generate_regions(count: int, rng: random.Random) -> List[Region]:
+    """
+    模拟两个引擎识别同一张口算练习纸：
+    一半区域来自引擎A的网格排布，另一半为引擎B对同一网格的抖动识别
+    """
+    page_count = count // 2
+    columns = 4
+    row_height = 36
+    regions = []
+
+    for k in range(page_count):
+        row, col = divmod(k, columns)
+        x1 = 40 + col * 220 + rng.randint(-3, 3)
+        y1 = 60 + row * row_height + rng.randint(-2, 2)
+        bbox = [x1, y1, x1 + rng.randint(120, 200), y1 + rng.randint(22, 30)]
+        text = f"{rng.randint(10, 99)} + {rng.randint(10, 99)} ="
+        regions.append((text, bbox, round(rng.uniform(0.5, 0.99), 3)))
+
+        # 引擎B：轻微偏移，偶尔漏检
+        if rng.random() < 0.9:
+            dx, dy = rng.randint(-6, 6), rng.randint(-4, 4)
+            other = [bbox[0] + dx, bbox[1] + dy, bbox[2] + dx, bbox[3] + dy]
+            regions.append((text, other, round(rng.uniform(0.5, 0.99), 3)))
+
+    while len(regions) < count:
+        x1, y1 = rng.randint(0, 900), rng.randint(0, page_count // columns * row_height)
+        regions.append(("噪点", [x1, y1, x1 + 20, y1 + 20], 0.4))
+
+    rng.shuffle(regions)
+    return regions[:count]
+
+
+def time_call(func, repeat: int) -> float:
+    """返回多次执行中的最短耗时（毫秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字区域去重微基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每组重复次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    service = VisionOCRService()
+    rng = random.Random(args.seed)
+
+    print(f"{'regions':>8} {'legacy(ms)':>12} {'sweep(ms)':>12} {'speedup':>9} {'identical':>10}")
+    for count in (100, 500, 2000):
+        regions = generate_regions(count, rng)
+        batch = TextRegionBatch(
+            [r[0] for r in regions], [r[1] for r in regions], [r[2] for r in regions]
+        )
+
+        expected = legacy_deduplicate(regions)
+        actual = service._deduplicate_regions(batch)
+        identical = expected == list(zip(
+            actual.texts, actual.bboxes.tolist(), actual.confidences.tolist()
+        ))
+
+        legacy_ms = time_call(lambda: legacy_deduplicate(regions), args.repeat)
+        sweep_ms = time_call(lambda: service._deduplicate_regions(batch), args.repeat)
+
+        print(f"{count:>8} {legacy_ms:>12.2f} {sweep_ms:>12.2f} "
+              f"{legacy_ms / sweep_ms:>8.1f}x {str(identical):>10}")
+
+        if not identical:
+            sys.exit(f"去重结果不一致: {count}个区域")
+
+
+if __name__ == "__main__":
+    main()
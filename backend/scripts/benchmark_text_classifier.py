@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+文字类型分类微基准
+对比原逐条正则匹配与预编译单次扫描分类器的耗时，并校验所有区域的分类结果完全一致
+
+默认使用模拟OCR文本和按口算/语文/英语练习纸生成的区域文本；
+也可以传入/ocr-extract接口保存的响应JSON，在真实OCR输出上对比
+
+用法: python scripts/benchmark_text_classifier.py [--input ocr_result.json ...] [--pages 200] [--repeat 5]
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.text_type_classifier import TEXT_PATTERNS, text_type_classifier
+
+
+def legacy_classify_text_type(text: str) -> Dict[str, Any]:
+    """原逐条re.match/re.search分类（对照基线）"""
+    text_clean = text.strip()
+
+    # 题号识别
+    if re.match(TEXT_PATTERNS['question_number'], text_clean):
+        return {
+            'type': 'question_number',
+            'subtype': 'primary',
+            'is_question_part': True,
+            'properties': {'number': re.match(r'^(\d+)', text_clean).group(1)}
+        }
+
+    # 选择题选项
+    if re.match(TEXT_PATTERNS['choice_option'], text_clean):
+        return {
+            'type': 'choice_option',
+            'subtype': 'option',
+            'is_answer_part': True,
+            'properties': {'option': re.match(r'^([A-H])', text_clean).group(1)}
+        }
+
+    # 数学公式
+    if re.search(TEXT_PATTERNS['formula'], text_clean):
+        formula_type = 'arithmetic'
+        if '=' in text_clean:
+            formula_type = 'equation'
+        elif any(symbol in text_clean for symbol in ['√', '∫', '∑']):
+            formula_type = 'advanced'
+
+        return {
+            'type': 'formula',
+            'subtype': formula_type,
+            'is_question_part': True,
+            'properties': {'complexity': len(re.findall(r'[+\-×÷=()]', text_clean))}
+        }
+
+    # 纯数字
+    if re.match(TEXT_PATTERNS['number'], text_clean):
+        return {
+            'type': 'number',
+            'subtype': 'decimal' if '.' in text_clean else 'integer',
+            'is_answer_part': True,
+            'properties': {'value': float(text_clean) if '.' in text_clean else int(text_clean)}
+        }
+
+    # 分数
+    if re.search(TEXT_PATTERNS['fraction'], text_clean):
+        return {
+            'type': 'fraction',
+            'is_answer_part': True,
+            'properties': {'format': 'fraction'}
+        }
+
+    # 百分比
+    if re.search(TEXT_PATTERNS['percentage'], text_clean):
+        return {
+            'type': 'percentage', 
+            'is_answer_part': True,
+            'properties': {'format': 'percentage'}
+        }
+
+    # 英文单词
+    if re.match(TEXT_PATTERNS['english_word'], text_clean):
+        return {
+            'type': 'english_text',
+            'subtype': 'word' if len(text_clean.split()) == 1 else 'phrase',
+            'properties': {'word_count': len(text_clean.split())}
+        }
+
+    # 中文文本
+    if any('\u4e00' <= char <= '\u9fff' for char in text_clean):
+        return {
+            'type': 'chinese_text',
+            'subtype': 'sentence' if len(text_clean) > 10 else 'word',
+            'properties': {'char_count': len(text_clean)}
+        }
+
+    # 标点符号
+    if re.match(TEXT_PATTERNS['punctuation'], text_clean):
+        return {
+            'type': 'punctuation',
+            'properties': {'symbols': list(text_clean)}
+        }
+
+    # 混合数学表达式
+    if re.search(TEXT_PATTERNS['mixed_math'], text_clean):
+        return {
+            'type': 'math_expression',
+            'is_question_part': True,
+            'properties': {'has_operators': True}
+        }
+
+    # 默认为普通文本
+    return {
+        'type': 'text',
+        'subtype': 'general',
+        'properties': {'length': len(text_clean)}
+    }
+
+
+def load_ocr_texts(paths: List[str]) -> List[str]:
+    """从OCR结果JSON中读取区域文本（支持extract_text_from_image结果和/ocr-extract响应）"""
+    texts = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        result = data.get('extraction_result', data)
+        regions = result.get('regions') or result.get('text_regions') or []
+        texts.extend(region['text'] for region in regions)
+    return texts
+
+
+def generate_page_texts(rng: random.Random) -> List[str]:
+    """模拟一页练习纸上各引擎识别出的区域文本"""
+    texts = [
+        "1. 计算 125 × 8 = ?",
+        "A. 1000    B. 1200    C. 1500    D. 800",
+        "2. 小明买了3本书，每本15元，一共花了多少钱？",
+        "解：3 × 15 = 45（元）",
+        "答：一共花了45元。",
+        "3. 下列词语中，没有错别字的是（）",
+        "A. 走投无路  B. 变本加利  C. 再接再励  D. 一如即往",
+    ]
+    for _ in range(rng.randint(20, 60)):
+        a, b = rng.randint(1, 999), rng.randint(1, 99)
+        texts.append(rng.choice([
+            f"{rng.randint(1, 30)}. {a} + {b} =",
+            f"{a} {rng.choice('+-×÷')} {b} =",
+            f"{a}",
+            f"{a}.{b}",
+            f"{a}/{b}",
+            f"{b}%",
+            f"{rng.randint(1, 30)}、填空",
+            f"{rng.choice('ABCD')}. {a}",
+            rng.choice(["apple", "Banana", "school", "read", "the cat"]),
+            rng.choice(["看拼音写词语", "照样子写句子", "比一比，再组词", "二十三"]),
+            rng.choice(["。", "，", "（）", "！？"]),
+            f"({a}){b}",
+            rng.choice(["√", "∑x", "x² y"]),
+            rng.choice(["___", "Name:", "", "  "]),
+        ]))
+    rng.shuffle(texts)
+    return texts
+
+
+def time_call(func, repeat: int) -> float:
+    """返回多次执行中的最短耗时（毫秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字类型分类微基准")
+    parser.add_argument("--input", nargs="*", default=[], help="OCR结果JSON文件")
+    parser.add_argument("--pages", type=int, default=200, help="模拟页数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [generate_page_texts(rng) for _ in range(args.pages)]
+    if args.input:
+        pages.append(load_ocr_texts(args.input))
+    texts = [text for page in pages for text in page]
+
+    expected = [legacy_classify_text_type(text) for text in texts]
+    actual = [label for page in pages for label in text_type_classifier.classify_batch(page)]
+    mismatches = [
+        (text, e, a) for text, e, a in zip(texts, expected, actual) if e != a
+    ]
+
+    legacy_ms = time_call(lambda: [legacy_classify_text_type(t) for t in texts], args.repeat)
+    compiled_ms = time_call(
+        lambda: [text_type_classifier.classify_batch(page) for page in pages], args.repeat
+    )
+
+    print(f"regions: {len(texts)}  pages: {len(pages)}")
+    print(f"legacy:   {legacy_ms:10.2f} ms  ({legacy_ms * 1000 / len(texts):.2f} µs/region)")
+    print(f"compiled: {compiled_ms:10.2f} ms  ({compiled_ms * 1000 / len(texts):.2f} µs/region)")
+    print(f"speedup:  {legacy_ms / compiled_ms:10.1f}x")
+    print(f"identical: {not mismatches}")
+
+    if mismatches:
+        for text, e, a in mismatches[:10]:
+            print(f"  {text!r}: legacy={e} compiled={a}")
+        sys.exit(f"分类结果不一致: {len(mismatches)}个区域")
+
+
+if __name__ == "__main__":
+    main()
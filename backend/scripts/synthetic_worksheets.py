@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+合成练习纸生成器
+用PIL渲染口算练习、选择题和语文练习三类练习纸，按多种分辨率和噪声等级输出，
+供OCR性能基准（scripts/benchmark_ocr_pipeline.py）使用，也可单独导出图片
+
+用法: python scripts/synthetic_worksheets.py --output data/benchmark/worksheets [--font /path/to/simhei.ttf]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+WORKSHEET_KINDS = ['arithmetic', 'choice', 'chinese']
+
+# 名称 -> 宽高（A4纸在不同拍摄/扫描精度下的像素尺寸）
+RESOLUTIONS = {
+    'low': (827, 1169),
+    'medium': (1654, 2339),
+    'high': (2480, 3508),
+}
+
+NOISE_LEVELS = ['clean', 'light', 'heavy']
+
+# 常见系统上的中文字体，都不存在时用PIL默认字体（中文字符渲染为方框，仍可用于性能测试）
+CJK_FONT_CANDIDATES = [
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+    'C:/Windows/Fonts/simhei.ttf',
+    'C:/Windows/Fonts/simsun.ttc',
+]
+
+CHINESE_PROMPTS = [
+    '看拼音写词语', '照样子写句子', '比一比，再组词', '把句子补充完整',
+    '读短文，回答问题', '给加点的字选择正确的读音', '按课文内容填空',
+]
+
+CHINESE_SENTENCES = [
+    '春天来了，小草从地下探出头来。',
+    '小明每天早上七点起床，然后去上学。',
+    '我们要爱护花草树木，保护环境。',
+    '秋天的果园里，苹果红了，梨子黄了。',
+    '妈妈说，做事情要认真，不能马虎。',
+]
+
+IDIOMS = ['走投无路', '变本加厉', '再接再厉', '一如既往', '迫不及待', '专心致志', '画龙点睛', '守株待兔']
+
+
+@dataclass
+class SyntheticWorksheet:
+    """一张合成练习纸"""
+    name: str
+    kind: str
+    resolution: str
+    noise: str
+    width: int
+    height: int
+    image_bytes: bytes
+    texts: List[str] = field(default_factory=list)
+
+    def manifest(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'resolution': self.resolution,
+            'noise': self.noise,
+            'width': self.width,
+            'height': self.height,
+            'size_bytes': len(self.image_bytes),
+            'texts': self.texts,
+        }
+
+
+def find_cjk_font(font_path: Optional[str] = None) -> Optional[str]:
+    """返回可用的中文字体路径，找不到时返回None"""
+    candidates = [font_path] if font_path else []
+    candidates += [os.environ.get('ZYJC_CJK_FONT')] + CJK_FONT_CANDIDATES
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    return None
+
+
+class WorksheetRenderer:
+    """合成练习纸渲染器"""
+
+    def __init__(self, font_path: Optional[str] = None, seed: int = 42, jpeg_quality: int = 90):
+        self.font_path = find_cjk_font(font_path)
+        self.seed = seed
+        self.jpeg_quality = jpeg_quality
+        self._fonts: Dict[int, ImageFont.ImageFont] = {}
+
+    def render(self, kind: str, resolution: str = 'medium', noise: str = 'clean',
+               index: int = 0) -> SyntheticWorksheet:
+        """渲染一张练习纸，相同参数和种子的输出完全一致"""
+        if kind not in WORKSHEET_KINDS:
+            raise ValueError(f"不支持的练习纸类型: {kind}")
+        width, height = RESOLUTIONS[resolution]
+        rng = random.Random(f'{self.seed}-{kind}-{index}')
+
+        # 按A4中等分辨率排版，再按比例缩放字号和间距
+        scale = width / RESOLUTIONS['medium'][0]
+        image = Image.new('L', (width, height), 250)
+        draw = ImageDraw.Draw(image)
+
+        lines = getattr(self, f'_{kind}_lines')(rng)
+        texts = self._draw_page(draw, lines, scale, width, height)
+
+        image = self._add_noise(image, noise, rng)
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, format='JPEG', quality=self.jpeg_quality)
+
+        return SyntheticWorksheet(
+            name=f'{kind}_{resolution}_{noise}_{index}',
+            kind=kind,
+            resolution=resolution,
+            noise=noise,
+            width=width,
+            height=height,
+            image_bytes=buffer.getvalue(),
+            texts=texts,
+        )
+
+    def render_corpus(self, kinds: Optional[List[str]] = None,
+                      resolutions: Optional[List[str]] = None,
+                      noise_levels: Optional[List[str]] = None,
+                      pages: int = 1) -> List[SyntheticWorksheet]:
+        """按类型 × 分辨率 × 噪声等级 × 页数生成语料"""
+        return [
+            self.render(kind, resolution, noise, index)
+            for kind in kinds or WORKSHEET_KINDS
+            for resolution in resolutions or list(RESOLUTIONS)
+            for noise in noise_levels or NOISE_LEVELS
+            for index in range(pages)
+        ]
+
+    def _font(self, size: int) -> ImageFont.ImageFont:
+        font = self._fonts.get(size)
+        if font is None:
+            if self.font_path:
+                font = ImageFont.truetype(self.font_path, size)
+            else:
+                font = ImageFont.load_default(size=size)
+            self._fonts[size] = font
+        return font
+
+    def _draw_page(self, draw: ImageDraw.ImageDraw, lines: List[Tuple[str, int, int]],
+                   scale: float, width: int, height: int) -> List[str]:
+        """
+        逐行绘制，lines为(文字, 字号, 缩进)，超出页面底部的行不再绘制
+
+        Returns:
+            实际绘制的文字
+        """
+        margin = int(120 * scale)
+        y = margin
+        texts = []
+        for text, size, indent in lines:
+            font_size = max(int(size * scale), 8)
+            if y + font_size > height - margin:
+                break
+            if text:
+                draw.text((margin + int(indent * scale), y), text, font=self._font(font_size), fill=30)
+                texts.append(text)
+            y += int(font_size * 1.9)
+        return texts
+
+    @staticmethod
+    def _arithmetic_lines(rng: random.Random) -> List[Tuple[str, int, int]]:
+        """口算练习：每行四道题"""
+        lines = [('口算练习（限时5分钟）', 64, 420), ('姓名：______  班级：______', 40, 0), ('', 40, 0)]
+        number = 1
+        for _ in range(24):
+            row = []
+            for _ in range(4):
+                a, b = rng.randint(10, 99), rng.randint(2, 50)
+                operator = rng.choice('+-×÷')
+                if operator == '÷':
+                    a = b * rng.randint(2, 9)
+                row.append(f'{number}. {a} {operator} {b} = ____')
+                number += 1
+            lines.append(('    '.join(row), 40, 0))
+        return lines
+
+    @staticmethod
+    def _choice_lines(rng: random.Random) -> List[Tuple[str, int, int]]:
+        """选择题：题干加四个选项"""
+        lines = [('单元测试  选择题', 64, 460), ('', 40, 0)]
+        for number in range(1, 13):
+            a, b = rng.randint(100, 999), rng.randint(2, 9)
+            answer = a * b
+            options = [answer, answer + rng.randint(1, 9) * 10, answer - rng.randint(1, 9), answer + 100]
+            rng.shuffle(options)
+            lines.append((f'{number}. 计算 {a} × {b} 的结果是（  ）', 44, 0))
+            lines.append(('    '.join(f'{label}. {value}' for label, value in zip('ABCD', options)), 40, 60))
+        return lines
+
+    @staticmethod
+    def _chinese_lines(rng: random.Random) -> List[Tuple[str, int, int]]:
+        """语文练习：题目要求、句子和成语选择"""
+        lines = [('语文练习  第三单元', 64, 440), ('', 40, 0)]
+        for number in range(1, 9):
+            lines.append((f'{number}. {rng.choice(CHINESE_PROMPTS)}', 44, 0))
+            lines.append((rng.choice(CHINESE_SENTENCES), 42, 60))
+            idioms = rng.sample(IDIOMS, 4)
+            lines.append(('  '.join(f'{label}. {idiom}' for label, idiom in zip('ABCD', idioms)), 40, 60))
+        return lines
+
+    @staticmethod
+    def _add_noise(image: Image.Image, noise: str, rng: random.Random) -> Image.Image:
+        """模拟拍照：light为轻微噪点和模糊，heavy再加倾斜和不均匀光照"""
+        if noise == 'clean':
+            return image
+
+        np_rng = np.random.default_rng(rng.randint(0, 2 ** 32 - 1))
+        if noise == 'heavy':
+            image = image.rotate(rng.uniform(-3, 3), resample=Image.BILINEAR, expand=False, fillcolor=250)
+            image = image.filter(ImageFilter.GaussianBlur(radius=1.2))
+            sigma = 14.0
+        else:
+            image = image.filter(ImageFilter.GaussianBlur(radius=0.6))
+            sigma = 6.0
+
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += np_rng.normal(0, sigma, pixels.shape).astype(np.float32)
+        if noise == 'heavy':
+            # 从左上到右下逐渐变暗的光照
+            height, width = pixels.shape
+            gradient = np.linspace(0, 45, width, dtype=np.float32)[None, :] + \
+                np.linspace(0, 35, height, dtype=np.float32)[:, None]
+            pixels -= gradient
+        return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成练习纸生成器")
+    parser.add_argument("--output", default="data/benchmark/worksheets", help="输出目录")
+    parser.add_argument("--kinds", nargs="*", choices=WORKSHEET_KINDS, help="练习纸类型")
+    parser.add_argument("--resolutions", nargs="*", choices=list(RESOLUTIONS), help="分辨率")
+    parser.add_argument("--noise", nargs="*", choices=NOISE_LEVELS, help="噪声等级")
+    parser.add_argument("--pages", type=int, default=1, help="每种组合的页数")
+    parser.add_argument("--font", help="中文字体路径（默认自动查找）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    renderer = WorksheetRenderer(font_path=args.font, seed=args.seed)
+    if renderer.font_path is None:
+        print("警告: 未找到中文字体，中文字符将渲染为方框（可用--font或ZYJC_CJK_FONT指定）")
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    worksheets = renderer.render_corpus(args.kinds, args.resolutions, args.noise, args.pages)
+    for worksheet in worksheets:
+        (output / f'{worksheet.name}.jpg').write_bytes(worksheet.image_bytes)
+
+    manifest = {
+        'seed': args.seed,
+        'font': renderer.font_path,
+        'worksheets': [worksheet.manifest() for worksheet in worksheets],
+    }
+    with open(output / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"已生成{len(worksheets)}张练习纸: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -226,6 +226,18 @@ def get_ocr_result(image_hash: str) -> Optional[Dict[str, Any]]:
     return cache_manager.get(key)
 
 
+def cache_question_analysis(analysis_key: str, analysis: Dict[str, Any], ttl: int = 604800) -> bool:
+    """缓存题目分析结果"""
+    key = f"question:analysis:{analysis_key}"
+    return cache_manager.set(key, analysis, ttl)
+
+
+def get_question_analysis(analysis_key: str) -> Optional[Dict[str, Any]]:
+    """获取题目分析结果缓存"""
+    key = f"question:analysis:{analysis_key}"
+    return cache_manager.get(key)
+
+
 def cache_similar_questions(question_id: int, questions: List[Dict[str, Any]], ttl: int = 86400) -> bool:
     """缓存相似题目"""
     key = f"similar:questions:{question_id}"